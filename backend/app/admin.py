@@ -23,6 +23,9 @@ admin.site.register(ProfitAndLoss)
 admin.site.register(BalanceSheet)
 admin.site.register(OperationalMetrics)
 admin.site.register(RatioResult)
+admin.site.register(TrailingRatioResult)
+admin.site.register(RatioStatistic)
+admin.site.register(StoredBlob)
 admin.site.register(AppConfig)
 admin.site.register(StatementColumnConfig)
 admin.site.register(EmailOTP)
@@ -0,0 +1,75 @@
+"""
+JWT authentication with the token's user served from a short-lived in-process
+cache, so authenticated requests need no query to load request.user.
+Entries are dropped when the user is saved or deleted (app.signals); other
+worker processes see such a change after at most JWT_USER_CACHE_TTL seconds.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+# Loaded up front; any other field (password, last_login, created_by, ...) is
+# deferred and fetched from the database only if a view reads it.
+CACHED_FIELDS = (
+    'id', 'username', 'email', 'first_name', 'last_name', 'role',
+    'is_active', 'is_staff', 'is_superuser',
+)
+
+_users = {}  # str(user id), as in the token claim -> (expires at, values)
+_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def invalidate_user(user_id):
+    with _lock:
+        _users.pop(str(user_id), None)
+
+
+def clear_user_cache():
+    with _lock:
+        _users.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication whose get_user() reads CACHED_FIELDS from memory for JWT_USER_CACHE_TTL seconds."""
+
+    def get_user(self, validated_token):
+        ttl = _setting('JWT_USER_CACHE_TTL', 60)
+        # The revocation check compares the password hash: not cached
+        if ttl <= 0 or api_settings.CHECK_REVOKE_TOKEN or api_settings.USER_ID_FIELD != 'id':
+            return super().get_user(validated_token)
+
+        try:
+            user_id = str(validated_token[api_settings.USER_ID_CLAIM])
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        # from_db() expects values in model field order
+        fields = [f.attname for f in self.user_model._meta.concrete_fields if f.attname in CACHED_FIELDS]
+        now = time.monotonic()
+        entry = _users.get(user_id)
+        if entry is None or entry[0] < now:
+            values = self.user_model.objects.filter(id=user_id).values_list(*fields).first()
+            if values is None:
+                invalidate_user(user_id)
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            entry = (now + ttl, values)
+            with _lock:
+                if len(_users) >= _setting('JWT_USER_CACHE_MAX_ENTRIES', 10000):
+                    _users.clear()
+                _users[user_id] = entry
+
+        # A fresh instance per request: views may modify request.user
+        user = self.user_model.from_db(DEFAULT_DB_ALIAS, fields, entry[1])
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
@@ -0,0 +1,159 @@
+"""
+Read/write database routing.
+Writes always go to 'default'. Read-only analytics views (ReadReplicaMixin)
+route their reads to the replica alias (DB_REPLICA_ALIAS) for the duration of
+the request, unless the user wrote something within REPLICA_STICKY_SECONDS:
+then they stay on the primary so they read their own upload despite
+replication lag. Without a configured replica everything uses 'default'.
+Async views fetch independent querysets concurrently with gather_reads().
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+PIN_KEY = 'db-primary-pin:{}'
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def replica_configured():
+    return _setting('DB_REPLICA_ALIAS', 'replica') in connections.databases
+
+
+def replica_alias():
+    """The replica alias if one is configured and reachable, else 'default'."""
+    alias = _setting('DB_REPLICA_ALIAS', 'replica')
+    if alias not in connections.databases:
+        return DEFAULT_DB_ALIAS
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError as e:
+        logger.warning(f"Read replica '{alias}' unavailable, reading from primary: {e}")
+        return DEFAULT_DB_ALIAS
+    return alias
+
+
+def current_read_alias():
+    return _read_alias.get() or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_read_alias(alias):
+    """Route reads inside the block to `alias`."""
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+
+def bind_reads(iterable, alias=None):
+    """
+    Re-enter the read alias around each step of `iterable`: streamed responses
+    are consumed after the view has returned and left use_read_alias().
+    """
+    alias = alias or current_read_alias()  # captured now, not on first iteration
+
+    def steps(iterator):
+        while True:
+            with use_read_alias(alias):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    return steps(iter(iterable))
+
+
+_read_executor = None
+_read_executor_lock = threading.Lock()
+
+
+def _executor():
+    global _read_executor
+    with _read_executor_lock:
+        if _read_executor is None:
+            _read_executor = ThreadPoolExecutor(
+                max_workers=_setting('ASYNC_READ_WORKERS', 8), thread_name_prefix='db-read',
+            )
+        return _read_executor
+
+
+def _run_read(func):
+    # Same connection upkeep as a request: drop expired / broken connections
+    # (pool mode hands them back) before and after the read
+    close_old_connections()
+    try:
+        return func()
+    finally:
+        close_old_connections()
+
+
+async def gather_reads(*funcs):
+    """
+    Run independent blocking reads (callables doing ORM queries) concurrently
+    and return their results in order. Each runs on a thread of a shared pool
+    (ASYNC_READ_WORKERS) with that thread's own connection, under the caller's
+    read alias. Awaiting several async ORM calls (aget(), afirst(), ...) with
+    asyncio.gather() would not overlap them: Django runs them all on the
+    request's one thread-sensitive executor, one after another.
+    """
+    executor = _executor()
+    return await asyncio.gather(*(
+        sync_to_async(_run_read, thread_sensitive=False, executor=executor)(func)
+        for func in funcs
+    ))
+
+
+def pin_primary(user):
+    """Keep `user`'s reads on the primary for REPLICA_STICKY_SECONDS (read-your-writes)."""
+    seconds = _setting('REPLICA_STICKY_SECONDS', 15)
+    if seconds > 0 and getattr(user, 'is_authenticated', False):
+        cache.set(PIN_KEY.format(user.pk), True, seconds)
+
+
+def is_pinned(user):
+    return getattr(user, 'is_authenticated', False) and bool(cache.get(PIN_KEY.format(user.pk)))
+
+
+def read_alias_for(user):
+    """Where a read-only request from `user` should read: primary while pinned, else the replica."""
+    if not replica_configured() or is_pinned(user):
+        return DEFAULT_DB_ALIAS
+    return replica_alias()
+
+
+class ReadReplicaRouter:
+    """DATABASE_ROUTERS entry: reads follow use_read_alias(), writes and migrations use 'default'."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'django_cache':
+            # DatabaseCache entries (data versions, replica pins) must be current
+            return DEFAULT_DB_ALIAS
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Explicit, so objects loaded from the replica are still saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema through replication
+        return db == DEFAULT_DB_ALIAS
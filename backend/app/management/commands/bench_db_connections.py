@@ -0,0 +1,82 @@
+"""
+Measure per-request time with the configured connection handling (DB_CONN_MODE)
+against opening a fresh database connection for every request
+Usage: python manage.py bench_db_connections [--requests 200] [--path /api/ratio-benchmarks/] [--username admin]
+"""
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class Command(BaseCommand):
+    help = "Benchmark request latency with connection reuse (persistent / pool) vs reconnecting per request"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per phase')
+        parser.add_argument('--path', default='/api/ratio-benchmarks/', help='Authenticated GET endpoint to call')
+        parser.add_argument('--username', help='User to authenticate as (default: first active user)')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(is_active=True)
+        user = users.filter(username=options['username']).first() if options['username'] else users.first()
+        if user is None:
+            raise CommandError("No active user to authenticate as")
+        token = str(RefreshToken.for_user(user).access_token)
+        # The test client disconnects close_old_connections from request_finished; the
+        # phases below call it (or close the connection) themselves after each request.
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {token}", HTTP_HOST='localhost')
+
+        settings_dict = connection.settings_dict
+        mode = 'pool' if settings_dict.get('OPTIONS', {}).get('pool') else (
+            'persistent' if settings_dict.get('CONN_MAX_AGE') else 'none'
+        )
+        self.stdout.write(
+            f"{connection.vendor} ({mode}, CONN_MAX_AGE={settings_dict.get('CONN_MAX_AGE')}, "
+            f"CONN_HEALTH_CHECKS={settings_dict.get('CONN_HEALTH_CHECKS')}): "
+            f"{options['requests']} x GET {options['path']}"
+        )
+
+        reuse = self._run(client, options, close_old_connections)
+
+        # Same requests with a new connection each time: no pool, no persistence
+        pool_options = settings_dict.get('OPTIONS', {}).pop('pool', None)
+        if pool_options is not None:
+            connection.close_pool()
+        connection.close()
+        try:
+            reconnect = self._run(client, options, connection.close)
+        finally:
+            if pool_options is not None:
+                settings_dict['OPTIONS']['pool'] = pool_options
+
+        self._report(f"reuse ({mode})", reuse)
+        self._report("reconnect", reconnect)
+        saved = statistics.mean(reconnect) - statistics.mean(reuse)
+        self.stdout.write(self.style.SUCCESS(f"Saved per request: {saved:.2f} ms"))
+
+    def _run(self, client, options, after_request):
+        # Warm up (first connection, URL resolving, imports) outside the timings
+        client.get(options['path'])
+        after_request()
+        timings = []
+        for _ in range(options['requests']):
+            started = time.perf_counter()
+            response = client.get(options['path'])
+            after_request()
+            timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f"GET {options['path']} returned {response.status_code}")
+        return timings
+
+    def _report(self, label, timings):
+        ordered = sorted(timings)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.stdout.write(
+            f"{label:<20} mean {statistics.mean(timings):7.2f} ms   "
+            f"p50 {statistics.median(timings):7.2f} ms   p95 {p95:7.2f} ms"
+        )
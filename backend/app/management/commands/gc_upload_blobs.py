@@ -0,0 +1,38 @@
+"""
+Garbage-collect content-addressed upload blobs no period links to
+Usage: python manage.py gc_upload_blobs [--grace-minutes 60] [--dry-run] [--adopt-legacy]
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from app.services.blob_storage import adopt_legacy_files, collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Reconcile blob reference counts and delete unreferenced / orphaned upload blobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes', type=int, default=60,
+            help='Keep blobs touched within this many minutes (uploads in flight)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report only; delete nothing')
+        parser.add_argument(
+            '--adopt-legacy', action='store_true',
+            help='First move uploads stored under the old per-period paths into blob storage',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if options['adopt_legacy']:
+            moved, removed = adopt_legacy_files(dry_run=dry_run)
+            self.stdout.write(f"Legacy uploads moved: {moved}, legacy files removed: {removed}")
+
+        result = collect_garbage(grace=timedelta(minutes=options['grace_minutes']), dry_run=dry_run)
+        prefix = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(f"Reference counts corrected: {result['reconciled']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {result['deleted']} unreferenced and {result['orphans']} orphaned blobs "
+            f"({result['bytes']} bytes)"
+        ))
@@ -0,0 +1,15 @@
+"""
+Rebuild the running ratio / field statistics used for upload anomaly flags
+Usage: python manage.py rebuild_ratio_statistics
+"""
+from django.core.management.base import BaseCommand
+
+from app.services.ratio_statistics import rebuild_statistics
+
+
+class Command(BaseCommand):
+    help = "Recompute per-period-type ratio statistics from all stored periods"
+
+    def handle(self, *args, **options):
+        count = rebuild_statistics()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt statistics from {count} periods"))
@@ -0,0 +1,23 @@
+"""
+Derive QUARTERLY / HALF_YEARLY / YEARLY periods from monthly data
+Usage: python manage.py rollup_periods [--no-ratios]
+"""
+from django.core.management.base import BaseCommand
+
+from app.services.period_rollup import rollup_all
+
+
+class Command(BaseCommand):
+    help = "Roll up complete monthly periods into quarterly, half-yearly and yearly periods"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-ratios', action='store_true',
+            help='Only derive statements; skip the batch ratio calculation',
+        )
+
+    def handle(self, *args, **options):
+        parents = rollup_all(calculate=not options['no_ratios'])
+        for parent in parents:
+            self.stdout.write(f"{parent.period_type:<12} {parent.label}")
+        self.stdout.write(self.style.SUCCESS(f"Derived {len(parents)} periods from monthly data"))
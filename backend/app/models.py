@@ -1,10 +1,13 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.db.models import DEFERRED
 from django.utils import timezone
 from datetime import timedelta
 import os
 
+from .storage import upload_storage
+
 
 # Create your models here.
 
@@ -17,6 +20,9 @@ def financial_file_upload_path(instance, filename):
     - Company name (sanitized)
     - Period type (MONTHLY, QUARTERLY, HALF_YEARLY, YEARLY)
     - Period label (e.g., Apr_2024, Q1_FY_2024_25, FY_2024_25)
+
+    Uploads now go through ContentAddressedStorage, which keeps only the extension of
+    this path; the original name is kept in FinancialPeriod.uploaded_file_name.
     """
     # Handle case where instance might not be fully initialized
     if not instance.label:
@@ -45,6 +51,8 @@ class UserRegister(AbstractUser):
     )
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.SET_NULL,null=True)
+    # Version stamp for ETags on the user / profile endpoints
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.username
@@ -66,23 +74,43 @@ class FinancialPeriod(models.Model):
     end_date = models.DateField()
     label = models.CharField(max_length=50)  # e.g. FY-2023-24, Mar-2024
     is_finalized = models.BooleanField(default=False)
+    # True when statements were rolled up from monthly children rather than uploaded
+    is_derived = models.BooleanField(default=False)
     
 
     
     # Store uploaded file (Excel, Word, or PDF) - organized by company/period_type/period_label
-    uploaded_file = models.FileField(upload_to=financial_file_upload_path, null=True, blank=True)
+    uploaded_file = models.FileField(upload_to=financial_file_upload_path, storage=upload_storage,
+                                     null=True, blank=True)
+    # Name the file was uploaded with (the stored name is its content hash)
+    uploaded_file_name = models.CharField(max_length=255, blank=True, default='')
     # Track file type: 'excel', 'docx', or 'pdf'
     file_type = models.CharField(max_length=10, null=True, blank=True, 
                                  help_text="Type of uploaded file: excel, docx, or pdf")
+    # sha256 of uploaded_file, set when a new file is saved; used as the download ETag
+    uploaded_file_sha256 = models.CharField(max_length=64, blank=True, default='')
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("label",)
+        indexes = [
+            models.Index(fields=["period_type", "start_date"], name="period_type_start_idx"),
+            models.Index(fields=["start_date", "end_date"], name="period_range_idx"),
+        ]
 
     def __str__(self):
         return f"{self.label}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored file so replacing it can release the old blob reference
+        value = values[field_names.index('uploaded_file')] if 'uploaded_file' in field_names else DEFERRED
+        instance._loaded_uploaded_file = None if value is DEFERRED else (value or '')
+        return instance
+
 
 
 class TradingAccount(models.Model):
@@ -98,6 +126,8 @@ class TradingAccount(models.Model):
     sales = models.DecimalField(max_digits=15, decimal_places=2)
     closing_stock = models.DecimalField(max_digits=15, decimal_places=2)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     @property
     def gross_profit(self):
         return (
@@ -128,6 +158,8 @@ class ProfitAndLoss(models.Model):
 
     net_profit = models.DecimalField(max_digits=15, decimal_places=2)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     @property
     def total_interest_income(self):
         return (
@@ -169,6 +201,8 @@ class BalanceSheet(models.Model):
     other_assets = models.DecimalField(max_digits=15, decimal_places=2)
     stock_in_trade = models.DecimalField(max_digits=15, decimal_places=2)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     @property
     def working_fund(self):
         # PDF-defined Working Fund (IMPORTANT)
@@ -198,6 +232,8 @@ class OperationalMetrics(models.Model):
 
     staff_count = models.PositiveIntegerField()
 
+    updated_at = models.DateTimeField(auto_now=True)
+
 
 
 class RatioResult(models.Model):
@@ -253,7 +289,83 @@ class RatioResult(models.Model):
 
     traffic_light_status = models.JSONField(default=dict, blank=True)
 
-    calculated_at = models.DateTimeField(auto_now_add=True)
+    # Every save of a RatioResult is a recalculation
+    calculated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class TrailingRatioResult(models.Model):
+    """
+    Trailing-twelve-month (TTM) ratios for a MONTHLY period: P&L and trading
+    flows summed over the 12 months ending with this period, combined with
+    this period's closing BalanceSheet.
+    """
+    period = models.OneToOneField(
+        FinancialPeriod,
+        on_delete=models.CASCADE,
+        related_name="ttm_ratios"
+    )
+
+    window_start = models.DateField()
+    ratios = models.JSONField(default=dict)
+    traffic_light_status = models.JSONField(default=dict, blank=True)
+
+    calculated_at = models.DateTimeField(auto_now=True)
+
+
+class RatioStatistic(models.Model):
+    """
+    Running count / mean / M2 (Welford) of one ratio or statement field over all
+    periods of a period_type. Updated in O(1) per period added, replaced or removed,
+    so uploads can be scored without rescanning history.
+    """
+    KIND_CHOICES = [
+        ("ratio", "Ratio"),
+        ("field", "Statement field"),
+    ]
+
+    period_type = models.CharField(max_length=20, choices=FinancialPeriod.PERIOD_TYPE_CHOICES)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    name = models.CharField(max_length=100)
+
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0.0)
+    m2 = models.FloatField(default=0.0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("period_type", "kind", "name")
+
+    def __str__(self):
+        return f"{self.period_type} {self.kind}:{self.name} (n={self.count})"
+
+
+class RatioStatisticSample(models.Model):
+    """Values a period contributed to RatioStatistic, kept so they can be taken out again."""
+    period = models.OneToOneField(
+        FinancialPeriod,
+        on_delete=models.CASCADE,
+        related_name="statistic_sample"
+    )
+    period_type = models.CharField(max_length=20)
+    values = models.JSONField(default=dict)  # {"ratio": {name: value}, "field": {name: value}}
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class StoredBlob(models.Model):
+    """A file in content-addressed upload storage and how many periods link to it."""
+    name = models.CharField(max_length=255, unique=True)  # storage name, blobs/<aa>/<sha256><ext>
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set whenever ref_count changes; garbage collection only takes blobs unreferenced for a while
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
 
 
 class AppConfig(models.Model):
@@ -294,6 +406,7 @@ class StatementColumnConfig(models.Model):
     aliases = models.JSONField(default=list, blank=True)
 
     is_required = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("statement_type", "canonical_field")
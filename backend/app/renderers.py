@@ -0,0 +1,51 @@
+"""
+JSON renderer backed by orjson: several times faster than the standard
+library encoder on the float-heavy analytics payloads. Produces the same
+compact UTF-8 output as DRF's JSONRenderer; anything orjson cannot encode
+natively (Decimal, lazy strings, querysets, ...) goes through DRF's encoder.
+EventStreamRenderer negotiates the Server-Sent Events progress stream.
+"""
+from decimal import Decimal
+
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+_fallback = JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        # As DRF's encoder: COERCE_DECIMAL_TO_STRING already turned serializer fields into strings
+        return float(obj)
+    return _fallback.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            # Pretty-printed output (browsable API, ?indent=) keeps DRF's formatting
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=_default, option=OPTIONS)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF negotiate Accept: text/event-stream (app.services.progress).
+    The stream itself is a StreamingHttpResponse; this only renders error
+    responses (401, 404, ...) as a single "error" event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b'event: error\ndata: ' + orjson.dumps(data, default=_default, option=OPTIONS) + b'\n\n'
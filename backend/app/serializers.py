@@ -277,6 +277,7 @@ class FinancialPeriodSerializer(serializers.ModelSerializer):
             'end_date',
             'label',
             'is_finalized',
+            'is_derived',
             'uploaded_file',
             'file_type',
             'created_at',
@@ -286,7 +287,7 @@ class FinancialPeriodSerializer(serializers.ModelSerializer):
             'operational_metrics',
             'ratios'
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'created_at', 'is_derived']
     
     def get_ratios(self, obj):
         if hasattr(obj, 'ratios'):
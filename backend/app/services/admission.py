@@ -0,0 +1,269 @@
+"""
+Admission Control Service
+Bounds how many heavy requests (uploads with PDF / Excel parsing, file exports
+and downloads, ratio recalculations) run at once, so a burst of them cannot
+occupy every worker thread and stall login, dashboard and other light
+endpoints. A streamed response keeps its slot until its body has been sent.
+
+Each route class (ADMISSION_LIMITS) has a semaphore of `concurrency` slots and
+a bounded wait queue of `queue` requests. A request that finds every slot busy
+waits up to ADMISSION_QUEUE_TIMEOUT seconds for one; when the queue is full or
+the wait times out it gets 503, and a user who already holds `per_user`
+running or queued requests of the class gets 429. Both carry Retry-After,
+estimated from the recent time requests of the class hold a slot.
+
+Limits and counters are per process (the Docker image runs one uvicorn
+process); queue depth and rejections are exposed at /api/admission-stats/.
+"""
+import functools
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+DEFAULT_LIMITS = {'concurrency': 2, 'queue': 4, 'per_user': 1}
+# Weight of the newest sample in the moving averages of wait / hold time
+SMOOTHING = 0.2
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enabled():
+    return _setting('ADMISSION_CONTROL', True)
+
+
+def client_key(request):
+    """Per-user limits key: the authenticated user, else the client address."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"addr:{request.META.get('REMOTE_ADDR', '')}"
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Slot:
+    """A held slot; release() is idempotent so a streamed body can release it from several places."""
+
+    def __init__(self, limiter, key):
+        self.limiter = limiter
+        self.key = key
+        self.acquired = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.limiter.release(self)
+
+
+class RouteLimiter:
+    """Semaphore with a bounded FIFO-ish wait queue and a per-user cap (running + queued)."""
+
+    def __init__(self, route, concurrency, queue, per_user):
+        self.route = route
+        self.concurrency = max(1, concurrency)
+        self.queue = max(0, queue)
+        self.per_user = max(1, per_user)
+        self.active = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.users = Counter()
+        self.counts = Counter()
+        self.avg_wait = 0.0
+        self.avg_hold = None
+        self._cond = threading.Condition()
+
+    def _retry_after(self, ahead):
+        """Seconds until `ahead` requests have gone through the slots, at the average hold time."""
+        hold = self.avg_hold if self.avg_hold is not None else 1.0
+        return max(1, math.ceil(hold * math.ceil(max(ahead, 1) / self.concurrency)))
+
+    def acquire(self, key, timeout):
+        with self._cond:
+            if self.users[key] >= self.per_user:
+                self.counts['rejected_user'] += 1
+                raise Rejected('user', self._retry_after(1))
+            if self.active < self.concurrency and not self.waiting:
+                return self._admit(key, 0.0)
+            if self.waiting >= self.queue:
+                self.counts['rejected_busy'] += 1
+                raise Rejected('busy', self._retry_after(self.waiting + 1))
+
+            self.users[key] += 1
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+            self.counts['queued'] += 1
+            started = time.monotonic()
+            deadline = started + timeout
+            try:
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counts['rejected_timeout'] += 1
+                        self.users[key] -= 1
+                        if not self.users[key]:
+                            del self.users[key]
+                        raise Rejected('timeout', self._retry_after(self.waiting))
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.users[key] -= 1
+            return self._admit(key, time.monotonic() - started)
+
+    def _admit(self, key, waited):
+        self.active += 1
+        self.users[key] += 1
+        self.counts['admitted'] += 1
+        self.avg_wait += SMOOTHING * (waited - self.avg_wait)
+        return Slot(self, key)
+
+    def release(self, slot):
+        held = time.monotonic() - slot.acquired
+        with self._cond:
+            self.active -= 1
+            self.users[slot.key] -= 1
+            if not self.users[slot.key]:
+                del self.users[slot.key]
+            self.avg_hold = held if self.avg_hold is None else self.avg_hold + SMOOTHING * (held - self.avg_hold)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'concurrency': self.concurrency,
+                'queue': self.queue,
+                'per_user': self.per_user,
+                'active': self.active,
+                'waiting': self.waiting,
+                'peak_waiting': self.peak_waiting,
+                'users': len(self.users),
+                'admitted': self.counts['admitted'],
+                'queued': self.counts['queued'],
+                'rejected': {
+                    'busy': self.counts['rejected_busy'],
+                    'timeout': self.counts['rejected_timeout'],
+                    'user': self.counts['rejected_user'],
+                },
+                'avg_wait_ms': round(self.avg_wait * 1000),
+                'avg_hold_ms': round(self.avg_hold * 1000) if self.avg_hold is not None else None,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter(route):
+    with _limiters_lock:
+        if route not in _limiters:
+            limits = dict(DEFAULT_LIMITS, **_setting('ADMISSION_LIMITS', {}).get(route, {}))
+            _limiters[route] = RouteLimiter(route, **limits)
+        return _limiters[route]
+
+
+def _rejection(route, rejected):
+    if rejected.reason == 'user':
+        code = status.HTTP_429_TOO_MANY_REQUESTS
+        message = f"Too many {route} requests of yours are already running; retry in {rejected.retry_after}s"
+    else:
+        code = status.HTTP_503_SERVICE_UNAVAILABLE
+        message = f"The server is busy with other {route} requests; retry in {rejected.retry_after}s"
+    response = Response({
+        "status": "failed",
+        "response_code": code,
+        "message": message
+    }, status=code)
+    response['Retry-After'] = str(rejected.retry_after)
+    return response
+
+
+class _SlotContent:
+    """
+    Streaming content that holds the slot until the body has been sent: released
+    when iteration ends or fails, and from close(), which Django calls on the
+    content when the response is closed (also for a body that never started).
+    """
+
+    def __init__(self, content, slot):
+        self.content = content
+        self.slot = slot
+
+    def close(self):
+        self.slot.release()
+
+
+class _SlotIterator(_SlotContent):
+    def __iter__(self):
+        try:
+            yield from self.content
+        finally:
+            self.slot.release()
+
+
+class _AsyncSlotIterator(_SlotContent):
+    async def __aiter__(self):
+        try:
+            async for chunk in self.content:
+                yield chunk
+        finally:
+            self.slot.release()
+
+
+def _release_after(slot, response):
+    if response.streaming:
+        # The body (streamed export, file) is produced after the view returns
+        content_class = _AsyncSlotIterator if response.is_async else _SlotIterator
+        response.streaming_content = content_class(response.streaming_content, slot)
+    else:
+        slot.release()
+    return response
+
+
+def admission_control(route):
+    """
+    Decorator for a DRF view's handler (get/post): run it in a slot of `route`'s
+    limiter, or answer 429 / 503 with Retry-After. Runs after DRF has
+    authenticated the request, so per-user limits see the JWT user.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if not enabled():
+                return view_method(self, request, *args, **kwargs)
+            try:
+                slot = limiter(route).acquire(client_key(request), _setting('ADMISSION_QUEUE_TIMEOUT', 15))
+            except Rejected as rejected:
+                return _rejection(route, rejected)
+            try:
+                response = view_method(self, request, *args, **kwargs)
+            except BaseException:
+                slot.release()
+                raise
+            return _release_after(slot, response)
+        return wrapper
+    return decorator
+
+
+def admission_stats():
+    with _limiters_lock:
+        routes = list(_limiters)
+    configured = set(_setting('ADMISSION_LIMITS', {}))
+    return {
+        'enabled': enabled(),
+        'queue_timeout': _setting('ADMISSION_QUEUE_TIMEOUT', 15),
+        'process': os.getpid(),
+        'routes': {route: limiter(route).stats() for route in sorted(configured | set(routes))},
+    }
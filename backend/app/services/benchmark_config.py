@@ -1,6 +1,9 @@
 """
 Get/set ratio benchmarks. Merges DB-stored values with defaults from config.
 """
+import hashlib
+import json
+
 from app.models import AppConfig
 from app.config.ratio_benchmarks import DEFAULT_RATIO_BENCHMARKS
 
@@ -39,3 +42,11 @@ def set_ratio_benchmarks(data):
         defaults={"value": to_save},
     )
     return obj
+
+
+def get_benchmarks_version(benchmarks=None):
+    """Short stable hash of the merged benchmarks, used to key caches that depend on them."""
+    if benchmarks is None:
+        benchmarks = get_ratio_benchmarks()
+    payload = json.dumps(benchmarks, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
@@ -0,0 +1,157 @@
+"""
+Blob Storage Service
+Reference counting and garbage collection for content-addressed uploads
+(app.storage). Every FinancialPeriod whose uploaded_file points at a blob
+holds one reference; signals keep StoredBlob.ref_count current, and the
+garbage collector reconciles the counts against the periods table before
+deleting blobs nobody links to.
+"""
+import logging
+import os
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from app.models import FinancialPeriod, StoredBlob
+from app.storage import BLOB_PREFIX, upload_storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRACE = timedelta(hours=1)
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def acquire(name, sha256=''):
+    """Add a reference to the blob stored under `name`."""
+    if not is_blob(name):
+        return
+    blob, _ = StoredBlob.objects.get_or_create(
+        name=name,
+        defaults={'sha256': sha256, 'size': upload_storage.size(name) if upload_storage.exists(name) else 0},
+    )
+    StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1, updated_at=timezone.now())
+
+
+def release(name):
+    """Drop a reference; the file stays until collect_garbage() finds it unreferenced."""
+    if not is_blob(name):
+        return
+    StoredBlob.objects.filter(name=name, ref_count__gt=0).update(
+        ref_count=F('ref_count') - 1, updated_at=timezone.now()
+    )
+
+
+def reconcile():
+    """Reset every ref_count to the number of periods linking to the blob. Returns rows changed."""
+    actual = dict(
+        FinancialPeriod.objects.filter(uploaded_file__startswith=BLOB_PREFIX)
+        .values_list('uploaded_file').annotate(n=Count('id'))
+    )
+    changed = 0
+    now = timezone.now()
+    with transaction.atomic():
+        blobs = {blob.name: blob for blob in StoredBlob.objects.select_for_update()}
+        for name, count in actual.items():
+            if name not in blobs:
+                blobs[name] = StoredBlob.objects.create(
+                    name=name, sha256=os.path.basename(name).split('.')[0],
+                    size=upload_storage.size(name) if upload_storage.exists(name) else 0,
+                )
+        stale = []
+        for name, blob in blobs.items():
+            count = actual.get(name, 0)
+            if blob.ref_count != count:
+                blob.ref_count, blob.updated_at = count, now
+                stale.append(blob)
+        StoredBlob.objects.bulk_update(stale, ['ref_count', 'updated_at'])
+        changed = len(stale)
+    return changed
+
+
+def _old_enough(name, cutoff):
+    try:
+        return upload_storage.get_modified_time(name) < cutoff
+    except FileNotFoundError:
+        return True
+
+
+def collect_garbage(grace=DEFAULT_GRACE, dry_run=False):
+    """
+    Delete unreferenced blobs and blob files with no StoredBlob row, skipping
+    anything touched within `grace` so uploads in flight are never collected.
+    Returns {"reconciled", "deleted", "orphans", "bytes"}.
+    """
+    reconciled = reconcile()
+    cutoff = timezone.now() - grace
+    deleted = orphans = freed = 0
+
+    for blob in StoredBlob.objects.filter(ref_count=0, updated_at__lt=cutoff):
+        if not _old_enough(blob.name, cutoff):
+            continue
+        if not dry_run:
+            # Conditional delete: a concurrent upload may have re-acquired it
+            if not StoredBlob.objects.filter(pk=blob.pk, ref_count=0).delete()[0]:
+                continue
+            upload_storage.delete(blob.name)
+        deleted += 1
+        freed += blob.size
+
+    known = set(StoredBlob.objects.values_list('name', flat=True))
+    root = upload_storage.path(BLOB_PREFIX)
+    for directory, _, files in os.walk(root) if os.path.isdir(root) else ():
+        for filename in files:
+            name = os.path.relpath(os.path.join(directory, filename), upload_storage.location).replace(os.sep, '/')
+            if name in known or not _old_enough(name, cutoff):
+                continue
+            size = upload_storage.size(name)
+            if not dry_run:
+                upload_storage.delete(name)
+            orphans += 1
+            freed += size
+
+    return {"reconciled": reconciled, "deleted": deleted, "orphans": orphans, "bytes": freed}
+
+
+def adopt_legacy_files(dry_run=False):
+    """
+    Move uploads stored under the old per-period paths into blob storage,
+    repointing their periods. Legacy files are removed once no period uses them.
+    Returns (periods moved, legacy files removed).
+    """
+    legacy = (
+        FinancialPeriod.objects.exclude(uploaded_file='').exclude(uploaded_file__isnull=True)
+        .exclude(uploaded_file__startswith=BLOB_PREFIX)
+    )
+    moved, removed = 0, 0
+    old_names = set()
+    for period in legacy:
+        old_name = period.uploaded_file.name
+        if not upload_storage.exists(old_name):
+            logger.warning(f"Legacy upload for period {period.id} is missing: {old_name}")
+            continue
+        moved += 1
+        old_names.add(old_name)
+        if dry_run:
+            continue
+        with upload_storage.open(old_name, 'rb') as handle:
+            new_name = upload_storage.save(old_name, File(handle, old_name))
+        sha256 = os.path.basename(new_name).split('.')[0]
+        # update() skips the save signals, so take the reference here
+        FinancialPeriod.objects.filter(pk=period.pk).update(
+            uploaded_file=new_name, uploaded_file_sha256=sha256,
+            uploaded_file_name=period.uploaded_file_name or os.path.basename(old_name),
+        )
+        acquire(new_name, sha256)
+
+    if not dry_run:
+        still_used = set(FinancialPeriod.objects.filter(uploaded_file__in=old_names).values_list('uploaded_file', flat=True))
+        for name in old_names - still_used:
+            upload_storage.delete(name)
+            removed += 1
+    return moved, removed
@@ -0,0 +1,86 @@
+"""
+Bulk Export Service
+Streams every period with its statements and ratios as CSV or JSON lines.
+Rows come from one LEFT JOIN query read through a server-side cursor in
+fixed-size chunks, so memory stays flat however many periods exist.
+Under ASGI the view streams the same generators through
+app.services.streaming.async_chunks(), which Django does not buffer.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from app.models import (
+    BalanceSheet, FinancialPeriod, OperationalMetrics, ProfitAndLoss, RatioResult, TradingAccount,
+)
+
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+CHUNK_SIZE = 2000
+
+PERIOD_FIELDS = ('id', 'label', 'period_type', 'start_date', 'end_date', 'is_finalized', 'is_derived')
+
+# Reverse one-to-one accessor on FinancialPeriod -> model; columns are "<accessor>.<field>"
+STATEMENT_MODELS = (
+    ('trading_account', TradingAccount),
+    ('profit_loss', ProfitAndLoss),
+    ('balance_sheet', BalanceSheet),
+    ('operational_metrics', OperationalMetrics),
+    ('ratios', RatioResult),
+)
+SKIPPED_FIELDS = ('id', 'period')
+
+
+def export_columns():
+    """[(column name, ORM lookup)] in output order."""
+    columns = [(name, name) for name in PERIOD_FIELDS]
+    for accessor, model in STATEMENT_MODELS:
+        for field in model._meta.concrete_fields:
+            if field.name not in SKIPPED_FIELDS:
+                columns.append((f"{accessor}.{field.name}", f"{accessor}__{field.name}"))
+    return columns
+
+
+def export_rows(columns, chunk_size=CHUNK_SIZE, periods=None):
+    """Value tuples for every period (or the `periods` queryset), oldest first, from a single joined query."""
+    if periods is None:
+        periods = FinancialPeriod.objects.all()
+    return (
+        periods
+        .order_by('start_date', 'period_type', 'id')
+        .values_list(*[lookup for _, lookup in columns])
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Echo:
+    """File-like object whose write() returns the value, so csv.writer yields lines."""
+
+    def write(self, value):
+        return value
+
+
+def _json_cell(value):
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+def iter_csv(chunk_size=CHUNK_SIZE):
+    columns = export_columns()
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in export_rows(columns, chunk_size):
+        yield writer.writerow([_json_cell(value) for value in row])
+
+
+def iter_jsonl(chunk_size=CHUNK_SIZE):
+    columns = export_columns()
+    names = [name for name, _ in columns]
+    for row in export_rows(columns, chunk_size):
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def iter_export(export_format, chunk_size=CHUNK_SIZE):
+    if export_format == 'csv':
+        return iter_csv(chunk_size)
+    return iter_jsonl(chunk_size)
@@ -0,0 +1,120 @@
+"""
+Columnar Layout Service
+Opt-in ?layout=columnar for chart-heavy endpoints: a list of per-period (or
+per-ratio) dicts becomes one array per field plus a shared index, so each key
+is sent once instead of once per row. Nested per-row dicts that charts read as
+their own series (e.g. traffic_light_status) are kept as column groups.
+
+    {"layout": "columnar", "length": 3,
+     "index": {"id": [...], "label": [...]},
+     "columns": {"net_margin": [...], ...},
+     "groups": {"traffic_light_status": {"net_margin": [...], ...}}}
+"""
+import functools
+
+from asgiref.sync import iscoroutinefunction
+from rest_framework import status
+from rest_framework.response import Response
+
+from app.services.ratio_series import SERIES_FIELDS
+
+LAYOUTS = ('rows', 'columnar')
+DEFAULT_LAYOUT = 'rows'
+
+
+def to_columns(rows, index_fields, groups=()):
+    """
+    Columnar form of `rows` (a list of dicts). Fields appear in first-seen
+    order; a field missing from a row is None in that row's slot.
+    """
+    n = len(rows)
+    index = {field: [row.get(field) for row in rows] for field in index_fields}
+
+    columns = {}
+    grouped = {group: {} for group in groups}
+    for i, row in enumerate(rows):
+        for field, value in row.items():
+            if field in index:
+                continue
+            if field in grouped:
+                for key, item in (value or {}).items():
+                    grouped[field].setdefault(key, [None] * n)[i] = item
+            else:
+                columns.setdefault(field, [None] * n)[i] = value
+
+    result = {"layout": "columnar", "length": n, "index": index, "columns": columns}
+    if groups:
+        result["groups"] = grouped
+    return result
+
+
+def ratio_rows_to_columns(rows):
+    """Serialized RatioResult rows (decimal strings) -> columns of floats."""
+    decimals = set(SERIES_FIELDS)
+    converted = [
+        {
+            field: float(value) if field in decimals and value is not None else value
+            for field, value in row.items()
+        }
+        for row in rows
+    ]
+    return to_columns(converted, ('id', 'period'), groups=('traffic_light_status',))
+
+
+def comparison_to_columns(ratios):
+    """{ratio name: {"period1": .., "period2": .., ...}} -> columns indexed by ratio name."""
+    names = list(ratios)
+    rows = [dict(ratios[name], ratio=name) for name in names]
+    return to_columns(rows, ('ratio',))
+
+
+def _check_layout(request):
+    """(layout, error response or None)."""
+    layout = request.query_params.get('layout', DEFAULT_LAYOUT)
+    if layout not in LAYOUTS:
+        return layout, Response({
+            "status": "failed",
+            "response_code": status.HTTP_400_BAD_REQUEST,
+            "message": f"layout must be one of: {', '.join(LAYOUTS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return layout, None
+
+
+def _reshape(transform, view, layout, response):
+    if layout == 'columnar' and response.status_code == 200 and isinstance(response, Response):
+        if transform is None:
+            response.data = view.columnar_data(response.data)
+        else:
+            response.data = transform(view, response.data)
+    return response
+
+
+def columnar_layout(transform=None):
+    """
+    Decorator for a DRF view's get/list (sync or async): validate ?layout and,
+    for 'columnar', replace the 200 response's data with transform(view, data)
+    (default: the view's columnar_data method). Place it innermost (below
+    cached_response / conditional_get) so the cache and the ETag both hold the
+    reshaped representation; the layout is part of the query string and
+    therefore of both keys.
+    """
+    def decorator(view_method):
+        if iscoroutinefunction(view_method):
+            @functools.wraps(view_method)
+            async def async_wrapper(self, request, *args, **kwargs):
+                layout, error = _check_layout(request)
+                if error is not None:
+                    return error
+                response = await view_method(self, request, *args, **kwargs)
+                return _reshape(transform, self, layout, response)
+            return async_wrapper
+
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            layout, error = _check_layout(request)
+            if error is not None:
+                return error
+            response = view_method(self, request, *args, **kwargs)
+            return _reshape(transform, self, layout, response)
+        return wrapper
+    return decorator
@@ -0,0 +1,100 @@
+"""
+Conditional GET Service
+Strong ETag and Last-Modified for JSON read endpoints, derived from the
+updated_at stamps of the rows a response is built from (and of the related
+rows it nests). A matching If-None-Match / If-Modified-Since is answered with
+304 before anything is serialized.
+"""
+import functools
+import hashlib
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from app.services.bulk_export import STATEMENT_MODELS
+
+# A period row plus every row nested under it (statements, RatioResult)
+PERIOD_STAMP_FIELDS = ('updated_at',) + tuple(f'{accessor}__updated_at' for accessor, _ in STATEMENT_MODELS)
+# A RatioResult plus its period's rows: the interpretation is built from the statements
+RATIO_STAMP_FIELDS = ('updated_at',) + tuple(
+    f'period__{field}' for field in PERIOD_STAMP_FIELDS if not field.startswith('ratios__')
+)
+
+
+def queryset_version(queryset, stamp_fields):
+    """
+    (version parts, last modified) for a queryset: row count, newest id, and the
+    newest stamp and number of stamped rows for each of `stamp_fields`
+    (the counts catch deleted related rows that were not the newest).
+    """
+    aggregates = {'rows': Count('pk', distinct=True), 'newest_id': Max('pk')}
+    for i, field in enumerate(stamp_fields):
+        aggregates[f'stamp_{i}'] = Max(field)
+        aggregates[f'stamped_{i}'] = Count(field)
+    summary = queryset.order_by().aggregate(**aggregates)
+    stamps = [summary[f'stamp_{i}'] for i in range(len(stamp_fields))]
+    parts = [summary['rows'], summary['newest_id']]
+    for i, stamp in enumerate(stamps):
+        parts += [stamp.isoformat() if stamp else '', summary[f'stamped_{i}']]
+    return parts, max((stamp for stamp in stamps if stamp is not None), default=None)
+
+
+def make_etag(*parts):
+    raw = '|'.join(str(part) for part in parts)
+    return '"{}"'.format(hashlib.sha256(raw.encode('utf-8')).hexdigest()[:40])
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(int(last_modified.timestamp()))
+    # Clients may keep the body but must revalidate before reusing it
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _check(stamp, view, request, args, kwargs):
+    """(etag, last modified, 304 response or None) for the request."""
+    if stamp is None:
+        parts, last_modified = view.response_version(request, *args, **kwargs)
+    else:
+        parts, last_modified = stamp(view, request, *args, **kwargs)
+    etag = make_etag(
+        type(view).__name__, request.get_full_path(),
+        getattr(request.accepted_renderer, 'format', ''), *parts,
+    )
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    return etag, last_modified, get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def conditional_get(stamp=None):
+    """
+    Decorator for a DRF view's get/list/retrieve (sync or async). `stamp(view, request, *args, **kwargs)`
+    (default: the view's response_version method) returns (version parts, last modified);
+    the ETag covers them plus the URL and the negotiated renderer, so one
+    representation always has one tag.
+    """
+    def decorator(view_method):
+        if iscoroutinefunction(view_method):
+            @functools.wraps(view_method)
+            async def async_wrapper(self, request, *args, **kwargs):
+                etag, last_modified, response = await sync_to_async(_check)(stamp, self, request, args, kwargs)
+                if response is None:
+                    response = await view_method(self, request, *args, **kwargs)
+                    if response.status_code != 200:
+                        return response
+                return set_validators(response, etag, last_modified)
+            return async_wrapper
+
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            etag, last_modified, response = _check(stamp, self, request, args, kwargs)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            return set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
@@ -0,0 +1,177 @@
+"""
+Export Artifact Cache
+Keeps generated export files (XLSX / DOCX workbooks, templates) on disk under
+EXPORT_CACHE_DIR, keyed by what they were built from: the period ids plus the
+updated_at stamps of the period, its statements and its RatioResult. The key
+doubles as the ETag, so unchanged exports are answered with 304 without
+touching the file, and repeat downloads skip regeneration. Files are evicted
+least-recently-used first once the directory exceeds EXPORT_CACHE_MAX_BYTES.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from app.models import FinancialPeriod
+from app.services.bulk_export import STATEMENT_MODELS
+from app.services.streaming import stream_file
+from app.services.workbook_export import file_response
+
+logger = logging.getLogger(__name__)
+
+# Bump when an export layout changes so old artifacts stop matching
+ARTIFACT_VERSION = 1
+
+STAMP_FIELDS = ['updated_at'] + [f'{accessor}__updated_at' for accessor, _ in STATEMENT_MODELS]
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def cache_dir():
+    return Path(_setting('EXPORT_CACHE_DIR', Path(settings.BASE_DIR) / 'export_cache'))
+
+
+def cache_enabled():
+    return _setting('EXPORT_CACHE_MAX_BYTES', 0) > 0
+
+
+def period_versions(periods):
+    """{period id: (version parts, last modified)} for a period queryset, from a single joined query."""
+    versions = {}
+    for period_id, *stamps in periods.values_list('id', *STAMP_FIELDS):
+        present = [stamp for stamp in stamps if stamp is not None]
+        parts = [period_id] + [stamp.isoformat() if stamp else '' for stamp in stamps]
+        versions[period_id] = (parts, max(present, default=None))
+    return versions
+
+
+def period_version(period_id):
+    """(version parts, last modified) for one period."""
+    return period_versions(FinancialPeriod.objects.filter(pk=period_id)).get(period_id, ([period_id], None))
+
+
+def periods_version(periods):
+    """(version parts, last modified) for a period queryset: count and newest stamp per table."""
+    summary = periods.aggregate(
+        count=Count('id'), newest_id=Max('id'),
+        **{f'stamp_{i}': Max(field) for i, field in enumerate(STAMP_FIELDS)}
+    )
+    stamps = [summary[f'stamp_{i}'] for i in range(len(STAMP_FIELDS))]
+    present = [stamp for stamp in stamps if stamp is not None]
+    parts = [summary['count'], summary['newest_id']] + [stamp.isoformat() if stamp else '' for stamp in stamps]
+    return parts, max(present, default=None)
+
+
+def cache_key(kind, parts):
+    raw = '|'.join(str(part) for part in [ARTIFACT_VERSION, kind, *parts])
+    return hashlib.sha256(raw.encode()).hexdigest()[:40]
+
+
+def store(path, document):
+    """Save `document` next to `path` and move it into place atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            document.save(tmp)
+        os.replace(tmp_name, path)
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+def evict(max_bytes=None, keep=None):
+    """
+    Delete least-recently-used artifacts until the cache fits in max_bytes, never
+    the file at `keep` (one about to be served). Returns files removed.
+    """
+    max_bytes = _setting('EXPORT_CACHE_MAX_BYTES', 0) if max_bytes is None else max_bytes
+    keep = os.path.abspath(keep) if keep is not None else None
+    entries = []
+    for entry in os.scandir(cache_dir()) if cache_dir().is_dir() else ():
+        if entry.is_file() and not entry.name.endswith('.tmp'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if os.path.abspath(path) == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def open_artifact(path):
+    """Open a cached artifact for reading and mark it used; None when it is not cached."""
+    try:
+        handle = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)  # mtime doubles as last-use time for LRU eviction
+    except FileNotFoundError:
+        pass  # evicted since it was opened; the handle still reads it
+    return handle
+
+
+def _open_cached(path, build):
+    handle = open_artifact(path)
+    if handle is not None:
+        return handle
+    store(path, build())
+    # Opened before evicting, so a concurrent eviction cannot remove it first
+    handle = open(path, 'rb')
+    try:
+        evict(keep=path)
+    except Exception:
+        handle.close()
+        raise
+    return handle
+
+
+def cached_file_response(request, kind, parts, filename, content_type, build, last_modified=None):
+    """
+    Serve an export artifact with ETag / Last-Modified, answering If-None-Match /
+    If-Modified-Since with 304. `build` returns an object with .save(file) and is
+    only called when the artifact is not already cached.
+    """
+    key = cache_key(kind, parts)
+    etag = f'"{key}"'
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        if cache_enabled():
+            extension = os.path.splitext(filename)[1]
+            try:
+                handle = _open_cached(cache_dir() / f"{key}{extension}", build)
+                response = stream_file(
+                    request, handle, as_attachment=True, filename=filename, content_type=content_type,
+                )
+            except OSError as e:
+                logger.error(f"Export cache unavailable for {kind}: {e}")
+        if response is None:
+            response = file_response(request, build(), filename, content_type)
+
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # Private data: clients may keep it but must revalidate each time
+    response['Cache-Control'] = 'private, no-cache'
+    return response
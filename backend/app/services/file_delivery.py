@@ -0,0 +1,127 @@
+"""
+File Delivery Service
+Serves stored uploads with a content-hash ETag, conditional GET (304),
+single byte-range requests (206 / 416) and an optional hand-off to the front
+proxy (X-Sendfile or X-Accel-Redirect, FILE_DELIVERY_MODE) so large files do
+not keep a Python worker busy.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+
+from app.services.streaming import stream_file
+
+
+MODE_DJANGO = 'django'
+MODE_SENDFILE = 'x-sendfile'
+MODE_ACCEL = 'x-accel'
+DELIVERY_MODES = (MODE_DJANGO, MODE_SENDFILE, MODE_ACCEL)
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def file_sha256(fileobj):
+    """Hex sha256 of a Django File / UploadedFile, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in fileobj.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def path_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single 'bytes=' range, None to serve the whole
+    file (no header, multiple ranges or unparseable), or False when unsatisfiable.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _offload_response(field_file, mode):
+    response = HttpResponse()
+    if mode == MODE_SENDFILE:
+        response['X-Sendfile'] = field_file.path
+    else:
+        prefix = _setting('FILE_DELIVERY_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(field_file.name.replace(os.sep, '/'))
+    # Let the proxy fill in type and length from the file itself
+    del response['Content-Type']
+    return response
+
+
+def deliver_file(request, field_file, sha256, filename=None):
+    """
+    Response for a stored FieldFile. `sha256` is its stored content hash (ETag).
+    Range requests are answered here in 'django' mode and left to the proxy otherwise.
+    """
+    path = field_file.path
+    stat = os.stat(path)
+    etag = f'"{sha256}"'
+    filename = filename or os.path.basename(field_file.name)
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        mode = _setting('FILE_DELIVERY_MODE', MODE_DJANGO)
+        if mode in (MODE_SENDFILE, MODE_ACCEL):
+            response = _offload_response(field_file, mode)
+        else:
+            content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), stat.st_size)
+            if_range = request.META.get('HTTP_IF_RANGE')
+            if byte_range is not None and if_range and if_range != etag:
+                byte_range = None  # the client's partial copy is stale: send everything
+            if byte_range is False:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+            elif byte_range is not None:
+                start, end = byte_range
+                handle = open(path, 'rb')
+                handle.seek(start)
+                response = stream_file(request, handle, length=end - start + 1, content_type=content_type)
+                response.status_code = 206
+                response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            else:
+                response = stream_file(request, open(path, 'rb'), content_type=content_type)
+        # Quotes, backslashes and non-ASCII names need escaping / RFC 5987 filename*
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(int(stat.st_mtime))
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = 'private, no-cache'
+    return response
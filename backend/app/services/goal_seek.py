@@ -0,0 +1,229 @@
+"""
+Goal-Seek Solver
+Finds the statement value that makes a ratio hit its benchmark (or a given
+target), e.g. the loans_advances level at which net_margin reaches the
+net_margin benchmark. Balances that earn or pay interest (loans, deposits,
+investments) re-price their interest flow at the period's current rate unless
+hold_rate is false. All goals are solved together by vectorized bisection
+over ratio_engine: the period's inputs are loaded once into arrays, so each
+iteration is one numpy pass with no database access.
+"""
+import numpy as np
+
+from app.services import ratio_engine
+from app.services.benchmark_config import get_ratio_benchmarks
+from app.services.ratio_calculator import RatioCalculator
+from app.services.ratio_engine import ArrayOps
+from app.services.scenario_simulator import RATE_LEVERS
+
+
+MAX_GOALS = 100
+MAX_ITERATIONS = 200
+MAX_EXPANSIONS = 40
+X_TOLERANCE = 1e-9   # relative width of the final bracket
+TOLERANCE = 1e-6     # accepted |ratio - target|
+
+# Statement values that may legitimately be negative get a bracket on both sides of zero
+SIGNED_FIELDS = ('net_profit', 'undistributed_profit')
+
+# Balance -> interest flow re-priced on it when hold_rate is on
+REPRICED_FLOWS = {balance: flow for flow, balance in RATE_LEVERS.values()}
+
+
+class GoalSeekError(ValueError):
+    """Invalid goal-seek request."""
+
+
+def parse_goals(goals, base_ratios, benchmarks):
+    """
+    Validate [{"field": ..., "ratio": ..., "target": optional, "hold_rate": optional}, ...].
+    Without a target the ratio's benchmark (ratio_engine.ideal_value) is used.
+    Returns a list of (field, ratio, target, target_source, hold_rate).
+    """
+    if not isinstance(goals, list) or not goals:
+        raise GoalSeekError("goals must be a non-empty list")
+    if len(goals) > MAX_GOALS:
+        raise GoalSeekError(f"At most {MAX_GOALS} goals per request")
+
+    parsed = []
+    for goal in goals:
+        if not isinstance(goal, dict):
+            raise GoalSeekError("each goal must be an object")
+        field, ratio = goal.get('field'), goal.get('ratio')
+        if not isinstance(field, str) or field not in ratio_engine.INPUT_FIELDS or field == 'staff_count':
+            raise GoalSeekError(f"Unknown field '{field}'")
+        if not isinstance(ratio, str) or ratio not in base_ratios or ratio in ratio_engine.BASE_VARIABLES:
+            raise GoalSeekError(f"Unknown ratio '{ratio}'")
+
+        target = goal.get('target')
+        source = 'request'
+        if target is None:
+            target = ratio_engine.ideal_value(ratio, benchmarks)
+            source = 'benchmark'
+            if target is None:
+                raise GoalSeekError(f"'{ratio}' has no benchmark; pass a target")
+        try:
+            target = float(target)
+        except (TypeError, ValueError):
+            raise GoalSeekError(f"target for '{ratio}' must be a number")
+        if not np.isfinite(target):
+            raise GoalSeekError(f"target for '{ratio}' must be finite")
+        hold_rate = goal.get('hold_rate', True)
+        if not isinstance(hold_rate, bool):
+            raise GoalSeekError("hold_rate must be true or false")
+        parsed.append((field, ratio, target, source, hold_rate and field in REPRICED_FLOWS))
+    return parsed
+
+
+class _GoalFunction:
+    """Ratio value per goal lane as a function of that lane's input value."""
+
+    def __init__(self, base, opening, goals):
+        self.opening = opening
+        self.count = len(goals)
+        self.template = {name: np.full(self.count, value) for name, value in base.items()}
+        lanes = np.arange(self.count)
+        fields = np.array([g[0] for g in goals])
+        ratios = np.array([g[1] for g in goals])
+        self.field_lanes = {f: lanes[fields == f] for f in set(fields.tolist())}
+        self.ratio_lanes = {r: lanes[ratios == r] for r in set(ratios.tolist())}
+        repriced = np.array([g[4] for g in goals])
+        self.repriced_lanes = {
+            f: lanes[(fields == f) & repriced] for f in REPRICED_FLOWS if (fields == f).any()
+        }
+        # Rates held on re-priced balances: flow / (averaged) balance at base values
+        base_avg = ratio_engine.average_balances(base, opening, ArrayOps)
+        self.rates = {
+            balance: ArrayOps.ratio(base[REPRICED_FLOWS[balance]], base_avg[balance])
+            for balance in self.repriced_lanes
+        }
+        self.evaluations = 0
+
+    def __call__(self, x):
+        inputs = dict(self.template)
+        for field, idx in self.field_lanes.items():
+            column = self.template[field].copy()
+            column[idx] = x[idx]
+            inputs[field] = column
+        if self.repriced_lanes:
+            avg = ratio_engine.average_balances(inputs, self.opening, ArrayOps)
+            for balance, idx in self.repriced_lanes.items():
+                flow = REPRICED_FLOWS[balance]
+                column = inputs[flow].copy()
+                column[idx] = self.rates[balance] * avg[balance][idx]
+                inputs[flow] = column
+        results = ratio_engine.calculate_all(inputs, ArrayOps, self.opening)
+        out = np.empty(self.count)
+        for ratio, idx in self.ratio_lanes.items():
+            out[idx] = results[ratio][idx]
+        self.evaluations += 1
+        return out
+
+
+def _bracket(func, targets, start, signed):
+    """
+    Step outwards from the base value in both directions with doubling steps until
+    the residual changes sign. Starting at the base value keeps the bracket on the
+    same side of the zero-denominator guards in the formulas.
+    Returns lo, hi, residual at lo, and the mask of bracketed lanes.
+    """
+    floor = np.where(signed, -np.inf, 0.0)
+    r_start = func(start) - targets
+    lo, hi = start.copy(), start.copy()
+    r_lo, r_hi = r_start.copy(), r_start.copy()
+    b_lo, b_hi, b_r_lo = start.copy(), start.copy(), r_start.copy()
+    found = r_start == 0
+    step = np.maximum(np.abs(start), 1.0) * 0.25
+    for _ in range(MAX_EXPANSIONS):
+        if found.all():
+            break
+        up = start + step
+        r_up = func(up) - targets
+        hit = ~found & (np.sign(r_up) * np.sign(r_hi) <= 0)
+        b_lo, b_hi, b_r_lo = np.where(hit, hi, b_lo), np.where(hit, up, b_hi), np.where(hit, r_hi, b_r_lo)
+        found |= hit
+        hi, r_hi = up, r_up
+
+        down = np.maximum(start - step, floor)
+        r_down = func(down) - targets
+        hit = ~found & (np.sign(r_down) * np.sign(r_lo) <= 0)
+        b_lo, b_hi, b_r_lo = np.where(hit, down, b_lo), np.where(hit, lo, b_hi), np.where(hit, r_down, b_r_lo)
+        found |= hit
+        lo, r_lo = down, r_down
+        step = step * 2.0
+    return b_lo, b_hi, b_r_lo, found
+
+
+def _bisect(func, targets, lo, hi, r_lo, active):
+    """Vectorized bisection on the lanes in `active`; returns (x, iterations)."""
+    lo, hi, r_lo = lo.copy(), hi.copy(), r_lo.copy()
+    iterations = 0
+    for iterations in range(1, MAX_ITERATIONS + 1):
+        mid = (lo + hi) / 2.0
+        r_mid = func(mid) - targets
+        left = np.sign(r_mid) * np.sign(r_lo) <= 0
+        hi = np.where(active & left, mid, hi)
+        lo = np.where(active & ~left, mid, lo)
+        r_lo = np.where(active & ~left, r_mid, r_lo)
+        width = np.abs(hi - lo)
+        if not np.any(active & (width > X_TOLERANCE * np.maximum(1.0, np.abs(mid)))):
+            break
+    return (lo + hi) / 2.0, iterations
+
+
+def goal_seek(period, goals, averaging=None):
+    """
+    Solve every goal for `period`. Nothing is saved.
+
+    Each result reports the base and solved statement value, the ratio at the
+    solution, and status 'solved', or 'unreachable' when no value of the field
+    brings the ratio to the target.
+    """
+    benchmarks = get_ratio_benchmarks()
+    calculator = RatioCalculator(period, benchmarks=benchmarks, averaging=averaging)
+    base_ratios = calculator.calculate_all_ratios()
+    parsed = parse_goals(goals, base_ratios, benchmarks)
+
+    base = {name: float(value) for name, value in calculator.engine_inputs().items()}
+    opening = calculator.opening_balances()
+    if opening is not None:
+        opening = {name: float(value) for name, value in opening.items()}
+
+    func = _GoalFunction(base, opening, parsed)
+    targets = np.array([g[2] for g in parsed])
+    start = np.array([base[g[0]] for g in parsed])
+    signed = np.array([g[0] in SIGNED_FIELDS for g in parsed])
+
+    lo, hi, r_lo, bracketed = _bracket(func, targets, start, signed)
+    x, iterations = _bisect(func, targets, lo, hi, r_lo, bracketed)
+    achieved = func(x)
+    solved = bracketed & (np.abs(achieved - targets) <= TOLERANCE * np.maximum(1.0, np.abs(targets)))
+
+    results = []
+    for i, (field, ratio, target, source, hold_rate) in enumerate(parsed):
+        item = {
+            "field": field,
+            "ratio": ratio,
+            "target": target,
+            "target_source": source,
+            "hold_rate": hold_rate,
+            "base_value": base[field],
+            "base_ratio": base_ratios[ratio],
+            "status": "solved" if solved[i] else "unreachable",
+        }
+        if solved[i]:
+            value = round(float(x[i]), 2)
+            item.update({
+                "solved_value": value,
+                "change": round(value - base[field], 2),
+                "change_pct": round((value - base[field]) / abs(base[field]) * 100.0, 4) if base[field] else None,
+                "ratio_at_solution": round(float(achieved[i]), 6),
+            })
+        results.append(item)
+
+    return {
+        "averaging": calculator.averaging,
+        "iterations": iterations,
+        "evaluations": func.evaluations,
+        "goals": results,
+    }
@@ -0,0 +1,115 @@
+"""
+Period Calendar Service
+Cached, sorted per-period_type index over FinancialPeriod date ranges for
+predecessor / successor / children / overlap lookups without hitting the DB.
+The cache is invalidated from FinancialPeriod post_save / post_delete signals.
+"""
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from app.models import FinancialPeriod
+
+
+CACHE_KEY = "period_calendar"
+
+PeriodSpan = namedtuple("PeriodSpan", ["id", "label", "period_type", "start_date", "end_date"])
+
+
+class PeriodCalendar:
+    """Periods grouped by period_type and sorted by start_date; lookups use binary search."""
+
+    def __init__(self, spans):
+        self._by_id = {}
+        self._by_label = {}
+        self._by_type = {}
+        for span in sorted(spans, key=lambda s: (s.start_date, s.end_date, s.id)):
+            self._by_id[span.id] = span
+            self._by_label[span.label] = span
+            self._by_type.setdefault(span.period_type, []).append(span)
+        self._starts = {
+            period_type: [s.start_date for s in spans_of_type]
+            for period_type, spans_of_type in self._by_type.items()
+        }
+
+    def get(self, period_id):
+        return self._by_id.get(period_id)
+
+    def find(self, label):
+        return self._by_label.get(label)
+
+    def periods(self, period_type):
+        return list(self._by_type.get(period_type, []))
+
+    def _position(self, span):
+        spans = self._by_type[span.period_type]
+        i = bisect_left(self._starts[span.period_type], span.start_date)
+        while spans[i].id != span.id:
+            i += 1
+        return i
+
+    def predecessor(self, period_id):
+        """The period of the same type immediately before this one, or None."""
+        span = self.get(period_id)
+        if span is None:
+            return None
+        i = self._position(span)
+        return self._by_type[span.period_type][i - 1] if i > 0 else None
+
+    def successor(self, period_id):
+        """The period of the same type immediately after this one, or None."""
+        span = self.get(period_id)
+        if span is None:
+            return None
+        spans = self._by_type[span.period_type]
+        i = self._position(span)
+        return spans[i + 1] if i + 1 < len(spans) else None
+
+    def within(self, start_date, end_date, period_type=None):
+        """Periods fully inside [start_date, end_date], ordered by start_date."""
+        types = [period_type] if period_type else list(self._by_type)
+        out = []
+        for t in types:
+            spans = self._by_type.get(t, [])
+            starts = self._starts.get(t, [])
+            for span in spans[bisect_left(starts, start_date):bisect_right(starts, end_date)]:
+                if span.end_date <= end_date:
+                    out.append(span)
+        return sorted(out, key=lambda s: (s.start_date, s.end_date))
+
+    def overlapping(self, start_date, end_date, period_type=None):
+        """Periods whose range intersects [start_date, end_date]."""
+        types = [period_type] if period_type else list(self._by_type)
+        out = []
+        for t in types:
+            spans = self._by_type.get(t, [])
+            starts = self._starts.get(t, [])
+            for span in spans[:bisect_right(starts, end_date)]:
+                if span.end_date >= start_date:
+                    out.append(span)
+        return sorted(out, key=lambda s: (s.start_date, s.end_date))
+
+    def children(self, period_id, period_type=None):
+        """Periods nested inside this one (e.g. all months of FY_2024_25), excluding itself."""
+        span = self.get(period_id)
+        if span is None:
+            return []
+        return [
+            s for s in self.within(span.start_date, span.end_date, period_type)
+            if s.id != span.id and s.period_type != span.period_type
+        ]
+
+
+def get_period_calendar():
+    """Return the cached PeriodCalendar, building it from a single query on a miss."""
+    calendar = cache.get(CACHE_KEY)
+    if calendar is None:
+        rows = FinancialPeriod.objects.values_list("id", "label", "period_type", "start_date", "end_date")
+        calendar = PeriodCalendar(PeriodSpan(*row) for row in rows)
+        cache.set(CACHE_KEY, calendar, None)
+    return calendar
+
+
+def invalidate_period_calendar():
+    cache.delete(CACHE_KEY)
@@ -0,0 +1,52 @@
+"""
+Hooks run after a period's statements were created, changed or deleted, to keep
+derived data (ratio statistics, roll-up parents, TTM series) in step with it.
+"""
+import logging
+
+from django.db import transaction
+
+from app.services.period_rollup import rollup_for_child, rollup_for_month
+from app.services.ratio_statistics import record_period
+from app.services.ttm_calculator import refresh_ttm_for_period, refresh_ttm_series
+
+logger = logging.getLogger(__name__)
+
+
+def after_period_data_changed(period):
+    """Refresh data derived from `period`. Failures are logged, never raised to the caller."""
+    try:
+        record_period(period)
+    except Exception as e:
+        logger.error(f"Ratio statistics update failed after period {period.id} changed: {e}")
+    try:
+        rollup_for_child(period)
+    except Exception as e:
+        logger.error(f"Roll-up failed after period {period.id} changed: {e}")
+    try:
+        refresh_ttm_for_period(period)
+    except Exception as e:
+        logger.error(f"TTM refresh failed after period {period.id} changed: {e}")
+
+
+def after_period_data_removed(period):
+    """
+    Refresh the roll-up parents and TTM series of a MONTHLY period whose row or
+    statements were deleted. Runs once the deletion has committed, so the
+    recomputation no longer sees the removed rows; failures are logged.
+    """
+    if period.period_type != 'MONTHLY':
+        return
+    period_id, start_date = period.id, period.start_date
+
+    def refresh():
+        try:
+            rollup_for_month(start_date)
+        except Exception as e:
+            logger.error(f"Roll-up failed after period {period_id} lost data: {e}")
+        try:
+            refresh_ttm_series()
+        except Exception as e:
+            logger.error(f"TTM refresh failed after period {period_id} lost data: {e}")
+
+    transaction.on_commit(refresh)
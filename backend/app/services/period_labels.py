@@ -120,3 +120,15 @@ def parse_period_label(label: str) -> dict:
         }
 
     return {}
+
+
+def parent_period_labels(start_date) -> list:
+    """
+    India FY parents of the month starting at start_date, smallest first.
+    e.g. 2024-05-01 -> ['Q1_FY_2024_25', 'H1_FY_2024_25', 'FY_2024_25']
+    """
+    fy_start = start_date.year if start_date.month >= 4 else start_date.year - 1
+    fy = f"FY_{fy_start}_{str(fy_start + 1)[-2:]}"
+    quarter = (start_date.month - 4) % 12 // 3 + 1
+    half = 1 if quarter <= 2 else 2
+    return [f"Q{quarter}_{fy}", f"H{half}_{fy}", fy]
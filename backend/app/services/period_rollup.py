@@ -0,0 +1,155 @@
+"""
+Period Roll-up Service
+Derives QUARTERLY / HALF_YEARLY / YEARLY periods from their MONTHLY children
+using the India FY calendar (Apr_2024 -> Q1_FY_2024_25 -> H1_FY_2024_25 -> FY_2024_25).
+
+Flows (P&L, trading purchases/trade charges/sales) are summed; opening stock
+comes from the first child, closing stock, BalanceSheet and staff count from
+the last child. Uploaded (non-derived) parents are never overwritten; derived
+parents missing a month are removed until the month is back.
+"""
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Q
+
+from app.models import (
+    FinancialPeriod, TradingAccount, ProfitAndLoss, BalanceSheet, OperationalMetrics,
+)
+from app.services.period_labels import parse_period_label, parent_period_labels
+from app.services.ratio_calculator import save_ratio_results
+from app.services.ttm_calculator import PL_FLOW_FIELDS, TA_FLOW_FIELDS, load_monthly_periods
+
+
+ROLLUP_MONTHS = {'QUARTERLY': 3, 'HALF_YEARLY': 6, 'YEARLY': 12}
+
+BALANCE_SHEET_FIELDS = [
+    'share_capital', 'deposits', 'borrowings', 'reserves_statutory_free',
+    'undistributed_profit', 'provisions', 'other_liabilities',
+    'cash_in_hand', 'cash_at_bank', 'investments', 'loans_advances',
+    'fixed_assets', 'other_assets', 'stock_in_trade',
+]
+
+
+def aggregate_children(children):
+    """Statement values for a parent period built from its ordered monthly children."""
+    first, last = children[0], children[-1]
+    trading = {
+        'opening_stock': first.trading_account.opening_stock,
+        'closing_stock': last.trading_account.closing_stock,
+    }
+    for field in TA_FLOW_FIELDS:
+        trading[field] = sum(getattr(c.trading_account, field) for c in children)
+    profit_loss = {
+        field: sum(getattr(c.profit_loss, field) for c in children)
+        for field in PL_FLOW_FIELDS
+    }
+    balance_sheet = {field: getattr(last.balance_sheet, field) for field in BALANCE_SHEET_FIELDS}
+    operational = {'staff_count': last.operational_metrics.staff_count}
+    return trading, profit_loss, balance_sheet, operational
+
+
+def _group_by_parent(months):
+    """Map parent label -> ordered monthly children."""
+    groups = {}
+    for month in months:
+        for label in parent_period_labels(month.start_date):
+            groups.setdefault(label, []).append(month)
+    return groups
+
+
+def _is_complete(label, children):
+    info = parse_period_label(label)
+    return bool(info) and len(children) == ROLLUP_MONTHS.get(info['period_type'])
+
+
+def _apply_rollup(label, children, existing):
+    """Create/update one derived parent. Returns it, or None if incomplete or uploaded."""
+    if not _is_complete(label, children):
+        return None
+    info = parse_period_label(label)
+    parent = existing.get(label)
+    if parent is not None and not parent.is_derived:
+        return None
+
+    start_date = date.fromisoformat(info['start_date'])
+    end_date = date.fromisoformat(info['end_date'])
+    if parent is None:
+        parent = FinancialPeriod.objects.create(
+            label=label,
+            period_type=info['period_type'],
+            start_date=start_date,
+            end_date=end_date,
+            is_finalized=False,
+            is_derived=True,
+        )
+    elif parent.start_date != start_date or parent.end_date != end_date:
+        parent.start_date = start_date
+        parent.end_date = end_date
+        parent.save(update_fields=['start_date', 'end_date'])
+
+    trading, profit_loss, balance_sheet, operational = aggregate_children(children)
+    TradingAccount.objects.update_or_create(period=parent, defaults=trading)
+    ProfitAndLoss.objects.update_or_create(period=parent, defaults=profit_loss)
+    BalanceSheet.objects.update_or_create(period=parent, defaults=balance_sheet)
+    OperationalMetrics.objects.update_or_create(period=parent, defaults=operational)
+    return parent
+
+
+def rollup_periods(months, labels=None, calculate=True):
+    """
+    Derive parents from the given monthly periods (ordered, with statements loaded).
+    Restrict to `labels` if given. Derived parents that are no longer complete are
+    deleted. Ratios for all derived parents are computed in one batch.
+    """
+    groups = _group_by_parent(months)
+    if labels is not None:
+        groups = {label: groups[label] for label in labels if label in groups}
+        existing = FinancialPeriod.objects.filter(label__in=list(labels))
+    else:
+        existing = FinancialPeriod.objects.filter(Q(label__in=list(groups)) | Q(is_derived=True))
+    existing = {p.label: p for p in existing}
+
+    with transaction.atomic():
+        # A derived parent that lost a month (deleted period or statement) no longer adds up
+        stale = [
+            label for label, parent in existing.items()
+            if parent.is_derived and not _is_complete(label, groups.get(label, []))
+        ]
+        if stale:
+            FinancialPeriod.objects.filter(id__in=[existing.pop(label).id for label in stale]).delete()
+        parents = [
+            parent for parent in (
+                _apply_rollup(label, children, existing) for label, children in groups.items()
+            )
+            if parent is not None
+        ]
+        if calculate and parents:
+            save_ratio_results(
+                FinancialPeriod.objects.filter(id__in=[p.id for p in parents]).select_related(
+                    'trading_account', 'profit_loss', 'balance_sheet', 'operational_metrics'
+                )
+            )
+    return parents
+
+
+def rollup_for_child(period, calculate=True):
+    """Incrementally recompute the quarter, half and FY containing a changed MONTHLY period."""
+    if period.period_type != 'MONTHLY':
+        return []
+    return rollup_for_month(period.start_date, calculate=calculate)
+
+
+def rollup_for_month(start_date, calculate=True):
+    """Recompute (or remove, if now incomplete) the derived quarter, half and FY containing `start_date`."""
+    if isinstance(start_date, str):
+        start_date = date.fromisoformat(start_date)
+    labels = parent_period_labels(start_date)
+    fy = parse_period_label(labels[-1])
+    months = load_monthly_periods(fy['start_date'], fy['end_date'])
+    return rollup_periods(months, labels=labels, calculate=calculate)
+
+
+def rollup_all(calculate=True):
+    """Derive every parent that has a complete set of monthly children."""
+    return rollup_periods(load_monthly_periods(), calculate=calculate)
@@ -3,22 +3,30 @@ Productivity Calculator Service
 Calculates per-employee metrics and efficiency indicators
 """
 from decimal import Decimal
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from app.models import FinancialPeriod
+from app.services.ratio_calculator import AVERAGING_AVERAGE, predecessor_balance_sheets
 
 
 class ProductivityCalculator:
     """Calculates productivity metrics for co-operative societies"""
     
-    def __init__(self, period: FinancialPeriod):
+    def __init__(self, period: FinancialPeriod, averaging=None, previous_balance_sheet=None):
         """
         Initialize calculator with a FinancialPeriod
         
         Args:
             period: FinancialPeriod instance with all related data
+            averaging: 'closing' or 'average' (default: settings.RATIO_AVERAGING_MODE)
+            previous_balance_sheet: Opening balances for 'average' mode (looked up when omitted)
         """
         self.period = period
+        self.averaging = averaging or getattr(settings, 'RATIO_AVERAGING_MODE', 'closing')
         self._validate_period_data()
+        if self.averaging == AVERAGING_AVERAGE and previous_balance_sheet is None:
+            previous_balance_sheet = predecessor_balance_sheets([period]).get(period.pk)
+        self.previous_balance_sheet = previous_balance_sheet
         
     def _validate_period_data(self):
         """Ensure all required financial statements exist"""
@@ -34,14 +42,19 @@ class ProductivityCalculator:
         Calculate per employee business (in Lakhs)
         Formula: (Average Deposit + Average Loan) / Staff Count / 100000
         
-        Note: Using current period values as average (can be enhanced with historical data)
+        Note: Averages are (opening + closing) / 2 in 'average' mode when the previous
+        period's balance sheet is available, otherwise current period values are used
         """
         bs = self.period.balance_sheet
         ops = self.period.operational_metrics
         
         if ops.staff_count > 0:
-            avg_deposit = bs.deposits  # Using current period value
-            avg_loan = bs.loans_advances  # Using current period value
+            avg_deposit = bs.deposits
+            avg_loan = bs.loans_advances
+            prev = self.previous_balance_sheet
+            if self.averaging == AVERAGING_AVERAGE and prev is not None:
+                avg_deposit = (prev.deposits + bs.deposits) / Decimal('2')
+                avg_loan = (prev.loans_advances + bs.loans_advances) / Decimal('2')
             return float((avg_deposit + avg_loan) / Decimal(str(ops.staff_count)) / Decimal('100000.0'))
         return 0.0
     
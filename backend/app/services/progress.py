@@ -0,0 +1,137 @@
+"""
+Progress Events Service
+Stage events (received, hashed, parsed sheet, persisted, ratios calculated,
+done / failed) for uploads and ratio recalculations, streamed to clients over
+Server-Sent Events by ProgressStreamView (/api/progress/<task_id>/).
+
+The client chooses the task id, sends it with the long request (X-Progress-Id
+header or a progress_id field) and subscribes to the stream at the same time.
+Events are kept in the Django cache (PROGRESS_CACHE_ALIAS) for PROGRESS_TTL
+seconds, so with a shared cache (file / db backend) any worker process can
+stream them; a subscriber that connects late or reconnects (Last-Event-ID)
+still receives every event.
+"""
+import asyncio
+import re
+import time
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+TASK_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+TERMINAL_STAGES = ('done', 'failed')
+KEY_PREFIX = 'progress'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cache():
+    return caches[_setting('PROGRESS_CACHE_ALIAS', 'default')]
+
+
+def _key(task_id, suffix):
+    return f"{KEY_PREFIX}:{task_id}:{suffix}"
+
+
+def task_id_from(request):
+    """The client's task id for a DRF request, or None when absent or malformed."""
+    task_id = request.META.get('HTTP_X_PROGRESS_ID') or request.query_params.get('progress_id')
+    if not task_id and hasattr(request.data, 'get'):
+        task_id = request.data.get('progress_id')
+    if task_id and TASK_ID_PATTERN.match(str(task_id)):
+        return str(task_id)
+    return None
+
+
+class ProgressReporter:
+    """
+    Records the stage events of one task. Without a task id every call is a
+    no-op, so views report unconditionally.
+    """
+
+    def __init__(self, task_id, kind, user=None):
+        self.task_id = task_id
+        self.kind = kind
+        self.owner = getattr(user, 'pk', None)
+        self.started = time.monotonic()
+
+    @classmethod
+    def for_request(cls, request, kind):
+        return cls(task_id_from(request), kind, request.user)
+
+    def emit(self, stage, **detail):
+        if self.task_id is None:
+            return
+        ttl = _setting('PROGRESS_TTL', 3600)
+        cache = _cache()
+        if cache.add(_key(self.task_id, 'seq'), 0, ttl):
+            cache.set(_key(self.task_id, 'owner'), self.owner, ttl)
+        seq = cache.incr(_key(self.task_id, 'seq'))
+        cache.set(_key(self.task_id, seq), {
+            'seq': seq,
+            'task': self.task_id,
+            'kind': self.kind,
+            'stage': stage,
+            'at': timezone.now().isoformat(),
+            'elapsed_ms': round((time.monotonic() - self.started) * 1000),
+            **detail,
+        }, ttl)
+
+    def finish(self, response):
+        """Emit 'done' or 'failed' from the view's response (failures may still be HTTP 200)."""
+        data = response.data if isinstance(getattr(response, 'data', None), dict) else {}
+        if response.status_code < 400 and data.get('status') != 'failed':
+            self.emit('done', **{key: data[key] for key in ('message', 'period_id', 'period_label') if key in data})
+        else:
+            self.emit('failed', message=data.get('message'))
+        return response
+
+
+def events_since(task_id, after=0):
+    """(owner user id or None, events with seq > after, in order)."""
+    cache = _cache()
+    last = cache.get(_key(task_id, 'seq')) or 0
+    if last <= after:
+        return cache.get(_key(task_id, 'owner')), []
+    found = cache.get_many([_key(task_id, seq) for seq in range(after + 1, last + 1)])
+    events = [event for event in found.values() if event]
+    return cache.get(_key(task_id, 'owner')), sorted(events, key=lambda event: event['seq'])
+
+
+def format_event(event):
+    return b'id: %d\ndata: %s\n\n' % (event['seq'], orjson.dumps(event))
+
+
+async def event_stream(task_id, user_id, after=0):
+    """
+    SSE body: every event of `task_id` after seq `after`, ending with the task's
+    terminal event or after PROGRESS_STREAM_TIMEOUT seconds. The cache is
+    checked every PROGRESS_POLL_INTERVAL seconds; comment lines keep idle
+    connections open through proxies.
+    """
+    poll = _setting('PROGRESS_POLL_INTERVAL', 0.25)
+    deadline = time.monotonic() + _setting('PROGRESS_STREAM_TIMEOUT', 600)
+    keepalive_at = time.monotonic() + 15
+    yield b'retry: 2000\n\n'
+    while time.monotonic() < deadline:
+        owner, events = await sync_to_async(events_since)(task_id, after)
+        if owner is not None and owner != user_id:
+            # Someone else's task: end the stream without revealing it exists
+            return
+        for event in events:
+            after = event['seq']
+            yield format_event(event)
+            if event['stage'] in TERMINAL_STAGES:
+                return
+        if events:
+            keepalive_at = time.monotonic() + 15
+        elif time.monotonic() >= keepalive_at:
+            yield b': keep-alive\n\n'
+            keepalive_at = time.monotonic() + 15
+        await asyncio.sleep(poll)
+    yield b'event: timeout\ndata: {}\n\n'
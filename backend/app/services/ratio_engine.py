@@ -0,0 +1,379 @@
+"""
+Ratio Engine
+Ratio formulas and traffic-light rules shared by RatioCalculator (one period,
+Decimal inputs) and the scenario simulator (many scenarios, numpy arrays).
+Formulas are written once against a small set of arithmetic ops so both
+paths produce the same ratios.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+import numpy as np
+
+
+# Statement inputs used by the formulas (flattened across the four statements)
+TRADING_FIELDS = ['opening_stock', 'purchases', 'trade_charges', 'sales', 'closing_stock']
+PROFIT_LOSS_FIELDS = [
+    'interest_on_loans', 'interest_on_bank_ac', 'return_on_investment', 'miscellaneous_income',
+    'interest_on_deposits', 'interest_on_borrowings', 'establishment_contingencies', 'provisions',
+    'net_profit',
+]
+BALANCE_SHEET_FIELDS = [
+    'share_capital', 'deposits', 'borrowings', 'reserves_statutory_free', 'undistributed_profit',
+    'cash_at_bank', 'investments', 'loans_advances',
+]
+INPUT_FIELDS = TRADING_FIELDS + PROFIT_LOSS_FIELDS + BALANCE_SHEET_FIELDS + ['staff_count']
+
+# Balances averaged against period flows in 'average' mode
+AVERAGED_BALANCES = ['deposits', 'loans_advances', 'investments', 'working_fund']
+
+# Base variables are amounts, not ratios, and get no traffic light
+BASE_VARIABLES = ['working_fund', 'own_funds', 'average_stock', 'cogs']
+
+
+class DecimalOps:
+    """Scalar Decimal arithmetic returning floats (RatioCalculator)."""
+    two = Decimal('2.0')
+
+    @staticmethod
+    def pct(num, den):
+        return float((num / den) * Decimal('100.0')) if den > 0 else 0.0
+
+    @staticmethod
+    def ratio(num, den):
+        return float(num / den) if den > 0 else 0.0
+
+    @staticmethod
+    def lakhs(num, staff):
+        return float((num / staff) / Decimal('100000.0')) if staff > 0 else 0.0
+
+    @staticmethod
+    def when_positive(test, value):
+        return float(value) if test > 0 else 0.0
+
+
+class ArrayOps:
+    """Element-wise float64 arithmetic over numpy arrays (scenario simulator)."""
+    two = 2.0
+
+    @staticmethod
+    def ratio(num, den):
+        num, den = np.broadcast_arrays(np.asarray(num, dtype=float), np.asarray(den, dtype=float))
+        return np.divide(num, den, out=np.zeros(num.shape), where=den > 0)
+
+    @classmethod
+    def pct(cls, num, den):
+        return cls.ratio(num, den) * 100.0
+
+    @classmethod
+    def lakhs(cls, num, staff):
+        return cls.ratio(num, staff) / 100000.0
+
+    @staticmethod
+    def when_positive(test, value):
+        return np.where(np.asarray(test) > 0, value, 0.0)
+
+
+def working_fund(v):
+    return (
+        v['share_capital']
+        + v['deposits']
+        + v['borrowings']
+        + v['reserves_statutory_free']
+        + v['undistributed_profit']
+    )
+
+
+def own_funds(v):
+    return v['share_capital'] + v['reserves_statutory_free'] + v['undistributed_profit']
+
+
+def gross_profit(v):
+    return v['sales'] + v['closing_stock'] - (v['opening_stock'] + v['purchases'] + v['trade_charges'])
+
+
+def total_interest_income(v):
+    return v['interest_on_loans'] + v['interest_on_bank_ac'] + v['return_on_investment']
+
+
+def total_interest_expense(v):
+    return v['interest_on_deposits'] + v['interest_on_borrowings']
+
+
+def average_balances(v, opening, ops):
+    """
+    Balances used against period flows: closing balances, or (opening + closing) / 2
+    when opening balances (the previous period's closing) are given.
+    """
+    closing = {
+        'deposits': v['deposits'],
+        'loans_advances': v['loans_advances'],
+        'investments': v['investments'],
+        'working_fund': working_fund(v),
+    }
+    if opening is None:
+        return closing
+    return {name: (opening[name] + closing[name]) / ops.two for name in AVERAGED_BALANCES}
+
+
+def base_variables(v, ops):
+    return {
+        'working_fund': working_fund(v),
+        'own_funds': own_funds(v),
+        'average_stock': (v['opening_stock'] + v['closing_stock']) / ops.two,
+        'cogs': v['sales'] - gross_profit(v),
+    }
+
+
+def trading_ratios(v, ops):
+    return {
+        # Stock Turnover = COGS / Average Stock
+        'stock_turnover': ops.ratio(v['sales'] - gross_profit(v), (v['opening_stock'] + v['closing_stock']) / ops.two),
+        # Gross Profit Ratio = (Gross Profit / Sales) * 100
+        'gross_profit_ratio': ops.pct(gross_profit(v), v['sales']),
+        # Net Profit Ratio = (Net Profit / Sales) * 100
+        'net_profit_ratio': ops.pct(v['net_profit'], v['sales']),
+    }
+
+
+def fund_structure_ratios(v, ops):
+    """All as % of Working Fund (closing balances)."""
+    wf = working_fund(v)
+    return {
+        'net_own_funds': ops.when_positive(wf, own_funds(v)),
+        'own_fund_to_wf': ops.pct(own_funds(v), wf),
+        'deposits_to_wf': ops.pct(v['deposits'], wf),
+        'borrowings_to_wf': ops.pct(v['borrowings'], wf),
+        'loans_to_wf': ops.pct(v['loans_advances'], wf),
+        'investments_to_wf': ops.pct(v['investments'], wf),
+        # Earning Assets = Loans + Investments + Cash at Bank
+        'earning_assets_to_wf': ops.pct(v['loans_advances'] + v['investments'] + v['cash_at_bank'], wf),
+        # Interest Tagged Funds = Deposits + Borrowings
+        'interest_tagged_funds_to_wf': ops.pct(v['deposits'] + v['borrowings'], wf),
+    }
+
+
+def yield_cost_ratios(v, ops, avg):
+    """Yield and cost ratios against (averaged) balances."""
+    return {
+        'cost_of_deposits': ops.pct(v['interest_on_deposits'], avg['deposits']),
+        'yield_on_loans': ops.pct(v['interest_on_loans'], avg['loans_advances']),
+        'yield_on_investments': ops.pct(v['return_on_investment'], avg['investments']),
+        # Credit Deposit Ratio = (Loans / Deposits) * 100, closing balances
+        'credit_deposit_ratio': ops.pct(v['loans_advances'], v['deposits']),
+        'avg_cost_of_wf': ops.pct(total_interest_expense(v), avg['working_fund']),
+        'avg_yield_on_wf': ops.pct(total_interest_income(v), avg['working_fund']),
+        'misc_income_to_wf': ops.pct(v['miscellaneous_income'], avg['working_fund']),
+        'interest_exp_to_interest_income': ops.pct(total_interest_expense(v), total_interest_income(v)),
+    }
+
+
+def margin_ratios(v, ops, avg, yield_cost):
+    wf = avg['working_fund']
+    ratios = {}
+    # Gross Financial Margin = Avg Yield on WF - Avg Cost of WF
+    ratios['gross_fin_margin'] = yield_cost['avg_yield_on_wf'] - yield_cost['avg_cost_of_wf']
+    ratios['operating_cost_to_wf'] = ops.pct(v['establishment_contingencies'], wf)
+    # Net Financial Margin = Gross Fin Margin + Misc Income % - Op Cost %
+    ratios['net_fin_margin'] = (
+        ratios['gross_fin_margin'] + ops.pct(v['miscellaneous_income'], wf) - ratios['operating_cost_to_wf']
+    )
+    ratios['risk_cost_to_wf'] = ops.pct(v['provisions'], wf)
+    ratios['net_margin'] = ratios['net_fin_margin'] - ratios['risk_cost_to_wf']
+    return ratios
+
+
+def capital_efficiency_ratios(v, ops):
+    # Capital Turnover Ratio = Sales / (Share Capital + Reserves + Undistributed Profit)
+    return {'capital_turnover_ratio': ops.ratio(v['sales'], own_funds(v))}
+
+
+def productivity_ratios(v, ops, avg):
+    """Per-employee ratios in Lakhs."""
+    staff = v['staff_count']
+    contribution = (
+        total_interest_income(v) + v['miscellaneous_income'] - total_interest_expense(v)
+    )
+    return {
+        'per_employee_deposit': ops.lakhs(avg['deposits'], staff),
+        'per_employee_loan': ops.lakhs(avg['loans_advances'], staff),
+        'per_employee_contribution': ops.lakhs(contribution, staff),
+        'per_employee_operating_cost': ops.lakhs(v['establishment_contingencies'], staff),
+    }
+
+
+def calculate_all(v, ops, opening=None):
+    """All base variables and ratios for inputs `v` (see INPUT_FIELDS)."""
+    avg = average_balances(v, opening, ops)
+    yield_cost = yield_cost_ratios(v, ops, avg)
+    return {
+        **base_variables(v, ops),
+        **trading_ratios(v, ops),
+        **fund_structure_ratios(v, ops),
+        **yield_cost,
+        **margin_ratios(v, ops, avg, yield_cost),
+        **capital_efficiency_ratios(v, ops),
+        **productivity_ratios(v, ops, avg),
+    }
+
+
+# Traffic-light rules
+#   direction: 'min'  green at/above target, 'max' green at/below target,
+#              'band_low' / 'band_high' green inside [<benchmark>_min, <benchmark>_max]
+#              with the yellow zone below the min / above the max
+#   benchmark: benchmark key (band rules: key prefix)
+#   ratio:     target taken from another ratio of the same period (benchmark is the fallback)
+#   target = reference * scale + offset; yellow threshold = target * yellow + yellow_offset
+#   strict:    green needs a strict comparison
+#   zero_fallback: with a zero reference, green when the value is positive
+TrafficLightRule = namedtuple(
+    'TrafficLightRule',
+    'direction benchmark ratio yellow scale offset yellow_offset strict zero_fallback',
+    defaults=(None, None, 1.0, 1.0, 0.0, 0.0, False, False),
+)
+
+TRAFFIC_LIGHT_RULES = {
+    'stock_turnover': TrafficLightRule('min', 'stock_turnover', yellow=0.7),
+    'gross_profit_ratio': TrafficLightRule('band_low', 'gross_profit_ratio', yellow=0.7),
+    'net_profit_ratio': TrafficLightRule('min', ratio='gross_profit_ratio', scale=0.5, yellow=0.7),
+    'own_fund_to_wf': TrafficLightRule('min', 'own_fund_to_wf', yellow=0.7),
+    'loans_to_wf': TrafficLightRule('band_low', 'loans_to_wf', yellow=0.8),
+    'investments_to_wf': TrafficLightRule('band_low', 'investments_to_wf', yellow=0.7),
+    'earning_assets_to_wf': TrafficLightRule(
+        'min', 'earning_assets_to_wf_min', ratio='interest_tagged_funds_to_wf', yellow=0.9),
+    'interest_tagged_funds_to_wf': TrafficLightRule('max', ratio='earning_assets_to_wf', yellow=1.1),
+    'cost_of_deposits': TrafficLightRule('max', ratio='yield_on_loans', offset=-4.0, yellow_offset=1.0),
+    'yield_on_loans': TrafficLightRule('min', ratio='cost_of_deposits', offset=4.0, yellow_offset=-1.0),
+    'credit_deposit_ratio': TrafficLightRule('min', 'credit_deposit_ratio_min', yellow=0.8),
+    'misc_income_to_wf': TrafficLightRule('min', 'misc_income_to_wf_min', yellow=0.5),
+    'interest_exp_to_interest_income': TrafficLightRule('max', 'interest_exp_to_interest_income_max', yellow=1.1),
+    'gross_fin_margin': TrafficLightRule('min', 'gross_financial_margin', yellow=0.7),
+    'operating_cost_to_wf': TrafficLightRule('band_high', 'operating_cost_to_wf', yellow=1.2),
+    'net_fin_margin': TrafficLightRule('min', 'net_financial_margin', yellow=0.7),
+    'risk_cost_to_wf': TrafficLightRule('max', 'risk_cost_to_wf_max', yellow=2.0),
+    'net_margin': TrafficLightRule('min', 'net_margin', yellow=0.5),
+    'capital_turnover_ratio': TrafficLightRule('min', 'capital_turnover_ratio', yellow=0.7),
+    'per_employee_deposit': TrafficLightRule('min', 'per_employee_deposit_min', yellow=0.8),
+    'per_employee_loan': TrafficLightRule('min', 'per_employee_loan_min', yellow=0.8),
+    'per_employee_contribution': TrafficLightRule(
+        'min', ratio='per_employee_operating_cost', yellow=0.9, strict=True, zero_fallback=True),
+    'per_employee_operating_cost': TrafficLightRule(
+        'max', ratio='per_employee_contribution', yellow=1.1, strict=True),
+}
+
+
+def ideal_value(ratio_name, benchmarks):
+    """Single benchmark value for display (the lower bound for band rules)."""
+    rule = TRAFFIC_LIGHT_RULES.get(ratio_name)
+    if rule is None or rule.benchmark is None:
+        return None
+    if rule.direction == 'band_low':
+        return benchmarks.get(f'{rule.benchmark}_min')
+    if rule.direction == 'band_high':
+        return benchmarks.get(f'{rule.benchmark}_max')
+    return benchmarks.get(rule.benchmark)
+
+
+def traffic_light_status(ratio_name, value, benchmarks, reference=None):
+    """
+    'green', 'yellow' or 'red' for one ratio value.
+    `reference` is the target for ratio-relative rules (e.g. yield on loans for cost of deposits);
+    without it the rule's benchmark is used. No rule or no target gives 'yellow'.
+    """
+    rule = TRAFFIC_LIGHT_RULES.get(ratio_name)
+    if rule is None:
+        return 'yellow'
+
+    if rule.direction in ('band_low', 'band_high'):
+        mn = benchmarks.get(f'{rule.benchmark}_min')
+        mx = benchmarks.get(f'{rule.benchmark}_max')
+        bound = mn if rule.direction == 'band_low' else mx
+        if bound is None:
+            return 'yellow'
+        if mn is not None and mx is not None and mn <= value <= mx:
+            return 'green'
+        if rule.direction == 'band_low':
+            return 'yellow' if value >= bound * rule.yellow else 'red'
+        return 'yellow' if value <= bound * rule.yellow else 'red'
+
+    if reference is None and rule.benchmark is not None:
+        reference = benchmarks.get(rule.benchmark)
+    if reference is None:
+        return 'yellow'
+    if rule.zero_fallback and reference == 0:
+        return 'green' if value > 0 else 'red'
+
+    target = reference * rule.scale + rule.offset
+    threshold = target * rule.yellow + rule.yellow_offset
+    if rule.direction == 'min':
+        if value > target if rule.strict else value >= target:
+            return 'green'
+        return 'yellow' if value >= threshold else 'red'
+    if value < target if rule.strict else value <= target:
+        return 'green'
+    return 'yellow' if value <= threshold else 'red'
+
+
+def traffic_light_statuses(ratios, benchmarks):
+    """Statuses for every ratio in a calculate_all() result (scalar floats)."""
+    statuses = {}
+    for name, value in ratios.items():
+        if name in BASE_VARIABLES or not isinstance(value, (int, float)):
+            continue
+        rule = TRAFFIC_LIGHT_RULES.get(name)
+        reference = ratios.get(rule.ratio, 0) if rule is not None and rule.ratio else None
+        statuses[name] = traffic_light_status(name, value, benchmarks, reference)
+    return statuses
+
+
+def traffic_light_arrays(ratios, benchmarks):
+    """
+    Vectorized traffic_light_statuses(): ratios maps names to equal-length arrays,
+    result maps names to arrays of 'green' / 'yellow' / 'red'.
+    """
+    statuses = {}
+    for name, values in ratios.items():
+        if name in BASE_VARIABLES:
+            continue
+        values = np.asarray(values, dtype=float)
+        statuses[name] = _evaluate_array(TRAFFIC_LIGHT_RULES.get(name), values, ratios, benchmarks)
+    return statuses
+
+
+def _evaluate_array(rule, values, ratios, benchmarks):
+    yellow = np.full(values.shape, 'yellow', dtype='<U6')
+    if rule is None:
+        return yellow
+
+    if rule.direction in ('band_low', 'band_high'):
+        mn = benchmarks.get(f'{rule.benchmark}_min')
+        mx = benchmarks.get(f'{rule.benchmark}_max')
+        bound = mn if rule.direction == 'band_low' else mx
+        if bound is None:
+            return yellow
+        green = (values >= mn) & (values <= mx) if mn is not None and mx is not None else np.zeros(values.shape, bool)
+        if rule.direction == 'band_low':
+            amber = values >= bound * rule.yellow
+        else:
+            amber = values <= bound * rule.yellow
+        return np.select([green, amber], ['green', 'yellow'], 'red')
+
+    if rule.ratio:
+        reference = np.asarray(ratios.get(rule.ratio, 0), dtype=float)
+    else:
+        reference = benchmarks.get(rule.benchmark)
+        if reference is None:
+            return yellow
+
+    target = reference * rule.scale + rule.offset
+    threshold = target * rule.yellow + rule.yellow_offset
+    if rule.direction == 'min':
+        green = values > target if rule.strict else values >= target
+        amber = values >= threshold
+    else:
+        green = values < target if rule.strict else values <= target
+        amber = values <= threshold
+    result = np.select([green, amber], ['green', 'yellow'], 'red')
+    if rule.zero_fallback:
+        result = np.where(reference == 0, np.where(values > 0, 'green', 'red'), result)
+    return result
@@ -0,0 +1,189 @@
+"""
+Ratio Time-Series Service
+Builds columnar ratio series (dates + values per ratio) with rolling statistics
+so trend charts do not have to pull full RatioResult lists.
+"""
+import hashlib
+from datetime import date
+
+import numpy as np
+from django.core.cache import cache
+from django.db import models
+from django.db.models import Count, Max
+
+from app.models import RatioResult
+from app.services.benchmark_config import get_benchmarks_version
+
+
+# Every stored ratio column on RatioResult (DecimalFields), in model order
+SERIES_FIELDS = [
+    f.name for f in RatioResult._meta.get_fields()
+    if isinstance(f, models.DecimalField)
+]
+
+DEFAULT_WINDOW = 3
+MAX_WINDOW = 60
+CACHE_TIMEOUT = 60 * 60  # seconds
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()  # datetime64 day 0
+
+
+def _as_array(values):
+    """float64 array with NaN for missing (None) values."""
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def _to_list(n, index, rounded):
+    """Length-n list of None with the (Python float) `rounded` values placed at `index`."""
+    out = np.full(n, None, dtype=object)
+    out[index] = rounded.tolist()
+    return out.tolist()
+
+
+def rolling_mean_std(values, window):
+    """
+    Rolling mean and sample standard deviation over a fixed window.
+
+    Vectorized: window sums are differences of cumulative sums of the values
+    and their squares (taken around the series mean, which keeps the variance
+    free of cancellation). None values are treated as missing and a window
+    only produces output once it holds `window` non-null values.
+    """
+    n = len(values)
+    if n < window:
+        return [None] * n, [None] * n
+    arr = _as_array(values)
+    present = ~np.isnan(arr)
+    shift = arr[present].mean() if present.any() else 0.0
+    centred = np.where(present, arr - shift, 0.0)
+
+    def window_sums(x):
+        cumulative = np.concatenate(([0], np.cumsum(x)))
+        return cumulative[window:] - cumulative[:-window]
+
+    full = window_sums(present.astype(np.int64)) == window
+    total = window_sums(centred)[full]
+    total_sq = window_sums(centred * centred)[full]
+    index = np.flatnonzero(full) + window - 1
+
+    means = total / window + shift
+    if window > 1:
+        var = (total_sq - total * total / window) / (window - 1)
+        stds = np.where(var > 0, np.sqrt(np.maximum(var, 0.0)), 0.0)
+    else:
+        stds = np.zeros(len(total))
+    return _to_list(n, index, np.round(means, 4)), _to_list(n, index, np.round(stds, 4))
+
+
+def _year_earlier(dates):
+    """Same day one year earlier for a datetime64[D] array; 29 Feb maps to 28 Feb."""
+    months = dates.astype('datetime64[M]')
+    prior_months = months - 12
+    prior = prior_months.astype('datetime64[D]') + (dates - months.astype('datetime64[D]'))
+    overflow = prior.astype('datetime64[M]') != prior_months
+    last_day = (prior_months + 1).astype('datetime64[D]') - 1
+    return np.where(overflow, last_day, prior)
+
+
+def yoy_change(values, dates):
+    """
+    Percentage change against the period that started exactly one year earlier.
+    Periods are matched by start date (sorted-index lookup, then one vector
+    division), so gaps in the series are handled.
+    """
+    n = len(values)
+    if not n:
+        return []
+    arr = _as_array(values)
+    # Via ordinals: numpy converts date objects one by one and much more slowly
+    starts = (np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=n) - EPOCH_ORDINAL).astype('datetime64[D]')
+    order = np.argsort(starts, kind='stable')
+    ordered = starts[order]
+    prior = _year_earlier(starts)
+    # Last period starting on the prior date, as a date -> index mapping would give
+    pos = np.searchsorted(ordered, prior, side='right') - 1
+    found = (pos >= 0) & (ordered[np.maximum(pos, 0)] == prior)
+    previous = np.where(found, arr[order[np.maximum(pos, 0)]], np.nan)
+    valid = found & ~np.isnan(arr) & ~np.isnan(previous) & (previous != 0)
+    index = np.flatnonzero(valid)
+    change = (arr[index] - previous[index]) / np.abs(previous[index]) * 100.0
+    return _to_list(n, index, np.round(change, 2))
+
+
+def _min_max(values, dates):
+    """Return ({value, date}, {value, date}) for the smallest and largest non-null value."""
+    points = [(v, d) for v, d in zip(values, dates) if v is not None]
+    if not points:
+        return None, None
+    lo = min(points, key=lambda p: p[0])
+    hi = max(points, key=lambda p: p[0])
+    return (
+        {"value": lo[0], "date": lo[1].isoformat()},
+        {"value": hi[0], "date": hi[1].isoformat()},
+    )
+
+
+def build_ratio_series(ratios, period_type, date_from=None, date_to=None, window=DEFAULT_WINDOW):
+    """
+    Fetch the requested ratio columns in one query ordered by start_date and
+    attach rolling mean/stdev, YoY change and min/max for each ratio.
+    """
+    qs = RatioResult.objects.filter(period__period_type=period_type)
+    if date_from:
+        qs = qs.filter(period__start_date__gte=date_from)
+    if date_to:
+        qs = qs.filter(period__start_date__lte=date_to)
+    rows = list(
+        qs.order_by("period__start_date")
+        .values_list("period_id", "period__label", "period__start_date", *ratios)
+    )
+
+    period_ids = [r[0] for r in rows]
+    labels = [r[1] for r in rows]
+    dates = [r[2] for r in rows]
+
+    series = {}
+    for offset, name in enumerate(ratios, start=3):
+        values = [float(r[offset]) if r[offset] is not None else None for r in rows]
+        means, stds = rolling_mean_std(values, window)
+        lo, hi = _min_max(values, dates)
+        series[name] = {
+            "values": values,
+            "rolling_mean": means,
+            "rolling_std": stds,
+            "yoy_change": yoy_change(values, dates),
+            "min": lo,
+            "max": hi,
+        }
+
+    return {
+        "period_type": period_type,
+        "window": window,
+        "period_ids": period_ids,
+        "labels": labels,
+        "dates": [d.isoformat() for d in dates],
+        "series": series,
+    }
+
+
+def _data_stamp():
+    """Last RatioResult update time plus row count (the count catches deletions)."""
+    agg = RatioResult.objects.aggregate(last=Max("updated_at"), n=Count("id"))
+    last = agg["last"].isoformat() if agg["last"] else "none"
+    return f"{last}:{agg['n']}"
+
+
+def get_ratio_series(ratios, period_type, date_from=None, date_to=None, window=DEFAULT_WINDOW):
+    """Cached wrapper around build_ratio_series, keyed by benchmark version and data stamp."""
+    params = "|".join([
+        ",".join(ratios), period_type, str(date_from or ""), str(date_to or ""), str(window),
+    ])
+    key = "ratio_series:{}:{}:{}".format(
+        get_benchmarks_version(),
+        _data_stamp(),
+        hashlib.sha1(params.encode("utf-8")).hexdigest(),
+    )
+    data = cache.get(key)
+    if data is None:
+        data = build_ratio_series(ratios, period_type, date_from, date_to, window)
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
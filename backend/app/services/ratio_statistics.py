@@ -0,0 +1,225 @@
+"""
+Ratio Statistics Service
+Keeps a running mean / variance per period_type for every ratio and statement
+field (Welford's algorithm, stored in RatioStatistic) and scores a period's
+values against it with z-scores. Each period's contribution is stored in
+RatioStatisticSample, so replacing or deleting a period takes its old values
+out in O(1) instead of rescanning history.
+"""
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from app.models import RatioStatistic, RatioStatisticSample
+from app.services import ratio_engine
+from app.services.ratio_calculator import RATIO_RESULT_FIELDS
+
+
+KINDS = ('field', 'ratio')
+RATIO_DECIMALS = 2           # RatioResult precision; samples match what is stored
+MIN_RELATIVE_DEVIATION = 0.01  # near-constant series: ignore moves under 1% of the mean
+STATEMENT_RELATIONS = ('trading_account', 'profit_loss', 'balance_sheet', 'operational_metrics', 'ratios')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def period_values(period, all_ratios=None):
+    """
+    {"field": {...}, "ratio": {...}} of floats for a period with complete statements.
+    Ratios come from `all_ratios` when given, otherwise from the stored RatioResult.
+    """
+    statements = {
+        **{f: getattr(period.trading_account, f) for f in ratio_engine.TRADING_FIELDS},
+        **{f: getattr(period.profit_loss, f) for f in ratio_engine.PROFIT_LOSS_FIELDS},
+        **{f: getattr(period.balance_sheet, f) for f in ratio_engine.BALANCE_SHEET_FIELDS},
+        'staff_count': period.operational_metrics.staff_count,
+    }
+    if all_ratios is None:
+        result = period.ratios
+        all_ratios = {name: getattr(result, name) for name in RATIO_RESULT_FIELDS}
+    return {
+        'field': {name: float(value) for name, value in statements.items() if value is not None},
+        'ratio': {
+            name: round(float(all_ratios[name]), RATIO_DECIMALS) for name in RATIO_RESULT_FIELDS
+            if all_ratios.get(name) is not None
+        },
+    }
+
+
+def _add(stat, x):
+    stat.count += 1
+    delta = x - stat.mean
+    stat.mean += delta / stat.count
+    stat.m2 += delta * (x - stat.mean)
+
+
+def _remove(stat, x):
+    if stat.count <= 1:
+        stat.count, stat.mean, stat.m2 = 0, 0.0, 0.0
+        return
+    mean = (stat.count * stat.mean - x) / (stat.count - 1)
+    stat.m2 = max(stat.m2 - (x - stat.mean) * (x - mean), 0.0)
+    stat.mean = mean
+    stat.count -= 1
+
+
+def _leave_one_out(count, mean, m2, x):
+    """(count, mean, m2) with one observation x taken out, without touching the stored row."""
+    if count <= 1:
+        return 0, 0.0, 0.0
+    new_mean = (count * mean - x) / (count - 1)
+    return count - 1, new_mean, max(m2 - (x - mean) * (x - new_mean), 0.0)
+
+
+def _load_statistics(period_types, lock=False):
+    qs = RatioStatistic.objects.filter(period_type__in=period_types)
+    if lock:
+        qs = qs.select_for_update()
+    return {(s.period_type, s.kind, s.name): s for s in qs}
+
+
+def record_periods(items):
+    """
+    Fold [(period, values)] into the running statistics, replacing each period's
+    previous contribution. One read and one bulk write per table for the whole batch.
+    """
+    items = [(period, values) for period, values in items if values]
+    if not items:
+        return 0
+    with transaction.atomic():
+        samples = RatioStatisticSample.objects.select_for_update().in_bulk(
+            [p.id for p, _ in items], field_name='period_id'
+        )
+        # A period whose type was edited takes its old values out of the old type's rows
+        period_types = {p.period_type for p, _ in items} | {sample.period_type for sample in samples.values()}
+        stats = _load_statistics(period_types, lock=True)
+        created, touched = {}, set()
+
+        def stat_for(period_type, kind, name):
+            key = (period_type, kind, name)
+            if key not in stats:
+                stats[key] = created[key] = RatioStatistic(period_type=period_type, kind=kind, name=name)
+            touched.add(key)
+            return stats[key]
+
+        new_samples, changed_samples = [], []
+        for period, values in items:
+            sample = samples.get(period.id)
+            if sample is not None:
+                for kind in KINDS:
+                    for name, x in sample.values.get(kind, {}).items():
+                        _remove(stat_for(sample.period_type, kind, name), x)
+            for kind in KINDS:
+                for name, x in values.get(kind, {}).items():
+                    _add(stat_for(period.period_type, kind, name), x)
+            if sample is None:
+                sample = RatioStatisticSample(period=period)
+                samples[period.id] = sample
+                new_samples.append(sample)
+            elif sample not in changed_samples:
+                changed_samples.append(sample)
+            sample.period_type = period.period_type
+            sample.values = values
+
+        # bulk_update does not apply auto_now
+        now = timezone.now()
+        existing = [stats[key] for key in touched if key not in created]
+        for obj in existing + changed_samples:
+            obj.updated_at = now
+        RatioStatistic.objects.bulk_create(list(created.values()))
+        RatioStatistic.objects.bulk_update(existing, ['count', 'mean', 'm2', 'updated_at'])
+        RatioStatisticSample.objects.bulk_create(new_samples)
+        RatioStatisticSample.objects.bulk_update(changed_samples, ['period_type', 'values', 'updated_at'])
+    return len(items)
+
+
+def _with_statements(period):
+    from app.models import FinancialPeriod
+    return FinancialPeriod.objects.select_related(*STATEMENT_RELATIONS).get(pk=period.pk)
+
+
+def record_period(period, all_ratios=None):
+    """Record one period's current statements and ratios (reloaded unless `all_ratios` is given)."""
+    if all_ratios is None:
+        period = _with_statements(period)
+    return record_periods([(period, period_values(period, all_ratios))])
+
+
+def remove_sample(sample):
+    """Take a deleted period's contribution out of the statistics."""
+    with transaction.atomic():
+        stats = _load_statistics([sample.period_type], lock=True)
+        touched = []
+        for kind in KINDS:
+            for name, x in sample.values.get(kind, {}).items():
+                stat = stats.get((sample.period_type, kind, name))
+                if stat is not None:
+                    _remove(stat, x)
+                    stat.updated_at = timezone.now()
+                    touched.append(stat)
+        RatioStatistic.objects.bulk_update(touched, ['count', 'mean', 'm2', 'updated_at'])
+
+
+def score_period(period, values=None):
+    """
+    Flag statement fields and ratios whose z-score against the other periods of the
+    same type reaches ANOMALY_Z_THRESHOLD. The period's own recorded contribution is
+    left out, so scoring works before or after it was recorded.
+    Returns a list of flags, largest |z| first.
+    """
+    if values is None:
+        values = period_values(period)
+    threshold = _setting('ANOMALY_Z_THRESHOLD', 3.0)
+    min_samples = _setting('ANOMALY_MIN_SAMPLES', 5)
+
+    stats = _load_statistics([period.period_type])
+    sample = RatioStatisticSample.objects.filter(period=period).first()
+    own = sample.values if sample is not None and sample.period_type == period.period_type else {}
+
+    flags = []
+    for kind in KINDS:
+        for name, x in values.get(kind, {}).items():
+            stat = stats.get((period.period_type, kind, name))
+            if stat is None:
+                continue
+            count, mean, m2 = stat.count, stat.mean, stat.m2
+            if name in own.get(kind, {}):
+                count, mean, m2 = _leave_one_out(count, mean, m2, own[kind][name])
+            if count < min_samples:
+                continue
+            std = math.sqrt(m2 / (count - 1))
+            if std <= 0 or abs(x - mean) < MIN_RELATIVE_DEVIATION * abs(mean):
+                continue
+            z = (x - mean) / std
+            if abs(z) >= threshold:
+                flags.append({
+                    "kind": kind,
+                    "name": name,
+                    "value": round(x, 4),
+                    "mean": round(mean, 4),
+                    "std": round(std, 4),
+                    "z_score": round(z, 2),
+                    "samples": count,
+                })
+    flags.sort(key=lambda f: -abs(f["z_score"]))
+    return flags
+
+
+def rebuild_statistics():
+    """Recompute every statistic from stored periods (one-off backfill / repair)."""
+    from app.models import FinancialPeriod
+
+    periods = FinancialPeriod.objects.select_related(*STATEMENT_RELATIONS)
+    items = [
+        (p, period_values(p)) for p in periods
+        if all(hasattr(p, relation) for relation in STATEMENT_RELATIONS)
+    ]
+    with transaction.atomic():
+        RatioStatistic.objects.all().delete()
+        RatioStatisticSample.objects.all().delete()
+        record_periods(items)
+    return len(items)
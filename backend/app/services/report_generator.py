@@ -0,0 +1,214 @@
+"""
+Report Generator
+Formatted per-period DOCX reports (statements, ratios with traffic lights,
+interpretation) built with python-docx, rendered for many periods at once on
+a process pool and bundled into one ZIP. Each report is cached in the export
+cache under the period's data version and the benchmark version, so only
+changed periods are rendered again.
+"""
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import django
+from django.conf import settings
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt, RGBColor
+
+from app.models import FinancialPeriod
+from app.services import export_cache
+from app.services.benchmark_config import get_benchmarks_version, get_ratio_benchmarks
+from app.services.ratio_calculator import RatioCalculator
+from app.services.ratio_statistics import STATEMENT_RELATIONS
+from app.services.workbook_export import RATIO_ROWS, STATEMENT_SHEETS
+
+
+MAX_REPORTS = 500
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+(?=[A-Z])')
+STATUS_COLOURS = {
+    'green': RGBColor(0x2E, 0x7D, 0x32),
+    'yellow': RGBColor(0xB2, 0x8A, 0x00),
+    'red': RGBColor(0xC6, 0x28, 0x28),
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _safe_label(label):
+    cleaned = "".join(c for c in label if c.isalnum() or c in (' ', '-', '_')).strip().replace(' ', '_')
+    return cleaned or 'period'
+
+
+def report_payload(period, benchmarks):
+    """Plain data for one report, so rendering needs no database access (picklable for workers)."""
+    statements = []
+    for title, accessor, rows in STATEMENT_SHEETS:
+        statement = getattr(period, accessor, None)
+        statements.append((title, [
+            (label, float(getattr(statement, field))) for label, field in rows
+            if statement is not None and getattr(statement, field) is not None
+        ]))
+
+    ratios, interpretation = [], ""
+    result = getattr(period, 'ratios', None)
+    if result is not None:
+        statuses = result.traffic_light_status or {}
+        ratios = [
+            (label, float(getattr(result, field)), unit, statuses.get(field))
+            for label, field, unit in RATIO_ROWS if getattr(result, field) is not None
+        ]
+        try:
+            interpretation = RatioCalculator(period, benchmarks=benchmarks).generate_interpretation()
+        except Exception:
+            interpretation = ""
+
+    return {
+        'label': period.label,
+        'period_type': period.get_period_type_display(),
+        'start_date': period.start_date.isoformat(),
+        'end_date': period.end_date.isoformat(),
+        'statements': statements,
+        'ratios': ratios,
+        'interpretation': interpretation,
+    }
+
+
+def _table(doc, header, rows):
+    table = doc.add_table(rows=1, cols=len(header))
+    table.style = 'Light Grid Accent 1'
+    for i, text in enumerate(header):
+        table.cell(0, i).text = text
+    for row in rows:
+        cells = table.add_row().cells
+        for i, value in enumerate(row):
+            cells[i].text = value
+    return table
+
+
+def build_report(payload):
+    doc = Document()
+    title = doc.add_heading(f"Financial Report - {payload['label']}", 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    info = doc.add_paragraph(f"{payload['period_type']} period, {payload['start_date']} to {payload['end_date']}")
+    info.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    for number, (heading, rows) in enumerate(payload['statements'], start=1):
+        doc.add_heading(f"{number}. {heading}", level=1)
+        if rows:
+            _table(doc, ["Item", "Amount"], [(label, f"{value:,.2f}") for label, value in rows])
+        else:
+            doc.add_paragraph("No data uploaded.")
+
+    doc.add_heading(f"{len(payload['statements']) + 1}. Ratio Analysis", level=1)
+    if payload['ratios']:
+        table = _table(doc, ["Ratio", "Value", "Unit", "Status"], [
+            (label, f"{value:,.2f}", unit, (status or '-').upper())
+            for label, value, unit, status in payload['ratios']
+        ])
+        for row, (_, _, _, status) in zip(table.rows[1:], payload['ratios']):
+            colour = STATUS_COLOURS.get(status)
+            if colour is not None:
+                for run in row.cells[3].paragraphs[0].runs:
+                    run.font.bold = True
+                    run.font.color.rgb = colour
+    else:
+        doc.add_paragraph("Ratios have not been calculated for this period.")
+
+    if payload['interpretation']:
+        doc.add_heading("Interpretation", level=1)
+        for sentence in SENTENCE_BREAK.split(payload['interpretation']):
+            if sentence.strip():
+                paragraph = doc.add_paragraph(sentence.strip(), style='List Bullet')
+                paragraph.runs[0].font.size = Pt(11)
+    return doc
+
+
+def render_report_file(payload, path):
+    """Render one report to `path` (atomic). Runs in worker processes."""
+    export_cache.store(path, build_report(payload))
+    return path
+
+
+def _render_all(jobs):
+    """Render [(payload, path)], on a process pool when there are enough of them."""
+    workers = min(_setting('REPORT_MAX_WORKERS', 0), len(jobs))
+    if workers > 1 and len(jobs) >= _setting('REPORT_POOL_MIN_REPORTS', 4):
+        # django.setup as initializer so workers started with 'spawn' can import app modules
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+            list(executor.map(render_report_file, *zip(*jobs)))
+        return workers
+    for payload, path in jobs:
+        render_report_file(payload, path)
+    return 1
+
+
+class ReportBundle:
+    """ZIP of reports for a period queryset; .save(file) renders what is missing and writes the archive."""
+
+    def __init__(self, periods):
+        self.periods = periods
+        self.stats = {}
+
+    def save(self, output):
+        started = time.monotonic()
+        benchmarks = get_ratio_benchmarks()
+        benchmarks_version = get_benchmarks_version(benchmarks)
+        versions = export_cache.period_versions(self.periods)
+        use_cache = export_cache.cache_enabled()
+        scratch = None if use_cache else tempfile.TemporaryDirectory()
+        directory = export_cache.cache_dir() if use_cache else Path(scratch.name)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        handles = {}
+        try:
+            paths = {}
+            for period_id, (parts, _) in versions.items():
+                key = export_cache.cache_key('report-docx', parts + [benchmarks_version])
+                paths[period_id] = directory / f"{key}.docx"
+            # Cached reports are opened once here, so a concurrent eviction cannot take them away later
+            for period_id, path in paths.items():
+                handle = export_cache.open_artifact(path)
+                if handle is not None:
+                    handles[period_id] = handle
+
+            pending = {
+                period.id: (report_payload(period, benchmarks), paths[period.id])
+                for period in FinancialPeriod.objects.filter(
+                    id__in=[pid for pid in paths if pid not in handles]
+                ).select_related(*STATEMENT_RELATIONS)
+            }
+            workers = _render_all(list(pending.values())) if pending else 0
+            for period_id, (payload, path) in pending.items():
+                handle = export_cache.open_artifact(path)
+                if handle is None:  # evicted by another download since it was rendered
+                    render_report_file(payload, path)
+                    handle = open(path, 'rb')
+                handles[period_id] = handle
+
+            # Reports are already compressed documents: store them as-is
+            with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+                for period_id, label in self.periods.order_by('start_date', 'id').values_list('id', 'label'):
+                    if period_id in handles:
+                        with archive.open(f"{_safe_label(label)}_{period_id}.docx", 'w') as member:
+                            shutil.copyfileobj(handles[period_id], member)
+        finally:
+            for handle in handles.values():
+                handle.close()
+            if scratch is not None:
+                scratch.cleanup()
+        if use_cache:
+            export_cache.evict()
+
+        self.stats = {
+            'reports': len(paths),
+            'rendered': len(pending),
+            'workers': workers,
+            'elapsed_ms': round((time.monotonic() - started) * 1000),
+        }
@@ -0,0 +1,171 @@
+"""
+Response Cache Service
+Caches the data of read-heavy analytics responses (dashboard, period
+comparisons, ratio results) in the Django cache (RESPONSE_CACHE_ALIAS), keyed
+by endpoint, query parameters and a global data version. Signals bump the
+version whenever periods, statements, ratio results or benchmarks change, so
+stale entries are never read again and simply expire. Hit / miss counters are
+kept per process for /api/cache-stats/.
+"""
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+
+VERSION_KEY = 'analytics:data-version'
+KEY_PREFIX = 'analytics:response'
+# Stored with the data so cache hits can still answer conditional requests (app.services.conditional_get)
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'stores': 0, 'skipped': 0})
+_stats_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cache():
+    return caches[_setting('RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def enabled():
+    return _setting('RESPONSE_CACHE_TIMEOUT', 300) > 0
+
+
+def data_version():
+    """Current data version: a nanosecond timestamp of the last bump."""
+    version = _cache().get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not _cache().add(VERSION_KEY, version, None):
+            version = _cache().get(VERSION_KEY, version)
+    return version
+
+
+def bump_data_version():
+    """Make every cached response stale. Applied after the surrounding transaction commits."""
+    def bump():
+        # Increasing even if two bumps share a clock tick
+        _cache().set(VERSION_KEY, max(time.time_ns(), (_cache().get(VERSION_KEY) or 0) + 1), None)
+    transaction.on_commit(bump)
+
+
+def _count(endpoint, outcome):
+    with _stats_lock:
+        _stats[endpoint][outcome] += 1
+
+
+def cache_key(endpoint, query_params, version, view_kwargs=None):
+    """Key for one endpoint + URL kwargs + query string (order-insensitive) at `version`."""
+    params = "&".join(
+        [f"{k}={v}" for k, v in sorted((view_kwargs or {}).items())]
+        + [f"{k}={v}" for k in sorted(query_params) for v in query_params.getlist(k)]
+    )
+    digest = hashlib.sha1(params.encode('utf-8')).hexdigest()
+    return f"{KEY_PREFIX}:{endpoint}:{version}:{digest}"
+
+
+def _fresh_enough(version):
+    """
+    Responses read from a lagging replica right after a change must not be
+    stored under the new version; the primary is always current.
+    """
+    from app.db_router import current_read_alias
+
+    if current_read_alias() == DEFAULT_DB_ALIAS:
+        return True
+    return time.time_ns() - version > _setting('REPLICA_STICKY_SECONDS', 15) * 1_000_000_000
+
+
+def _lookup(endpoint, request, kwargs):
+    """(cache key, data version, response for a hit or None)."""
+    version = data_version()
+    # ETags differ per renderer, so cache each representation's validators separately
+    view_kwargs = dict(kwargs, renderer=getattr(request.accepted_renderer, 'format', ''))
+    key = cache_key(endpoint, request.query_params, version, view_kwargs)
+    entry = _cache().get(key)
+    if entry is None:
+        _count(endpoint, 'misses')
+        return key, version, None
+    _count(endpoint, 'hits')
+    headers = entry['headers']
+    response = get_conditional_response(
+        request, etag=headers.get('ETag'),
+        last_modified=parse_http_date_safe(headers.get('Last-Modified', '')),
+    ) or Response(entry['data'])
+    for name, value in headers.items():
+        response[name] = value
+    response['X-Cache'] = 'HIT'
+    return key, version, response
+
+
+def _store(endpoint, key, version, response):
+    if response.status_code == 200 and isinstance(response, Response) and _fresh_enough(version):
+        headers = {name: response[name] for name in VALIDATOR_HEADERS if response.has_header(name)}
+        _cache().set(key, {'data': response.data, 'headers': headers}, _setting('RESPONSE_CACHE_TIMEOUT', 300))
+        _count(endpoint, 'stores')
+    else:
+        _count(endpoint, 'skipped')
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+def cached_response(endpoint):
+    """
+    Decorator for a DRF view's get/list/retrieve (sync or async): serve
+    response.data from the cache (304 when the stored ETag matches), or call
+    the view and store its 200 response. Runs after DRF has authenticated the
+    request, so cached data is never served to anonymous users.
+    """
+    def decorator(view_method):
+        if iscoroutinefunction(view_method):
+            @functools.wraps(view_method)
+            async def async_wrapper(self, request, *args, **kwargs):
+                if not enabled():
+                    return await view_method(self, request, *args, **kwargs)
+                key, version, hit = await sync_to_async(_lookup)(endpoint, request, kwargs)
+                if hit is not None:
+                    return hit
+                response = await view_method(self, request, *args, **kwargs)
+                return await sync_to_async(_store)(endpoint, key, version, response)
+            return async_wrapper
+
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if not enabled():
+                return view_method(self, request, *args, **kwargs)
+            key, version, hit = _lookup(endpoint, request, kwargs)
+            if hit is not None:
+                return hit
+            response = view_method(self, request, *args, **kwargs)
+            return _store(endpoint, key, version, response)
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    backend = _setting('CACHES', {}).get(_setting('RESPONSE_CACHE_ALIAS', 'default'), {}).get('BACKEND')
+    with _stats_lock:
+        endpoints = {name: dict(counts) for name, counts in _stats.items()}
+    for counts in endpoints.values():
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_ratio'] = round(counts['hits'] / lookups, 4) if lookups else None
+    return {
+        'backend': backend,
+        'timeout': _setting('RESPONSE_CACHE_TIMEOUT', 300),
+        'data_version': data_version(),
+        'process': os.getpid(),
+        'endpoints': endpoints,
+    }
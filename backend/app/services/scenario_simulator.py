@@ -0,0 +1,166 @@
+"""
+What-if Scenario Simulator
+Evaluates all ratios and traffic lights for a grid of input perturbations on
+one period in a single vectorized pass over ratio_engine. Nothing is persisted.
+"""
+import math
+
+import numpy as np
+
+from app.services import ratio_engine
+from app.services.benchmark_config import get_ratio_benchmarks
+from app.services.ratio_calculator import RatioCalculator
+from app.services.ratio_engine import ArrayOps
+
+
+MAX_SCENARIOS = 50000
+MAX_LEVER_VALUES = 1000
+
+# Rate levers re-price a flow on its (averaged) balance: flow = (rate + bp / 10000) * balance
+RATE_LEVERS = {
+    'cost_of_deposits': ('interest_on_deposits', 'deposits'),
+    'yield_on_loans': ('interest_on_loans', 'loans_advances'),
+    'yield_on_investments': ('return_on_investment', 'investments'),
+}
+
+# pct: relative change in %, delta: absolute change, bp: rate change in basis points
+FIELD_CHANGES = ('pct', 'delta')
+RATE_CHANGES = ('bp',)
+
+
+class ScenarioError(ValueError):
+    """Invalid scenario request."""
+
+
+def parse_perturbations(perturbations):
+    """
+    Validate [{"field": ..., "pct" | "delta" | "bp": [values]}, ...] and return
+    a list of (field, change, values) with values as float arrays.
+    """
+    if not isinstance(perturbations, list) or not perturbations:
+        raise ScenarioError("perturbations must be a non-empty list")
+
+    levers = []
+    seen = set()
+    for item in perturbations:
+        if not isinstance(item, dict):
+            raise ScenarioError("each perturbation must be an object")
+        field = item.get('field')
+        if field in RATE_LEVERS:
+            allowed = RATE_CHANGES
+        elif field in ratio_engine.INPUT_FIELDS:
+            allowed = FIELD_CHANGES
+        else:
+            raise ScenarioError(
+                f"Unknown field '{field}'. Use a statement field or one of: {', '.join(RATE_LEVERS)}"
+            )
+        changes = [c for c in allowed if c in item]
+        if len(changes) != 1:
+            raise ScenarioError(f"'{field}' needs exactly one of: {', '.join(allowed)}")
+        change = changes[0]
+
+        # A flow can be perturbed directly or re-priced by its rate lever, not both
+        target = RATE_LEVERS[field][0] if field in RATE_LEVERS else field
+        if target in seen:
+            raise ScenarioError(f"'{target}' is perturbed more than once")
+        seen.add(target)
+
+        values = item[change]
+        if not isinstance(values, list):
+            values = [values]
+        if not values or len(values) > MAX_LEVER_VALUES:
+            raise ScenarioError(f"'{field}' needs between 1 and {MAX_LEVER_VALUES} values")
+        try:
+            values = np.asarray([float(x) for x in values], dtype=float)
+        except (TypeError, ValueError):
+            raise ScenarioError(f"'{field}' values must be numbers")
+        if not np.all(np.isfinite(values)):
+            raise ScenarioError(f"'{field}' values must be finite")
+        levers.append((field, change, values))
+
+    count = math.prod(len(values) for _, _, values in levers)
+    if count > MAX_SCENARIOS:
+        raise ScenarioError(f"Grid has {count} scenarios; the limit is {MAX_SCENARIOS}")
+    return levers
+
+
+def build_grid(levers):
+    """Cartesian product of lever values as one flat column per lever."""
+    mesh = np.meshgrid(*[values for _, _, values in levers], indexing='ij')
+    return [column.ravel() for column in mesh]
+
+
+def apply_perturbations(base, opening, levers, grid):
+    """Scenario input arrays: statement-field changes first, then rate re-pricing on the new balances."""
+    count = len(grid[0])
+    inputs = {field: np.full(count, value) for field, value in base.items()}
+    for (field, change, _), column in zip(levers, grid):
+        if change == 'pct':
+            inputs[field] = inputs[field] * (1.0 + column / 100.0)
+        elif change == 'delta':
+            inputs[field] = inputs[field] + column
+
+    base_avg = ratio_engine.average_balances(base, opening, ArrayOps)
+    avg = ratio_engine.average_balances(inputs, opening, ArrayOps)
+    for (field, change, _), column in zip(levers, grid):
+        if change == 'bp':
+            flow, balance = RATE_LEVERS[field]
+            rate = ArrayOps.ratio(base[flow], base_avg[balance])
+            inputs[flow] = (rate + column / 10000.0) * avg[balance]
+    return inputs
+
+
+def _status_counts(statuses):
+    return {
+        name: {colour: int(np.count_nonzero(values == colour)) for colour in ('green', 'yellow', 'red')}
+        for name, values in statuses.items()
+    }
+
+
+def simulate_scenarios(period, perturbations, ratios=None, averaging=None):
+    """
+    Evaluate every combination of the perturbation values for `period`.
+
+    Returns the unperturbed base ratios (same numbers as RatioCalculator), the
+    lever columns, and per-ratio value / traffic-light columns, one entry per scenario.
+    """
+    benchmarks = get_ratio_benchmarks()
+    calculator = RatioCalculator(period, benchmarks=benchmarks, averaging=averaging)
+    base_ratios = calculator.calculate_all_ratios()
+
+    if ratios:
+        unknown = [name for name in ratios if name not in base_ratios]
+        if unknown:
+            raise ScenarioError(f"Unknown ratios: {', '.join(unknown)}")
+    else:
+        ratios = list(base_ratios)
+
+    levers = parse_perturbations(perturbations)
+    grid = build_grid(levers)
+
+    base = {field: float(value) for field, value in calculator.engine_inputs().items()}
+    opening = calculator.opening_balances()
+    if opening is not None:
+        opening = {name: float(value) for name, value in opening.items()}
+
+    inputs = apply_perturbations(base, opening, levers, grid)
+    results = ratio_engine.calculate_all(inputs, ArrayOps, opening)
+    statuses = ratio_engine.traffic_light_arrays(results, benchmarks)
+    statuses = {name: statuses[name] for name in ratios if name in statuses}
+
+    base_statuses = calculator.get_traffic_light_statuses()
+    return {
+        'count': len(grid[0]),
+        'averaging': calculator.averaging,
+        'base': {
+            'ratios': {name: base_ratios[name] for name in ratios},
+            'traffic_light_status': {name: base_statuses[name] for name in ratios if name in base_statuses},
+        },
+        'levers': {
+            f'{field}.{change}': column.tolist()
+            for (field, change, _), column in zip(levers, grid)
+        },
+        'ratios': {name: np.round(results[name], 4).tolist() for name in ratios},
+        'traffic_light_status': {name: values.tolist() for name, values in statuses.items()},
+        'status_counts': _status_counts(statuses),
+    }
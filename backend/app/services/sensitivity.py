@@ -0,0 +1,260 @@
+"""
+Monte Carlo Sensitivity Service
+Samples normal noise around a period's statement values and runs the draws
+through the vectorized ratio engine to estimate, per ratio, the probability of
+ending red / yellow / green under the current benchmark rules. Draws run in
+fixed-size chunks within a time budget; large runs can be spread over a
+process pool shared by all requests (SENSITIVITY_MAX_WORKERS processes,
+started on first use).
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+import numpy as np
+from django.conf import settings
+
+from app.services import ratio_engine
+from app.services.benchmark_config import get_ratio_benchmarks
+from app.services.ratio_calculator import RatioCalculator
+from app.services.ratio_engine import ArrayOps
+
+
+DEFAULT_DRAWS = 10000
+CHUNK_SIZE = 10000
+MAX_NOISE_PCT = 100.0
+COLOURS = ('green', 'yellow', 'red')
+
+# Noise (standard deviation, % of the statement value) used when none is given
+DEFAULT_NOISE = {
+    'deposits': 5.0,
+    'loans_advances': 5.0,
+    'investments': 5.0,
+    'interest_on_loans': 5.0,
+    'interest_on_deposits': 5.0,
+    'return_on_investment': 5.0,
+    'establishment_contingencies': 5.0,
+    'provisions': 5.0,
+}
+
+# Statement values that may legitimately be negative are not clipped at zero
+SIGNED_FIELDS = ('net_profit', 'undistributed_profit')
+
+
+class SensitivityError(ValueError):
+    """Invalid sensitivity request."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def parse_noise(noise):
+    """Validate {field: sigma_pct} (statement fields, 0 < sigma <= 100)."""
+    if noise is None:
+        return dict(DEFAULT_NOISE)
+    if not isinstance(noise, dict) or not noise:
+        raise SensitivityError("noise must be an object of field: percent")
+    parsed = {}
+    for field, sigma in noise.items():
+        if field not in ratio_engine.INPUT_FIELDS or field == 'staff_count':
+            raise SensitivityError(f"Unknown field '{field}'")
+        try:
+            sigma = float(sigma)
+        except (TypeError, ValueError):
+            raise SensitivityError(f"noise for '{field}' must be a number")
+        if not 0 < sigma <= MAX_NOISE_PCT:
+            raise SensitivityError(f"noise for '{field}' must be between 0 and {MAX_NOISE_PCT:g}")
+        parsed[field] = sigma
+    return parsed
+
+
+def run_chunk(base, opening, noise, benchmarks, ratios, draws, seed):
+    """
+    Evaluate `draws` samples and return per-ratio colour counts plus mean and M2
+    (sum of squared deviations) so chunks can be merged. Pure numpy: safe to run in a worker process.
+    """
+    rng = np.random.default_rng(seed)
+    inputs = {field: np.full(draws, value) for field, value in base.items()}
+    for field, sigma in noise.items():
+        sample = base[field] * (1.0 + rng.standard_normal(draws) * (sigma / 100.0))
+        inputs[field] = sample if field in SIGNED_FIELDS else np.maximum(sample, 0.0)
+
+    results = ratio_engine.calculate_all(inputs, ArrayOps, opening)
+    statuses = ratio_engine.traffic_light_arrays(results, benchmarks)
+    out = {}
+    for name in ratios:
+        values = results[name]
+        mean = float(values.mean())
+        out[name] = {
+            'counts': [int(np.count_nonzero(statuses[name] == colour)) for colour in COLOURS],
+            'mean': mean,
+            'm2': float(np.square(values - mean).sum()),
+        }
+    return draws, out
+
+
+def _merge(total, done, chunk, n):
+    """Fold a chunk of n draws into totals over `done` draws (parallel mean / M2 update)."""
+    for name, part in chunk.items():
+        acc = total.setdefault(name, {'counts': [0, 0, 0], 'mean': 0.0, 'm2': 0.0})
+        delta = part['mean'] - acc['mean']
+        combined = done + n
+        acc['counts'] = [a + b for a, b in zip(acc['counts'], part['counts'])]
+        acc['mean'] += delta * n / combined
+        acc['m2'] += part['m2'] + delta * delta * done * n / combined
+
+
+def _chunks(draws):
+    sizes = [CHUNK_SIZE] * (draws // CHUNK_SIZE)
+    if draws % CHUNK_SIZE:
+        sizes.append(draws % CHUNK_SIZE)
+    return sizes
+
+
+def _run_serial(args, sizes, seeds, deadline):
+    total, done = {}, 0
+    for size, seed in zip(sizes, seeds):
+        if done and time.monotonic() > deadline:
+            break
+        n, chunk = run_chunk(*args, size, seed)
+        _merge(total, done, chunk, n)
+        done += n
+    return done, total
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # django.setup as initializer so workers started with 'spawn' can import app modules
+            _pool = ProcessPoolExecutor(
+                max_workers=_setting('SENSITIVITY_MAX_WORKERS', 0), initializer=django.setup,
+            )
+        return _pool
+
+
+def _discard_pool(executor):
+    global _pool
+    with _pool_lock:
+        if _pool is executor:
+            _pool = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_pool(args, sizes, seeds, deadline, workers):
+    """
+    Run chunks on the shared pool with at most `workers` of them in flight, so
+    at the deadline no more than that are left to finish in the background.
+    Chunks are merged in submission order; the first is always waited for.
+    """
+    total, done = {}, 0
+    executor = _executor()
+    jobs = iter(zip(sizes, seeds))
+    in_flight = deque()
+
+    def submit():
+        job = next(jobs, None)
+        if job is not None:
+            in_flight.append(executor.submit(run_chunk, *args, *job))
+
+    try:
+        for _ in range(workers):
+            submit()
+        while in_flight:
+            timeout = max(deadline - time.monotonic(), 0.0) if done else None
+            try:
+                n, chunk = in_flight[0].result(timeout=timeout)
+            except FuturesTimeout:
+                break
+            in_flight.popleft()
+            _merge(total, done, chunk, n)
+            done += n
+            if time.monotonic() < deadline:
+                submit()
+        # Out of time: keep chunks that have finished meanwhile
+        for future in in_flight:
+            if future.done():
+                n, chunk = future.result()
+                _merge(total, done, chunk, n)
+                done += n
+    except BrokenProcessPool:
+        _discard_pool(executor)
+        raise
+    finally:
+        for future in in_flight:
+            future.cancel()
+    return done, total
+
+
+def run_sensitivity(period, draws=DEFAULT_DRAWS, noise=None, ratios=None, averaging=None,
+                    seed=None, workers=None):
+    """
+    Monte Carlo traffic-light probabilities for `period`. Nothing is saved.
+
+    Stops early (truncated=True) when SENSITIVITY_TIME_BUDGET seconds run out;
+    probabilities are then over the completed draws.
+    """
+    max_draws = _setting('SENSITIVITY_MAX_DRAWS', 100000)
+    if not isinstance(draws, int) or isinstance(draws, bool) or not 1 <= draws <= max_draws:
+        raise SensitivityError(f"draws must be an integer between 1 and {max_draws}")
+    noise = parse_noise(noise)
+
+    benchmarks = get_ratio_benchmarks()
+    calculator = RatioCalculator(period, benchmarks=benchmarks, averaging=averaging)
+    base_statuses = calculator.get_traffic_light_statuses()
+    if ratios:
+        unknown = [name for name in ratios if name not in base_statuses]
+        if unknown:
+            raise SensitivityError(f"Unknown ratios: {', '.join(unknown)}")
+    else:
+        ratios = list(base_statuses)
+
+    base = {field: float(value) for field, value in calculator.engine_inputs().items()}
+    opening = calculator.opening_balances()
+    if opening is not None:
+        opening = {name: float(value) for name, value in opening.items()}
+
+    sizes = _chunks(draws)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = (base, opening, noise, benchmarks, ratios)
+    started = time.monotonic()
+    deadline = started + _setting('SENSITIVITY_TIME_BUDGET', 10.0)
+
+    max_workers = _setting('SENSITIVITY_MAX_WORKERS', 0)
+    workers = min(workers or max_workers, max_workers, len(sizes))
+    use_pool = workers > 1 and draws >= _setting('SENSITIVITY_POOL_MIN_DRAWS', 50000)
+    if use_pool:
+        done, total = _run_pool(args, sizes, seeds, deadline, workers)
+    else:
+        done, total = _run_serial(args, sizes, seeds, deadline)
+
+    summary = {}
+    for name in ratios:
+        acc = total.get(name)
+        if not acc or not done:
+            continue
+        summary[name] = {
+            **{colour: round(count / done, 4) for colour, count in zip(COLOURS, acc['counts'])},
+            'mean': round(acc['mean'], 4),
+            'std': round((acc['m2'] / done) ** 0.5, 4),
+            'base_status': base_statuses[name],
+        }
+
+    return {
+        'draws_requested': draws,
+        'draws': done,
+        'truncated': done < draws,
+        'workers': workers if use_pool else 1,
+        'elapsed_ms': round((time.monotonic() - started) * 1000),
+        'averaging': calculator.averaging,
+        'noise_pct': noise,
+        'ratios': summary,
+    }
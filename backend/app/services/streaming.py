@@ -0,0 +1,107 @@
+"""
+Streaming Response Helpers
+Under ASGI, Django serves a StreamingHttpResponse with a sync iterator by
+reading the whole iterator into a list first (sync_to_async(list)), so a
+multi-GB export or file would sit in memory before its first byte is sent.
+Views streaming a body pick the iterator for the server they run under:
+async_chunks() / async_file_chunks() for ASGI requests, the plain sync
+iterator under WSGI (where an async iterator would be buffered the same way
+in reverse, and FileResponse can use the server's sendfile).
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse
+
+# Items pulled from the sync iterator per thread hop
+BATCH_SIZE = 200
+# Bytes per read when streaming a file
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def serves_async(request):
+    """True when `request` (Django or DRF) came in through the ASGI handler."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def _take(iterator, count):
+    items = []
+    for item in iterator:
+        items.append(item)
+        if len(items) >= count:
+            break
+    return items
+
+
+async def async_chunks(iterable, batch=BATCH_SIZE):
+    """
+    Async iterator over a blocking sync iterable (ORM cursor, file reads) for
+    ASGI streaming. Items are pulled `batch` at a time on the request's
+    thread-sensitive thread, the one the view's own queries ran on, so a
+    server-side cursor keeps its connection; memory stays at one batch.
+    """
+    iterator = iter(iterable)
+    take = sync_to_async(_take, thread_sensitive=True)
+    try:
+        while True:
+            items = await take(iterator, batch)
+            if not items:
+                return
+            for item in items:
+                yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+def streaming_body(request, iterable):
+    """`iterable` as StreamingHttpResponse content suited to the server handling `request`."""
+    if serves_async(request):
+        return async_chunks(iterable)
+    return iterable
+
+
+def file_chunks(handle, length=None, chunk_size=FILE_CHUNK_SIZE):
+    """Sync counterpart of async_file_chunks()."""
+    remaining = length
+    while remaining is None or remaining > 0:
+        chunk = handle.read(chunk_size if remaining is None else min(chunk_size, remaining))
+        if not chunk:
+            return
+        if remaining is not None:
+            remaining -= len(chunk)
+        yield chunk
+
+
+async def async_file_chunks(handle, length=None, chunk_size=FILE_CHUNK_SIZE):
+    """
+    Read `handle` from its current position, up to `length` bytes (to the end
+    if None), with each read on a worker thread. Closing the file is left to
+    the response that owns it.
+    """
+    read = sync_to_async(handle.read, thread_sensitive=False)
+    remaining = length
+    while remaining is None or remaining > 0:
+        chunk = await read(chunk_size if remaining is None else min(chunk_size, remaining))
+        if not chunk:
+            return
+        if remaining is not None:
+            remaining -= len(chunk)
+        yield chunk
+
+
+def stream_file(request, handle, length=None, **kwargs):
+    """
+    FileResponse(handle, **kwargs) - same headers, closes the file - whose body
+    is read through async_file_chunks() when `request` is served over ASGI.
+    `length` limits the body to that many bytes from the handle's current
+    position (a byte range).
+    """
+    response = FileResponse(handle, **kwargs)
+    if serves_async(request):
+        response.streaming_content = async_file_chunks(handle, length)
+    elif length is not None:
+        response.streaming_content = file_chunks(handle, length)
+    if length is not None:
+        response['Content-Length'] = str(length)
+    return response
@@ -0,0 +1,134 @@
+"""
+Trailing-Twelve-Month (TTM) Ratio Service
+Annualizes monthly periods: prefix sums over ordered monthly P&L / trading
+flows give every month's 12-month flow totals in O(1), which are combined with
+that month's closing BalanceSheet and run through RatioCalculator.
+"""
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.db import transaction
+
+from app.models import (
+    FinancialPeriod, TradingAccount, ProfitAndLoss, TrailingRatioResult,
+)
+from app.services.benchmark_config import get_ratio_benchmarks
+from app.services.ratio_calculator import RatioCalculator
+
+
+TTM_MONTHS = 12
+
+# Flow items are summed across the window; stock items come from the ends
+PL_FLOW_FIELDS = [
+    'interest_on_loans', 'interest_on_bank_ac', 'return_on_investment',
+    'miscellaneous_income', 'interest_on_deposits', 'interest_on_borrowings',
+    'establishment_contingencies', 'provisions', 'net_profit',
+]
+TA_FLOW_FIELDS = ['purchases', 'trade_charges', 'sales']
+FLOW_FIELDS = [('profit_loss', f) for f in PL_FLOW_FIELDS] + [('trading_account', f) for f in TA_FLOW_FIELDS]
+
+
+def _month_ordinal(d):
+    return d.year * 12 + d.month - 1
+
+
+def load_monthly_periods(date_from=None, date_to=None):
+    """MONTHLY periods with complete statements, ordered by start_date (one joined query)."""
+    periods = FinancialPeriod.objects.filter(period_type='MONTHLY')
+    if date_from:
+        periods = periods.filter(start_date__gte=date_from)
+    if date_to:
+        periods = periods.filter(start_date__lte=date_to)
+    periods = periods.select_related(
+        'trading_account', 'profit_loss', 'balance_sheet', 'operational_metrics'
+    ).order_by('start_date')
+    return [
+        p for p in periods
+        if hasattr(p, 'trading_account') and hasattr(p, 'profit_loss')
+        and hasattr(p, 'balance_sheet') and hasattr(p, 'operational_metrics')
+    ]
+
+
+def _prefix_sums(months):
+    """prefix[k][i] = sum of flow field i over months[0:k]."""
+    running = [Decimal('0')] * len(FLOW_FIELDS)
+    prefix = [list(running)]
+    for p in months:
+        for i, (statement, field) in enumerate(FLOW_FIELDS):
+            running[i] += getattr(getattr(p, statement), field)
+        prefix.append(list(running))
+    return prefix
+
+
+def calculate_ttm_series(months=None, benchmarks=None):
+    """
+    Compute TTM ratios for every month that closes a contiguous 12-month window.
+
+    Returns a list of (period, window_start, all_ratios, traffic_light_statuses),
+    in start_date order. Months without 11 contiguous predecessors are skipped.
+    """
+    if months is None:
+        months = load_monthly_periods()
+    if benchmarks is None:
+        benchmarks = get_ratio_benchmarks()
+    prefix = _prefix_sums(months)
+    ordinals = [_month_ordinal(p.start_date) for p in months]
+
+    results = []
+    for i in range(TTM_MONTHS - 1, len(months)):
+        j = i - (TTM_MONTHS - 1)
+        # Ordinals are unique and sorted, so this also rules out gaps
+        if ordinals[i] - ordinals[j] != TTM_MONTHS - 1:
+            continue
+        totals = [hi - lo for hi, lo in zip(prefix[i + 1], prefix[j])]
+        flows = {field: totals[k] for k, (_, field) in enumerate(FLOW_FIELDS)}
+
+        first, last = months[j], months[i]
+        snapshot = SimpleNamespace(
+            trading_account=TradingAccount(
+                opening_stock=first.trading_account.opening_stock,
+                closing_stock=last.trading_account.closing_stock,
+                **{f: flows[f] for f in TA_FLOW_FIELDS}
+            ),
+            profit_loss=ProfitAndLoss(**{f: flows[f] for f in PL_FLOW_FIELDS}),
+            balance_sheet=last.balance_sheet,
+            operational_metrics=last.operational_metrics,
+        )
+        calculator = RatioCalculator(snapshot, benchmarks=benchmarks)
+        results.append((
+            last,
+            first.start_date,
+            calculator.calculate_all_ratios(),
+            calculator.get_traffic_light_statuses(),
+        ))
+    return results
+
+
+def refresh_ttm_series():
+    """Recompute and store the whole TTM series in one pass. Returns the number of rows stored."""
+    series = calculate_ttm_series()
+    rows = [
+        TrailingRatioResult(
+            period=period,
+            window_start=window_start,
+            ratios=ratios,
+            traffic_light_status=statuses,
+        )
+        for period, window_start, ratios, statuses in series
+    ]
+    with transaction.atomic():
+        TrailingRatioResult.objects.exclude(period_id__in=[r.period_id for r in rows]).delete()
+        TrailingRatioResult.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['period'],
+            update_fields=['window_start', 'ratios', 'traffic_light_status', 'calculated_at'],
+        )
+    return len(rows)
+
+
+def refresh_ttm_for_period(period):
+    """Refresh the stored TTM series when a MONTHLY period's data changed."""
+    if period.period_type != 'MONTHLY':
+        return 0
+    return refresh_ttm_series()
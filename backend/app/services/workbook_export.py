@@ -0,0 +1,141 @@
+"""
+Workbook Export Service
+Multi-period Excel export (one sheet per statement with a column per period,
+plus a ratio matrix) built with openpyxl's write-only mode, and a helper that
+saves a workbook / document to a temporary file and streams it back, so
+responses never hold a second in-memory copy of the file.
+"""
+import tempfile
+
+from openpyxl import Workbook
+
+from app.services.bulk_export import export_columns, export_rows
+from app.services.streaming import stream_file
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+# (sheet, accessor, [(row label, field)]) in the same order as the upload template
+STATEMENT_SHEETS = (
+    ("Balance Sheet", 'balance_sheet', [
+        ("Share Capital", 'share_capital'),
+        ("Deposits", 'deposits'),
+        ("Borrowings", 'borrowings'),
+        ("Reserves (Statutory & Free)", 'reserves_statutory_free'),
+        ("Provisions", 'provisions'),
+        ("Other Liabilities", 'other_liabilities'),
+        ("Undistributed Profit", 'undistributed_profit'),
+        ("Cash in Hand", 'cash_in_hand'),
+        ("Cash at Bank", 'cash_at_bank'),
+        ("Investments", 'investments'),
+        ("Loans & Advances", 'loans_advances'),
+        ("Fixed Assets", 'fixed_assets'),
+        ("Other Assets", 'other_assets'),
+        ("Stock in Trade", 'stock_in_trade'),
+    ]),
+    ("Profit & Loss", 'profit_loss', [
+        ("Interest on Deposits", 'interest_on_deposits'),
+        ("Interest on Borrowings", 'interest_on_borrowings'),
+        ("Establishment & Contingencies", 'establishment_contingencies'),
+        ("Provisions Made", 'provisions'),
+        ("Net Profit", 'net_profit'),
+        ("Interest on Loans", 'interest_on_loans'),
+        ("Interest on Bank A/c", 'interest_on_bank_ac'),
+        ("Return on Investment", 'return_on_investment'),
+        ("Miscellaneous Income", 'miscellaneous_income'),
+    ]),
+    ("Trading Account", 'trading_account', [
+        ("Opening Stock", 'opening_stock'),
+        ("Purchases", 'purchases'),
+        ("Trade Charges", 'trade_charges'),
+        ("Sales", 'sales'),
+        ("Closing Stock", 'closing_stock'),
+    ]),
+    ("Operational Metrics", 'operational_metrics', [
+        ("Staff Count", 'staff_count'),
+    ]),
+)
+
+# (label, RatioResult field, unit)
+RATIO_ROWS = (
+    ("Working Fund", 'working_fund', "₹"),
+    ("Stock Turnover", 'stock_turnover', "times"),
+    ("Gross Profit Ratio", 'gross_profit_ratio', "%"),
+    ("Net Profit Ratio", 'net_profit_ratio', "%"),
+    ("Net Own Funds", 'net_own_funds', "₹"),
+    ("Own Fund to Working Fund", 'own_fund_to_wf', "%"),
+    ("Deposits to Working Fund", 'deposits_to_wf', "%"),
+    ("Borrowings to Working Fund", 'borrowings_to_wf', "%"),
+    ("Loans to Working Fund", 'loans_to_wf', "%"),
+    ("Investments to Working Fund", 'investments_to_wf', "%"),
+    ("Earning Assets to Working Fund", 'earning_assets_to_wf', "%"),
+    ("Interest Tagged Funds to Working Fund", 'interest_tagged_funds_to_wf', "%"),
+    ("Cost of Deposits", 'cost_of_deposits', "%"),
+    ("Yield on Loans", 'yield_on_loans', "%"),
+    ("Yield on Investments", 'yield_on_investments', "%"),
+    ("Credit Deposit Ratio", 'credit_deposit_ratio', "%"),
+    ("Avg Cost of Working Fund", 'avg_cost_of_wf', "%"),
+    ("Avg Yield on Working Fund", 'avg_yield_on_wf', "%"),
+    ("Misc Income to Working Fund", 'misc_income_to_wf', "%"),
+    ("Interest Exp to Interest Income", 'interest_exp_to_interest_income', "%"),
+    ("Gross Fin Margin", 'gross_fin_margin', "%"),
+    ("Operating Cost to Working Fund", 'operating_cost_to_wf', "%"),
+    ("Net Fin Margin", 'net_fin_margin', "%"),
+    ("Risk Cost to Working Fund", 'risk_cost_to_wf', "%"),
+    ("Net Margin", 'net_margin', "%"),
+    ("Capital Turnover Ratio", 'capital_turnover_ratio', "times"),
+    ("Per Employee Deposit", 'per_employee_deposit', "₹"),
+    ("Per Employee Loan", 'per_employee_loan', "₹"),
+    ("Per Employee Contribution", 'per_employee_contribution', "₹"),
+    ("Per Employee Operating Cost", 'per_employee_operating_cost', "₹"),
+)
+
+# Excel allows 16384 columns; the first holds the row labels (and units on the ratio sheet)
+MAX_PERIODS = 16000
+
+
+def file_response(request, document, filename, content_type):
+    """
+    Save an openpyxl workbook or python-docx document to a temporary file and
+    stream it (asynchronously under ASGI, see stream_file()). The response
+    closes (and so deletes) the file once it is sent.
+    """
+    output = tempfile.TemporaryFile()
+    try:
+        document.save(output)
+        output.seek(0)
+    except Exception:
+        output.close()
+        raise
+    return stream_file(request, output, as_attachment=True, filename=filename, content_type=content_type)
+
+
+def build_multi_period_workbook(periods):
+    """
+    Write-only workbook for the `periods` queryset: a sheet per statement and a
+    "Ratio Analysis Results" matrix, rows = line items, columns = periods.
+    Values are read with one joined query; rows are written straight to the
+    workbook's temporary sheet files as they are built.
+    """
+    columns = export_columns()
+    index = {name: i for i, (name, _) in enumerate(columns)}
+    data = list(export_rows(columns, periods=periods))
+    labels = [row[index['label']] for row in data]
+
+    def values(accessor, field):
+        i = index[f"{accessor}.{field}"]
+        return [row[i] for row in data]
+
+    wb = Workbook(write_only=True)
+    for title, accessor, rows in STATEMENT_SHEETS:
+        ws = wb.create_sheet(title)
+        ws.append(["Item"] + labels)
+        for label, field in rows:
+            ws.append([label] + values(accessor, field))
+
+    ws = wb.create_sheet("Ratio Analysis Results")
+    ws.append(["Ratio Name", "Unit"] + labels)
+    for label, field, unit in RATIO_ROWS:
+        ws.append([label, unit] + values('ratios', field))
+    return wb, len(data)
@@ -0,0 +1,98 @@
+import os
+
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .authentication import invalidate_user
+from .models import (
+    AppConfig, BalanceSheet, FinancialPeriod, OperationalMetrics, ProfitAndLoss, RatioResult,
+    RatioStatisticSample, TradingAccount, UserRegister,
+)
+from .services.period_calendar import invalidate_period_calendar
+from .services.response_cache import bump_data_version
+
+
+@receiver(pre_save, sender=FinancialPeriod)
+def hash_uploaded_file(sender, instance, **kwargs):
+    # Hash new uploads while they are still in memory / temp storage, before FileField commits them
+    field_file = instance.uploaded_file
+    if not field_file:
+        instance.uploaded_file_sha256 = ''
+        instance.uploaded_file_name = ''
+    elif not field_file._committed:
+        from .services.file_delivery import file_sha256
+        # UploadExcelView hashes the upload first to report progress
+        instance.uploaded_file_sha256 = getattr(field_file.file, 'content_sha256', None) or file_sha256(field_file.file)
+        instance.uploaded_file_name = os.path.basename(field_file.name)[:255]
+        # Lets ContentAddressedStorage skip hashing the same bytes again
+        field_file.file.content_sha256 = instance.uploaded_file_sha256
+
+
+@receiver(post_save, sender=FinancialPeriod)
+def track_uploaded_blob(sender, instance, created, **kwargs):
+    from .services import blob_storage
+    new_name = instance.uploaded_file.name or ''
+    old_name = '' if created else getattr(instance, '_loaded_uploaded_file', None)
+    if old_name is None:
+        # Not loaded from the database here; collect_garbage() reconciles the count
+        return
+    if old_name != new_name:
+        blob_storage.release(old_name)
+        blob_storage.acquire(new_name, instance.uploaded_file_sha256)
+    instance._loaded_uploaded_file = new_name
+
+
+@receiver([post_save, post_delete], sender=FinancialPeriod)
+def financial_period_changed(sender, **kwargs):
+    invalidate_period_calendar()
+
+
+@receiver(post_delete, sender=RatioStatisticSample)
+def ratio_statistic_sample_deleted(sender, instance, **kwargs):
+    # Runs for cascaded deletes too, so removing a period takes its values out of the statistics
+    from .services.ratio_statistics import remove_sample
+    remove_sample(instance)
+
+
+@receiver(post_delete, sender=FinancialPeriod)
+def financial_period_deleted(sender, instance, **kwargs):
+    from .services.period_hooks import after_period_data_removed
+    after_period_data_removed(instance)
+
+
+@receiver(post_delete, sender=TradingAccount)
+@receiver(post_delete, sender=ProfitAndLoss)
+@receiver(post_delete, sender=BalanceSheet)
+@receiver(post_delete, sender=OperationalMetrics)
+def statement_deleted(sender, instance, origin=None, **kwargs):
+    # Deleting the period cascades here too; financial_period_deleted covers that case
+    if isinstance(origin, FinancialPeriod) or getattr(origin, 'model', None) is FinancialPeriod:
+        return
+    period = FinancialPeriod.objects.filter(pk=instance.period_id).first()
+    if period is not None:
+        from .services.period_hooks import after_period_data_removed
+        after_period_data_removed(period)
+
+
+@receiver(post_delete, sender=FinancialPeriod)
+def release_uploaded_blob(sender, instance, **kwargs):
+    from .services import blob_storage
+    blob_storage.release(instance.uploaded_file.name or '')
+
+
+@receiver([post_save, post_delete], sender=UserRegister)
+def user_changed(sender, instance, **kwargs):
+    # Profile / user management edits, password resets, deactivation: drop the cached JWT user
+    invalidate_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=FinancialPeriod)
+@receiver([post_save, post_delete], sender=TradingAccount)
+@receiver([post_save, post_delete], sender=ProfitAndLoss)
+@receiver([post_save, post_delete], sender=BalanceSheet)
+@receiver([post_save, post_delete], sender=OperationalMetrics)
+@receiver([post_save, post_delete], sender=RatioResult)
+@receiver([post_save, post_delete], sender=AppConfig)
+def analytics_data_changed(sender, **kwargs):
+    # Cached dashboard / comparison / ratio responses are keyed by the data version
+    bump_data_version()
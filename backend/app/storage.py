@@ -0,0 +1,41 @@
+"""
+Content-addressed storage for uploaded statement files.
+Files are stored once under blobs/<aa>/<sha256><ext>, whatever period or name
+they were uploaded with; saving identical content again returns the existing
+name. References are counted in StoredBlob (see app.services.blob_storage).
+"""
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+BLOB_PREFIX = 'blobs/'
+
+
+def blob_name(sha256, filename):
+    extension = os.path.splitext(filename)[1].lower()
+    return f"{BLOB_PREFIX}{sha256[:2]}/{sha256}{extension}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by content hash and never writes a blob twice."""
+
+    def save(self, name, content, max_length=None):
+        from app.services.file_delivery import file_sha256
+
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        # The FinancialPeriod pre_save receiver has usually hashed the upload already
+        sha256 = getattr(content, 'content_sha256', None) or file_sha256(content)
+        name = blob_name(sha256, name)
+        if self.exists(name):
+            # Touch so garbage collection treats a re-used blob as recent
+            os.utime(self.path(name))
+            return name
+        return self._save(name, content)
+
+
+upload_storage = ContentAddressedStorage()
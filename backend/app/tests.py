@@ -1,3 +1,1705 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import warnings
+import zipfile
+from calendar import monthrange
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse, QueryDict
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, override_settings
+from openpyxl import Workbook
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from app import authentication
+from app.authentication import CachedJWTAuthentication, clear_user_cache
+from app.db_router import is_pinned
+from app.middleware import PrimaryStickinessMiddleware
+from app.models import (
+    BalanceSheet, FinancialPeriod, OperationalMetrics, ProfitAndLoss, RatioResult, RatioStatistic, RatioStatisticSample,
+    StoredBlob, TradingAccount, TrailingRatioResult, UserRegister,
+)
+from app.services import admission, blob_storage, export_cache, ratio_engine, ratio_statistics, sensitivity
+from app.services.benchmark_config import DEFAULT_RATIO_BENCHMARKS
+from app.services.columnar import to_columns
+from app.services.file_delivery import parse_range
+from app.services.goal_seek import goal_seek
+from app.services.period_hooks import after_period_data_changed
+from app.services.period_rollup import BALANCE_SHEET_FIELDS, rollup_all
+from app.services.progress import ProgressReporter, events_since
+from app.services.ratio_calculator import RatioCalculator, save_ratio_results
+from app.services.ratio_series import rolling_mean_std, yoy_change
+from app.services.ratio_statistics import STATEMENT_RELATIONS
+from app.services.report_generator import ReportBundle
+from app.services.response_cache import bump_data_version, cache_key, cache_stats, data_version
+from app.services.streaming import async_chunks
+from app.services.ttm_calculator import (
+    PL_FLOW_FIELDS, TA_FLOW_FIELDS, TTM_MONTHS, _prefix_sums, calculate_ttm_series, refresh_ttm_series,
+)
+from app.views import AsyncRatioResultListView, DashboardView
+
+
+def _amount(rng, low, high):
+    return Decimal(rng.randint(low * 100, high * 100)) / 100
+
+
+def make_statements(rng):
+    """Unsaved statement rows with plausible society figures."""
+    trading = TradingAccount(
+        opening_stock=_amount(rng, 20000, 30000), purchases=_amount(rng, 40000, 50000),
+        trade_charges=_amount(rng, 500, 900), sales=_amount(rng, 40000, 52000),
+        closing_stock=_amount(rng, 30000, 45000),
+    )
+    profit_loss = ProfitAndLoss(
+        interest_on_loans=_amount(rng, 3000000, 4000000), interest_on_bank_ac=_amount(rng, 400000, 600000),
+        return_on_investment=_amount(rng, 50000, 100000), miscellaneous_income=_amount(rng, 200000, 300000),
+        interest_on_deposits=_amount(rng, 2000000, 2500000), interest_on_borrowings=_amount(rng, 50000, 80000),
+        establishment_contingencies=_amount(rng, 1000000, 1200000), provisions=_amount(rng, 300000, 400000),
+        net_profit=_amount(rng, 500000, 700000),
+    )
+    balance_sheet = BalanceSheet(
+        share_capital=_amount(rng, 5000000, 6000000), deposits=_amount(rng, 450000000, 500000000),
+        borrowings=_amount(rng, 6000000, 8000000), reserves_statutory_free=_amount(rng, 10000000, 11000000),
+        undistributed_profit=_amount(rng, 10000000, 11000000), provisions=_amount(rng, 50000000, 55000000),
+        other_liabilities=_amount(rng, 40000000, 50000000), cash_in_hand=_amount(rng, 15000000, 17000000),
+        cash_at_bank=_amount(rng, 80000000, 95000000), investments=_amount(rng, 12000000, 14000000),
+        loans_advances=_amount(rng, 400000000, 450000000), fixed_assets=_amount(rng, 50000000, 60000000),
+        other_assets=_amount(rng, 5000000, 6000000), stock_in_trade=_amount(rng, 30000, 45000),
+    )
+    return trading, profit_loss, balance_sheet, OperationalMetrics(staff_count=rng.randint(10, 40))
+
+
+def month_start(year, month, offset):
+    index = year * 12 + month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def make_months(rng, starts):
+    """In-memory monthly periods (attribute access like select_related rows) for the given start dates."""
+    months = []
+    for start in starts:
+        trading, profit_loss, balance_sheet, operational = make_statements(rng)
+        months.append(SimpleNamespace(
+            start_date=start, trading_account=trading, profit_loss=profit_loss,
+            balance_sheet=balance_sheet, operational_metrics=operational,
+        ))
+    return months
+
+
+def create_month(rng, start):
+    """A saved MONTHLY period with all four statements."""
+    period = FinancialPeriod.objects.create(
+        period_type='MONTHLY', label=start.strftime('%b_%Y'), start_date=start,
+        end_date=start.replace(day=monthrange(start.year, start.month)[1]),
+    )
+    for statement in make_statements(rng):
+        statement.period = period
+        statement.save()
+    return period
+
+
+def api_client(username='tester'):
+    user = UserRegister.objects.create_user(username=username, password='x', role='admin')
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def temporary_media(test):
+    """Point MEDIA_ROOT (upload storage) at a directory removed after `test`."""
+    media = tempfile.TemporaryDirectory()
+    test.addCleanup(media.cleanup)
+    media_root = override_settings(MEDIA_ROOT=media.name)
+    media_root.enable()
+    test.addCleanup(media_root.disable)
+    return media.name
+
+
+def async_api_client(username='tester'):
+    """An AsyncClient (ASGI request path) carrying a JWT for a new admin user."""
+    user = UserRegister.objects.create_user(username=username, password='x', role='admin')
+    # AsyncClient turns extra defaults into ASGI header names as given
+    return AsyncClient(authorization=f'Bearer {AccessToken.for_user(user)}')
+
+
+class RatioSeriesTests(SimpleTestCase):
+
+    def test_rolling_mean_std_matches_naive_windows(self):
+        rng = random.Random(26)
+        for _ in range(200):
+            window = rng.randint(1, 6)
+            values = [None if rng.random() < 0.15 else round(rng.uniform(-500, 500), 4)
+                      for _ in range(rng.randint(0, 40))]
+            means, stds = rolling_mean_std(values, window)
+            self.assertEqual(len(means), len(values))
+            for i in range(len(values)):
+                frame = values[max(0, i - window + 1):i + 1]
+                if i < window - 1 or None in frame:
+                    self.assertIsNone(means[i])
+                    self.assertIsNone(stds[i])
+                    continue
+                self.assertAlmostEqual(means[i], statistics.fmean(frame), places=3)
+                expected_std = statistics.stdev(frame) if window > 1 else 0.0
+                self.assertAlmostEqual(stds[i], expected_std, places=3)
+
+    def test_rolling_window_longer_than_series(self):
+        self.assertEqual(rolling_mean_std([1.0, 2.0], 3), ([None, None], [None, None]))
+        self.assertEqual(rolling_mean_std([], 3), ([], []))
+
+    def test_constant_window_has_zero_std(self):
+        means, stds = rolling_mean_std([2.5] * 5, 3)
+        self.assertEqual(means[2:], [2.5, 2.5, 2.5])
+        self.assertEqual(stds[2:], [0.0, 0.0, 0.0])
+
+    def test_yoy_change_matches_by_start_date(self):
+        dates = [date(2022, 1, 1), date(2022, 4, 1), date(2023, 1, 1), date(2023, 7, 1), date(2024, 4, 1)]
+        values = [10.0, 4.0, 12.0, 5.0, None]
+        # 2023-07 has no period a year earlier; 2024-04's value is missing
+        self.assertEqual(yoy_change(values, dates), [None, None, 20.0, None, None])
+
+    def test_yoy_change_skips_zero_and_missing_prior(self):
+        dates = [date(2022, 1, 1), date(2022, 2, 1), date(2023, 1, 1), date(2023, 2, 1)]
+        self.assertEqual(yoy_change([0.0, None, 5.0, 5.0], dates), [None, None, None, None])
+
+    def test_yoy_change_leap_day_uses_28_february(self):
+        dates = [date(2023, 2, 28), date(2024, 2, 29)]
+        self.assertEqual(yoy_change([-8.0, -6.0], dates), [None, 25.0])
+
+    def test_yoy_change_matches_naive_lookup(self):
+        rng = random.Random(262)
+        for _ in range(100):
+            d, dates = date(2016, 2, 29), []
+            for _ in range(rng.randint(0, 30)):
+                dates.append(d)
+                d += timedelta(days=rng.choice([28, 31, 92, 365, 366]))
+            values = [None if rng.random() < 0.1 else rng.choice([0.0, rng.uniform(-50, 50)]) for _ in dates]
+            index = {d: i for i, d in enumerate(dates)}
+            expected = []
+            for d, value in zip(dates, values):
+                try:
+                    prior = date(d.year - 1, d.month, d.day)
+                except ValueError:
+                    prior = date(d.year - 1, d.month, 28)
+                j = index.get(prior)
+                previous = values[j] if j is not None else None
+                if value is None or not previous:
+                    expected.append(None)
+                else:
+                    expected.append(round((value - previous) / abs(previous) * 100.0, 2))
+            result = yoy_change(values, dates)
+            for got, want in zip(result, expected):
+                if want is None:
+                    self.assertIsNone(got)
+                else:
+                    self.assertAlmostEqual(got, want, delta=0.011)
+
+
+class TTMCalculatorTests(SimpleTestCase):
+
+    def test_prefix_sums_match_naive_sums(self):
+        rng = random.Random(27)
+        months = make_months(rng, [month_start(2023, 4, i) for i in range(15)])
+        prefix = _prefix_sums(months)
+        fields = [('profit_loss', f) for f in PL_FLOW_FIELDS] + [('trading_account', f) for f in TA_FLOW_FIELDS]
+        for lo in range(len(months)):
+            for hi in range(lo, len(months) + 1):
+                for k, (statement, field) in enumerate(fields):
+                    naive = sum((getattr(getattr(m, statement), field) for m in months[lo:hi]), Decimal('0'))
+                    self.assertEqual(prefix[hi][k] - prefix[lo][k], naive)
+
+    def test_ttm_ratios_match_naive_window(self):
+        rng = random.Random(272)
+        # Twelve contiguous months, a one-month gap, then fourteen more
+        starts = [month_start(2022, 4, i) for i in range(12)] + [month_start(2022, 4, i) for i in range(13, 27)]
+        months = make_months(rng, starts)
+        series = calculate_ttm_series(months, benchmarks=DEFAULT_RATIO_BENCHMARKS)
+
+        closing = [period.start_date for period, _, _, _ in series]
+        # Complete windows: the first twelve months, then every month from the twelfth after the gap
+        self.assertEqual(closing, [starts[11]] + starts[23:])
+
+        for period, window_start, ratios, _ in series:
+            i = months.index(period)
+            window = months[i - TTM_MONTHS + 1:i + 1]
+            self.assertEqual(window_start, window[0].start_date)
+            snapshot = SimpleNamespace(
+                trading_account=TradingAccount(
+                    opening_stock=window[0].trading_account.opening_stock,
+                    closing_stock=window[-1].trading_account.closing_stock,
+                    **{f: sum(getattr(m.trading_account, f) for m in window) for f in TA_FLOW_FIELDS}
+                ),
+                profit_loss=ProfitAndLoss(**{f: sum(getattr(m.profit_loss, f) for m in window) for f in PL_FLOW_FIELDS}),
+                balance_sheet=window[-1].balance_sheet,
+                operational_metrics=window[-1].operational_metrics,
+            )
+            expected = RatioCalculator(snapshot, benchmarks=DEFAULT_RATIO_BENCHMARKS).calculate_all_ratios()
+            self.assertEqual(ratios, expected)
+
+
+class PeriodRollupTests(TestCase):
+
+    def setUp(self):
+        rng = random.Random(28)
+        self.months = [create_month(rng, month_start(2024, 4, i)) for i in range(12)]
+
+    def derived_labels(self):
+        return set(FinancialPeriod.objects.filter(is_derived=True).values_list('label', flat=True))
+
+    def test_rollup_sums_flows_and_takes_closing_balances(self):
+        rollup_all()
+        self.assertEqual(self.derived_labels(), {
+            'Q1_FY_2024_25', 'Q2_FY_2024_25', 'Q3_FY_2024_25', 'Q4_FY_2024_25',
+            'H1_FY_2024_25', 'H2_FY_2024_25', 'FY_2024_25',
+        })
+        quarter = FinancialPeriod.objects.get(label='Q2_FY_2024_25')
+        children = self.months[3:6]
+        for field in PL_FLOW_FIELDS:
+            self.assertEqual(getattr(quarter.profit_loss, field), sum(getattr(c.profit_loss, field) for c in children))
+        for field in TA_FLOW_FIELDS:
+            self.assertEqual(getattr(quarter.trading_account, field), sum(getattr(c.trading_account, field) for c in children))
+        self.assertEqual(quarter.trading_account.opening_stock, children[0].trading_account.opening_stock)
+        self.assertEqual(quarter.trading_account.closing_stock, children[-1].trading_account.closing_stock)
+        for field in BALANCE_SHEET_FIELDS:
+            self.assertEqual(getattr(quarter.balance_sheet, field), getattr(children[-1].balance_sheet, field))
+        self.assertEqual(quarter.operational_metrics.staff_count, children[-1].operational_metrics.staff_count)
+        self.assertTrue(RatioResult.objects.filter(period=quarter).exists())
+
+    def test_uploaded_parent_is_not_overwritten(self):
+        uploaded = FinancialPeriod.objects.create(
+            period_type='QUARTERLY', label='Q1_FY_2024_25', start_date=date(2024, 4, 1), end_date=date(2024, 6, 30),
+        )
+        rollup_all()
+        uploaded.refresh_from_db()
+        self.assertFalse(uploaded.is_derived)
+        self.assertFalse(TradingAccount.objects.filter(period=uploaded).exists())
+
+    def test_deleting_a_month_removes_incomplete_parents(self):
+        rollup_all()
+        refresh_ttm_series()
+        self.assertTrue(TrailingRatioResult.objects.filter(period=self.months[11]).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.months[4].delete()  # Aug_2024
+        self.assertEqual(self.derived_labels(), {'Q1_FY_2024_25', 'Q3_FY_2024_25', 'Q4_FY_2024_25', 'H2_FY_2024_25'})
+        self.assertFalse(TrailingRatioResult.objects.exists())
+
+    def test_deleting_a_statement_removes_incomplete_parents(self):
+        rollup_all()
+        with self.captureOnCommitCallbacks(execute=True):
+            ProfitAndLoss.objects.get(period=self.months[11]).delete()  # Mar_2025
+        self.assertEqual(self.derived_labels(), {'Q1_FY_2024_25', 'Q2_FY_2024_25', 'Q3_FY_2024_25', 'H1_FY_2024_25'})
+
+    def test_parents_come_back_with_the_month(self):
+        rollup_all()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.months[0].delete()
+        recreated = create_month(random.Random(280), month_start(2024, 4, 0))
+        save_ratio_results([recreated])
+        after_period_data_changed(recreated)
+        self.assertEqual(len(self.derived_labels()), 7)
+
+
+HUNDRED, LAKH = Decimal('100.0'), Decimal('100000.0')
+
+
+def legacy_ratios(ta, pl, bs, op, prev=None):
+    """RatioCalculator's formulas as written before the shared ratio engine (prev: opening balances)."""
+    def avg(name):
+        closing = getattr(bs, name)
+        return (getattr(prev, name) + closing) / Decimal('2') if prev is not None else closing
+
+    def pct(num, den):
+        return float((num / den) * HUNDRED) if den > 0 else 0.0
+
+    wf, own = bs.working_fund, bs.own_funds
+    average_stock = (ta.opening_stock + ta.closing_stock) / Decimal('2.0')
+    cogs = ta.sales - ta.gross_profit
+    r = {'working_fund': float(wf), 'own_funds': float(own), 'average_stock': float(average_stock), 'cogs': float(cogs)}
+    r['stock_turnover'] = float(cogs / average_stock) if average_stock > 0 else 0.0
+    r['gross_profit_ratio'] = pct(ta.gross_profit, ta.sales)
+    r['net_profit_ratio'] = pct(pl.net_profit, ta.sales)
+    r['net_own_funds'] = float(own)
+    r['own_fund_to_wf'] = pct(own, wf)
+    r['deposits_to_wf'] = pct(bs.deposits, wf)
+    r['borrowings_to_wf'] = pct(bs.borrowings, wf)
+    r['loans_to_wf'] = pct(bs.loans_advances, wf)
+    r['investments_to_wf'] = pct(bs.investments, wf)
+    r['earning_assets_to_wf'] = pct(bs.loans_advances + bs.investments + bs.cash_at_bank, wf)
+    r['interest_tagged_funds_to_wf'] = pct(bs.deposits + bs.borrowings, wf)
+
+    avg_wf = (getattr(prev, 'working_fund') + wf) / Decimal('2') if prev is not None else wf
+    r['cost_of_deposits'] = pct(pl.interest_on_deposits, avg('deposits'))
+    r['yield_on_loans'] = pct(pl.interest_on_loans, avg('loans_advances'))
+    r['yield_on_investments'] = pct(pl.return_on_investment, avg('investments'))
+    r['credit_deposit_ratio'] = pct(bs.loans_advances, bs.deposits)
+    r['avg_cost_of_wf'] = pct(pl.total_interest_expense, avg_wf)
+    r['avg_yield_on_wf'] = pct(pl.total_interest_income, avg_wf)
+    r['misc_income_to_wf'] = pct(pl.miscellaneous_income, avg_wf)
+    r['interest_exp_to_interest_income'] = pct(pl.total_interest_expense, pl.total_interest_income)
+
+    r['gross_fin_margin'] = r['avg_yield_on_wf'] - r['avg_cost_of_wf']
+    r['operating_cost_to_wf'] = pct(pl.establishment_contingencies, avg_wf)
+    r['net_fin_margin'] = r['gross_fin_margin'] + pct(pl.miscellaneous_income, avg_wf) - r['operating_cost_to_wf']
+    r['risk_cost_to_wf'] = pct(pl.provisions, avg_wf)
+    r['net_margin'] = r['net_fin_margin'] - r['risk_cost_to_wf']
+
+    capital_employed = bs.share_capital + bs.reserves_statutory_free + bs.undistributed_profit
+    r['capital_turnover_ratio'] = float(ta.sales / capital_employed) if capital_employed > 0 else 0.0
+
+    staff = op.staff_count
+    contribution = pl.total_interest_income + pl.miscellaneous_income - pl.total_interest_expense
+    per_employee = {
+        'per_employee_deposit': avg('deposits'),
+        'per_employee_loan': avg('loans_advances'),
+        'per_employee_contribution': contribution,
+        'per_employee_operating_cost': pl.establishment_contingencies,
+    }
+    for name, amount in per_employee.items():
+        r[name] = float((amount / staff) / LAKH) if staff > 0 else 0.0
+    return r
+
+
+class OpeningBalances(SimpleNamespace):
+    """Previous period's BalanceSheet stand-in with the working_fund property."""
+
+    @property
+    def working_fund(self):
+        return self.share_capital + self.deposits + self.borrowings + self.reserves_statutory_free + self.undistributed_profit
+
+
+def random_period(rng):
+    """(period-like object, opening balances) with occasional zero denominators."""
+    trading, profit_loss, balance_sheet, operational = make_statements(rng)
+    if rng.random() < 0.1:
+        trading.sales = Decimal('0')
+    if rng.random() < 0.1:
+        trading.opening_stock = trading.closing_stock = Decimal('0')
+    if rng.random() < 0.1:
+        balance_sheet.investments = Decimal('0')
+    if rng.random() < 0.1:
+        operational.staff_count = 0
+    period = SimpleNamespace(
+        trading_account=trading, profit_loss=profit_loss,
+        balance_sheet=balance_sheet, operational_metrics=operational,
+    )
+    _, _, previous, _ = make_statements(rng)
+    opening = OpeningBalances(**{f: getattr(previous, f) for f in BALANCE_SHEET_FIELDS})
+    return period, opening
+
+
+class RatioEngineTests(SimpleTestCase):
+
+    def assertRatiosEqual(self, got, expected, places=7):
+        self.assertEqual(set(got), set(expected))
+        for name, value in expected.items():
+            self.assertAlmostEqual(got[name], value, places=places, msg=name)
+
+    def test_calculator_matches_legacy_formulas(self):
+        rng = random.Random(31)
+        for _ in range(150):
+            period, opening = random_period(rng)
+            statements = (period.trading_account, period.profit_loss, period.balance_sheet, period.operational_metrics)
+            closing = RatioCalculator(period, benchmarks=DEFAULT_RATIO_BENCHMARKS, averaging='closing')
+            self.assertRatiosEqual(closing.calculate_all_ratios(), legacy_ratios(*statements))
+            average = RatioCalculator(
+                period, benchmarks=DEFAULT_RATIO_BENCHMARKS, averaging='average', previous_balance_sheet=opening,
+            )
+            self.assertRatiosEqual(average.calculate_all_ratios(), legacy_ratios(*statements, prev=opening))
+
+    def test_array_path_matches_scalar_path(self):
+        rng = random.Random(311)
+        periods = [random_period(rng) for _ in range(100)]
+        calculators = [
+            RatioCalculator(period, benchmarks=DEFAULT_RATIO_BENCHMARKS, averaging='average', previous_balance_sheet=opening)
+            for period, opening in periods
+        ]
+        inputs = [calculator.engine_inputs() for calculator in calculators]
+        openings = [calculator.opening_balances() for calculator in calculators]
+        columns = {field: np.array([float(v[field]) for v in inputs]) for field in ratio_engine.INPUT_FIELDS}
+        opening_columns = {name: np.array([float(o[name]) for o in openings]) for name in ratio_engine.AVERAGED_BALANCES}
+
+        arrays = ratio_engine.calculate_all(columns, ratio_engine.ArrayOps, opening_columns)
+        statuses = ratio_engine.traffic_light_arrays(arrays, DEFAULT_RATIO_BENCHMARKS)
+        for i, calculator in enumerate(calculators):
+            scalar = calculator.calculate_all_ratios()
+            for name, value in scalar.items():
+                self.assertAlmostEqual(float(arrays[name][i]), value, delta=1e-6 * max(1.0, abs(value)), msg=name)
+            for name, colour in calculator.get_traffic_light_statuses().items():
+                self.assertEqual(statuses[name][i], colour, msg=name)
+
+    def test_traffic_lights_follow_legacy_thresholds(self):
+        benchmarks = dict(DEFAULT_RATIO_BENCHMARKS, net_margin=2.0, risk_cost_to_wf_max=1.0)
+        status = ratio_engine.traffic_light_status
+        self.assertEqual(status('net_margin', 2.0, benchmarks), 'green')
+        self.assertEqual(status('net_margin', 1.0, benchmarks), 'yellow')
+        self.assertEqual(status('net_margin', 0.99, benchmarks), 'red')
+        self.assertEqual(status('risk_cost_to_wf', 2.0, benchmarks), 'yellow')
+        self.assertEqual(status('risk_cost_to_wf', 2.01, benchmarks), 'red')
+        # Cost of deposits should sit 4 points under the yield on loans, with one point of slack
+        self.assertEqual(status('cost_of_deposits', 6.0, benchmarks, reference=10.0), 'green')
+        self.assertEqual(status('cost_of_deposits', 7.0, benchmarks, reference=10.0), 'yellow')
+        self.assertEqual(status('cost_of_deposits', 7.5, benchmarks, reference=10.0), 'red')
+
+
+class ScenarioViewTests(TestCase):
+
+    def setUp(self):
+        self.period = create_month(random.Random(3100), date(2024, 4, 1))
+        self.client = api_client()
+        self.url = f'/api/periods/{self.period.id}/scenarios/'
+        self.perturbations = [{'field': 'deposits', 'pct': [0, 5, 10]}]
+
+    def post(self, **body):
+        return self.client.post(self.url, dict(perturbations=self.perturbations, **body), format='json')
+
+    def test_scenarios_for_selected_ratios(self):
+        response = self.post(ratios=['net_margin', 'cost_of_deposits'])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(set(data['ratios']), {'net_margin', 'cost_of_deposits'})
+        self.assertAlmostEqual(data['ratios']['net_margin'][0], data['base']['ratios']['net_margin'], places=4)
+
+    def test_ratios_must_be_a_list_of_names(self):
+        for ratios in ('net_margin', [['net_margin']], [{'name': 'net_margin'}], [1]):
+            response = self.post(ratios=ratios)
+            self.assertEqual(response.status_code, 400, ratios)
+            self.assertEqual(response.json()['message'], 'ratios must be a list of ratio names')
+
+    def test_unknown_ratio_is_rejected(self):
+        response = self.post(ratios=['net_margin', 'bogus'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Unknown ratios: bogus')
+
+
+class GoalSeekTests(TestCase):
+
+    def setUp(self):
+        self.period = create_month(random.Random(32), date(2024, 4, 1))
+        self.period = FinancialPeriod.objects.select_related(
+            'trading_account', 'profit_loss', 'balance_sheet', 'operational_metrics'
+        ).get(pk=self.period.pk)
+
+    def ratio_with(self, field, value, ratio):
+        """The ratio after setting `field` to `value` (no re-pricing)."""
+        for statement in ('trading_account', 'profit_loss', 'balance_sheet'):
+            row = getattr(self.period, statement)
+            if hasattr(row, field):
+                setattr(row, field, Decimal(str(value)))
+        return RatioCalculator(self.period, benchmarks=DEFAULT_RATIO_BENCHMARKS).calculate_all_ratios()[ratio]
+
+    def test_converges_to_analytic_solutions(self):
+        bs = self.period.balance_sheet
+        result = goal_seek(self.period, [
+            {'field': 'deposits', 'ratio': 'credit_deposit_ratio', 'target': 80},
+            {'field': 'interest_on_deposits', 'ratio': 'cost_of_deposits', 'target': 5},
+            {'field': 'loans_advances', 'ratio': 'loans_to_wf', 'target': 70, 'hold_rate': False},
+        ])
+        goals = {g['field']: g for g in result['goals']}
+        self.assertTrue(all(g['status'] == 'solved' for g in goals.values()))
+        # Bisection stops at a bracket of 1e-9 relative width
+        expected_deposits = float(bs.loans_advances) / 0.8
+        self.assertAlmostEqual(goals['deposits']['solved_value'], expected_deposits, delta=1e-8 * expected_deposits)
+        self.assertAlmostEqual(goals['interest_on_deposits']['solved_value'], float(bs.deposits) * 0.05, delta=1.0)
+        # Loans are not part of the working fund, so the solution is 70% of it
+        expected_loans = 0.7 * float(bs.working_fund)
+        self.assertAlmostEqual(goals['loans_advances']['solved_value'], expected_loans, delta=1e-8 * expected_loans)
+        self.assertLessEqual(result['iterations'], 200)
+
+    def test_solution_hits_target_when_recalculated(self):
+        result = goal_seek(self.period, [{'field': 'establishment_contingencies', 'ratio': 'net_margin', 'target': 0.3}])
+        goal = result['goals'][0]
+        self.assertEqual(goal['status'], 'solved')
+        self.assertLess(goal['solved_value'], goal['base_value'])
+        self.assertAlmostEqual(goal['ratio_at_solution'], 0.3, places=5)
+        self.assertAlmostEqual(self.ratio_with('establishment_contingencies', goal['solved_value'], 'net_margin'), 0.3, places=5)
+
+    def test_unreachable_goal(self):
+        # Cash at bank is not part of the working fund, so it cannot move the net margin
+        result = goal_seek(self.period, [{'field': 'cash_at_bank', 'ratio': 'net_margin', 'target': 5}])
+        self.assertEqual(result['goals'][0]['status'], 'unreachable')
+
+    def test_rejects_malformed_goals(self):
+        from app.services.goal_seek import GoalSeekError
+        for goals in ([], [{'field': ['deposits'], 'ratio': 'net_margin'}], [{'field': 'deposits', 'ratio': ['net_margin']}],
+                      [{'field': 'deposits', 'ratio': 'working_fund'}]):
+            with self.assertRaises(GoalSeekError):
+                goal_seek(self.period, goals)
+
+
+# Row labels of the Excel template, by statement
+STATEMENT_LABELS = {
+    'balance_sheet': (
+        [('Share Capital', 'share_capital'), ('Deposits', 'deposits'), ('Borrowings', 'borrowings'),
+         ('Reserves (Statutory & Free)', 'reserves_statutory_free'), ('Provisions', 'provisions'),
+         ('Other Liabilities', 'other_liabilities'), ('Undistributed Profit', 'undistributed_profit')],
+        [('Cash in Hand', 'cash_in_hand'), ('Cash at Bank', 'cash_at_bank'), ('Investments', 'investments'),
+         ('Loans & Advances', 'loans_advances'), ('Fixed Assets', 'fixed_assets'), ('Other Assets', 'other_assets'),
+         ('Stock in Trade', 'stock_in_trade')],
+    ),
+    'profit_loss': (
+        [('Interest on Deposits', 'interest_on_deposits'), ('Interest on Borrowings', 'interest_on_borrowings'),
+         ('Establishment & Contingencies', 'establishment_contingencies'), ('Provisions Made', 'provisions'),
+         ('Net Profit', 'net_profit')],
+        [('Interest on Loans', 'interest_on_loans'), ('Interest on Bank A/c', 'interest_on_bank_ac'),
+         ('Return on Investment', 'return_on_investment'), ('Miscellaneous Income', 'miscellaneous_income')],
+    ),
+    'trading_account': [
+        ('Opening Stock', 'opening_stock'), ('Purchases', 'purchases'), ('Trade Charges', 'trade_charges'),
+        ('Sales', 'sales'), ('Closing Stock', 'closing_stock'),
+    ],
+}
+
+
+def statement_workbook(period, **overrides):
+    """An upload workbook (Format B sheets) holding `period`'s statements, with `overrides` by field."""
+    def value(statement, field):
+        return float(overrides.get(field, getattr(getattr(period, statement), field)))
+
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    balance = workbook.create_sheet('Balance Sheet')
+    balance.append(['Liabilities', 'Amount', 'Assets', 'Amount'])
+    for row in zip(STATEMENT_LABELS['balance_sheet'][0], STATEMENT_LABELS['balance_sheet'][1]):
+        (liability, liability_field), (asset, asset_field) = row
+        balance.append([liability, value('balance_sheet', liability_field), asset, value('balance_sheet', asset_field)])
+    profit_loss = workbook.create_sheet('Profit and Loss')
+    profit_loss.append(['Expenses', 'Amount', 'Income', 'Amount'])
+    expenses, income = STATEMENT_LABELS['profit_loss']
+    for index, (label, field) in enumerate(expenses):
+        row = [label, value('profit_loss', field)]
+        if index < len(income):
+            row += [income[index][0], value('profit_loss', income[index][1])]
+        profit_loss.append(row)
+    trading = workbook.create_sheet('Trading Account')
+    trading.append(['Item', 'Amount'])
+    for label, field in STATEMENT_LABELS['trading_account']:
+        trading.append([label, value('trading_account', field)])
+    metrics = workbook.create_sheet('Operational Metrics')
+    metrics.append(['Metric', 'Value'])
+    metrics.append(['Staff Count', period.operational_metrics.staff_count])
+    content = BytesIO()
+    workbook.save(content)
+    return content.getvalue()
+
+
+class RatioStatisticsTests(TestCase):
+
+    def record_months(self, count, seed=34):
+        rng = random.Random(seed)
+        for offset in range(count):
+            create_month(rng, month_start(2023, 1, offset))
+        save_ratio_results(FinancialPeriod.objects.select_related(*STATEMENT_RELATIONS))
+        return list(FinancialPeriod.objects.select_related(*STATEMENT_RELATIONS).order_by('start_date'))
+
+    def statistic(self, period_type, name, kind='field'):
+        return RatioStatistic.objects.get(period_type=period_type, kind=kind, name=name)
+
+    def test_running_statistics_match_full_recomputation(self):
+        rng = random.Random(340)
+        values = [rng.uniform(-1e6, 1e6) for _ in range(50)]
+        stat = RatioStatistic(period_type='MONTHLY', kind='field', name='x')
+        for x in values:
+            ratio_statistics._add(stat, x)
+        self.assertEqual(stat.count, len(values))
+        self.assertAlmostEqual(stat.mean, statistics.mean(values), delta=1e-6)
+        self.assertAlmostEqual(stat.m2 / stat.count, statistics.pvariance(values), delta=1e-6 * statistics.pvariance(values))
+        for x in values[:20]:
+            count, mean, m2 = ratio_statistics._leave_one_out(stat.count, stat.mean, stat.m2, x)
+            rest = list(values)
+            rest.remove(x)
+            self.assertEqual(count, len(rest))
+            self.assertAlmostEqual(mean, statistics.mean(rest), delta=1e-6)
+            self.assertAlmostEqual(m2 / count, statistics.pvariance(rest), delta=1e-6 * statistics.pvariance(rest))
+        for x in values[:30]:
+            ratio_statistics._remove(stat, x)
+        rest = values[30:]
+        self.assertEqual(stat.count, len(rest))
+        self.assertAlmostEqual(stat.mean, statistics.mean(rest), delta=1e-6)
+        self.assertAlmostEqual(stat.m2 / stat.count, statistics.pvariance(rest), delta=1e-6 * statistics.pvariance(rest))
+        for x in rest:
+            ratio_statistics._remove(stat, x)
+        self.assertEqual((stat.count, stat.mean, stat.m2), (0, 0.0, 0.0))
+
+    def test_recording_again_replaces_the_contribution(self):
+        periods = self.record_months(3)
+        period = periods[0]
+        BalanceSheet.objects.filter(period=period).update(cash_at_bank=Decimal('1000.00'))
+        ratio_statistics.record_period(period)
+        ratio_statistics.record_period(period)
+        stat = self.statistic('MONTHLY', 'cash_at_bank')
+        values = [1000.0] + [float(p.balance_sheet.cash_at_bank) for p in periods[1:]]
+        self.assertEqual(stat.count, 3)
+        self.assertAlmostEqual(stat.mean, statistics.mean(values), places=4)
+        self.assertAlmostEqual(stat.m2 / stat.count, statistics.pvariance(values), delta=1e-6 * statistics.pvariance(values))
+        self.assertEqual(RatioStatisticSample.objects.count(), 3)
+
+    def test_deleting_a_period_removes_its_sample(self):
+        periods = self.record_months(3)
+        periods[0].delete()
+        self.assertFalse(RatioStatisticSample.objects.filter(period_id=periods[0].pk).exists())
+        stat = self.statistic('MONTHLY', 'cash_at_bank')
+        values = [float(p.balance_sheet.cash_at_bank) for p in periods[1:]]
+        self.assertEqual(stat.count, 2)
+        self.assertAlmostEqual(stat.mean, statistics.mean(values), places=4)
+
+    def test_period_type_change_moves_the_contribution(self):
+        periods = self.record_months(2)
+        period = periods[0]
+        period.period_type = 'YEARLY'
+        period.save()
+        # Used to re-create the MONTHLY rows it did not load and fail on the unique constraint
+        ratio_statistics.record_period(period)
+        monthly, yearly = self.statistic('MONTHLY', 'deposits'), self.statistic('YEARLY', 'deposits')
+        self.assertEqual((monthly.count, yearly.count), (1, 1))
+        self.assertAlmostEqual(monthly.mean, float(periods[1].balance_sheet.deposits), places=4)
+        self.assertAlmostEqual(yearly.mean, float(period.balance_sheet.deposits), places=4)
+        self.assertEqual(RatioStatisticSample.objects.get(period=period).period_type, 'YEARLY')
+
+    def test_upload_flags_a_value_with_a_missing_zero(self):
+        temporary_media(self)
+        periods = self.record_months(6)
+        cash_at_bank = periods[0].balance_sheet.cash_at_bank * 10
+        upload = SimpleUploadedFile('Jul_2023.xlsx', statement_workbook(periods[0], cash_at_bank=cash_at_bank))
+        response = api_client().post('/api/upload-excel/', {'file': upload}, format='multipart')
+        body = response.json()
+        self.assertEqual(body['status'], 'success', body.get('message'))
+        flags = {(flag['kind'], flag['name']): flag for flag in body['anomalies']}
+        flag = flags[('field', 'cash_at_bank')]
+        self.assertEqual(flag['value'], float(cash_at_bank))
+        self.assertEqual(flag['samples'], 6)
+        self.assertGreater(flag['z_score'], 3)
+        # Every other statement field matches a recorded month
+        self.assertEqual([name for kind, name in flags if kind == 'field'], ['cash_at_bank'])
+
+
+class ExportStreamingTests(TestCase):
+
+    def setUp(self):
+        rng = random.Random(35)
+        self.months = [create_month(rng, month_start(2020, 1, offset)) for offset in range(30)]
+
+    def test_wsgi_export_streams_rows_lazily(self):
+        response = api_client().get('/api/export/all/', {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.is_async)
+        chunks = iter(response.streaming_content)
+        self.assertTrue(next(chunks).startswith(b'id,label,period_type'))
+        lines = [next(chunks) for _ in range(5)]
+        self.assertTrue(lines[0].startswith(f'{self.months[0].id},Jan_2020,'.encode()))
+        self.assertEqual(len(list(chunks)), len(self.months) - 5)
+        response.close()
+
+    async def test_asgi_export_streams_without_buffering(self):
+        client = await sync_to_async(async_api_client)()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            response = await client.get('/api/export/all/', {'format': 'jsonl'})
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async)
+            lines = [line async for line in response.streaming_content]
+        self.assertEqual(len(lines), len(self.months))
+        self.assertEqual(json.loads(lines[-1])['label'], 'Jun_2022')
+        # Django warns when it has to read a sync iterator into a list to serve it over ASGI
+        self.assertFalse([w for w in caught if 'consume' in str(w.message)])
+
+
+class AsyncChunksTests(SimpleTestCase):
+
+    async def test_pulls_one_batch_at_a_time(self):
+        produced = []
+
+        def rows():
+            for i in range(25):
+                produced.append(i)
+                yield i
+
+        chunks = async_chunks(rows(), batch=10)
+        self.assertEqual(await anext(chunks), 0)
+        self.assertEqual(len(produced), 10)
+        self.assertEqual([item async for item in chunks], list(range(1, 25)))
+
+    async def test_closes_the_sync_iterator(self):
+        closed = []
+
+        def rows():
+            try:
+                yield from range(100)
+            finally:
+                closed.append(True)
+
+        chunks = async_chunks(rows(), batch=10)
+        await anext(chunks)
+        await chunks.aclose()
+        self.assertEqual(closed, [True])
+
+
+class WorkbookDownloadTests(TestCase):
+    URL = '/api/download-excel-template/'
+
+    def setUp(self):
+        # The export cache is on by default; keep its files out of the source tree
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache_dir = override_settings(EXPORT_CACHE_DIR=directory.name)
+        cache_dir.enable()
+        self.addCleanup(cache_dir.disable)
+
+    def assertWorkbookAttachment(self, response, body):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(body.startswith(b'PK'))  # xlsx is a zip archive
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="Financial_Data_Template.xlsx"')
+
+    @override_settings(EXPORT_CACHE_MAX_BYTES=0)
+    def test_wsgi_download_is_a_file_response(self):
+        response = api_client().get(self.URL)
+        self.assertFalse(response.is_async)
+        self.assertWorkbookAttachment(response, b''.join(response.streaming_content))
+        response.close()
+
+    @override_settings(EXPORT_CACHE_MAX_BYTES=0)
+    async def test_asgi_download_reads_the_file_asynchronously(self):
+        client = await sync_to_async(async_api_client)()
+        response = await client.get(self.URL)
+        self.assertTrue(response.is_async)
+        self.assertWorkbookAttachment(response, b''.join([chunk async for chunk in response.streaming_content]))
+
+    async def test_asgi_download_from_export_cache(self):
+        client = await sync_to_async(async_api_client)()
+        bodies = []
+        for _ in range(2):
+            response = await client.get(self.URL)
+            self.assertTrue(response.is_async)
+            bodies.append(b''.join([chunk async for chunk in response.streaming_content]))
+        self.assertWorkbookAttachment(response, bodies[1])
+        self.assertEqual(bodies[0], bodies[1])
+        self.assertEqual(len(os.listdir(settings.EXPORT_CACHE_DIR)), 1)
+
+
+class Document:
+    """Stand-in for a workbook: .save(file) writes `content`."""
+
+    def __init__(self, content):
+        self.content = content
+
+    def save(self, file):
+        file.write(self.content)
+
+
+class ExportCacheTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache_dir = override_settings(EXPORT_CACHE_DIR=directory.name, EXPORT_CACHE_MAX_BYTES=1000)
+        cache_dir.enable()
+        self.addCleanup(cache_dir.disable)
+        self.directory = directory.name
+        self.builds = 0
+
+    def build(self, content=b'x' * 100):
+        self.builds += 1
+        return Document(content)
+
+    def artifact(self, name, size, age):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as file:
+            file.write(b'x' * size)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_cache_key(self):
+        key = export_cache.cache_key('period-xlsx', [3, '2024-05-01T00:00:00'])
+        self.assertRegex(key, r'^[0-9a-f]{40}$')
+        self.assertEqual(export_cache.cache_key('period-xlsx', [3, '2024-05-01T00:00:00']), key)
+        self.assertNotEqual(export_cache.cache_key('period-docx', [3, '2024-05-01T00:00:00']), key)
+        self.assertNotEqual(export_cache.cache_key('period-xlsx', [3, '2024-05-01T00:00:01']), key)
+        self.assertNotEqual(export_cache.cache_key('period-xlsx', [4, '2024-05-01T00:00:00']), key)
+
+    def test_evicts_least_recently_used_first(self):
+        oldest = self.artifact('a.xlsx', 400, age=300)
+        middle = self.artifact('b.xlsx', 400, age=200)
+        newest = self.artifact('c.xlsx', 400, age=100)
+        self.artifact('d.tmp', 400, age=400)  # an artifact being written
+        self.assertEqual(export_cache.evict(), 1)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['b.xlsx', 'c.xlsx', 'd.tmp'])
+        self.assertEqual(export_cache.evict(max_bytes=400, keep=middle), 1)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['b.xlsx', 'd.tmp'])
+        self.assertFalse(os.path.exists(oldest) or os.path.exists(newest))
+
+    def test_artifact_larger_than_the_cap_is_still_served(self):
+        self.artifact('old.xlsx', 500, age=100)
+        path = export_cache.cache_dir() / 'new.xlsx'
+        with export_cache._open_cached(path, lambda: self.build(b'y' * 2000)) as handle:
+            self.assertEqual(handle.read(), b'y' * 2000)
+        self.assertEqual(os.listdir(self.directory), ['new.xlsx'])
+
+    def response(self, **headers):
+        request = RequestFactory().get('/api/download-excel-template/', **headers)
+        return export_cache.cached_file_response(
+            request, 'test', [1], 'export.xlsx', 'application/octet-stream', build=self.build,
+            last_modified=timezone.now() - timedelta(hours=1),
+        )
+
+    def test_unchanged_artifact_is_not_modified(self):
+        response = self.response()
+        self.assertEqual(b''.join(response.streaming_content), b'x' * 100)
+        response.close()
+        self.assertEqual(self.builds, 1)
+        cached = self.response()
+        cached.close()
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertEqual(self.builds, 1)  # served from the cache
+
+        not_modified = self.response(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        since = self.response(HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+        changed = self.response(HTTP_IF_NONE_MATCH='"other"')
+        changed.close()
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(self.builds, 1)
+
+
+@override_settings(REPORT_MAX_WORKERS=0)
+class ReportBundleTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        cache_dir = override_settings(EXPORT_CACHE_DIR=directory.name)
+        cache_dir.enable()
+        self.addCleanup(cache_dir.disable)
+        self.directory = directory.name
+        rng = random.Random(40)
+        for offset in range(3):
+            create_month(rng, month_start(2024, 4, offset))
+        save_ratio_results(FinancialPeriod.objects.select_related(*STATEMENT_RELATIONS))
+
+    def bundle(self):
+        """(stats, {member name: content}) of a fresh ReportBundle for every period."""
+        bundle = ReportBundle(FinancialPeriod.objects.all())
+        output = BytesIO()
+        bundle.save(output)
+        with zipfile.ZipFile(output) as archive:
+            contents = {name: archive.read(name) for name in archive.namelist()}
+        self.assertEqual(len(contents), 3)
+        self.assertTrue(all(content.startswith(b'PK') for content in contents.values()))
+        return bundle.stats, contents
+
+    def test_renders_only_missing_reports(self):
+        stats, contents = self.bundle()
+        self.assertEqual(stats['rendered'], 3)
+        stats, cached = self.bundle()
+        self.assertEqual(stats['rendered'], 0)
+        self.assertEqual(cached, contents)
+
+        os.remove(os.path.join(self.directory, sorted(os.listdir(self.directory))[0]))
+        stats, _ = self.bundle()
+        self.assertEqual(stats['rendered'], 1)
+        self.assertEqual(len(os.listdir(self.directory)), 3)
+
+    def test_report_evicted_after_it_was_opened_is_still_bundled(self):
+        _, contents = self.bundle()
+        open_artifact = export_cache.open_artifact
+
+        def open_then_evict(path):
+            handle = open_artifact(path)
+            if handle is not None:
+                os.remove(path)
+            return handle
+
+        with mock.patch.object(export_cache, 'open_artifact', open_then_evict):
+            stats, bundled = self.bundle()
+        self.assertEqual(stats['rendered'], 0)
+        self.assertEqual(bundled, contents)
+
+    def test_report_evicted_after_it_was_rendered_is_rendered_again(self):
+        open_artifact = export_cache.open_artifact
+        opened = []
+
+        def evict_once_rendered(path):
+            opened.append(path)
+            if opened.count(path) == 2:  # the open right after rendering
+                os.remove(path)
+            return open_artifact(path)
+
+        with mock.patch.object(export_cache, 'open_artifact', evict_once_rendered):
+            stats, _ = self.bundle()
+        self.assertEqual(stats['rendered'], 3)
+        self.assertEqual(len(os.listdir(self.directory)), 3)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        clear_user_cache()
+        self.addCleanup(clear_user_cache)
+        self.user = UserRegister.objects.create_user(username='jwt-user', password='x', role='admin', first_name='Old')
+        self.token = AccessToken.for_user(self.user)
+        self.authentication = CachedJWTAuthentication()
+
+    def get_user(self):
+        return self.authentication.get_user(self.authentication.get_validated_token(str(self.token)))
+
+    def client_for(self, user):
+        return APIClient(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+
+    def test_second_lookup_runs_no_queries(self):
+        with self.assertNumQueries(1):
+            first = self.get_user()
+        with self.assertNumQueries(0):
+            second = self.get_user()
+        self.assertEqual((second.pk, second.username, second.role), (self.user.pk, 'jwt-user', 'admin'))
+        self.assertIsNot(second, first)
+
+    def test_requests_reuse_the_cached_user(self):
+        client = self.client_for(self.user)
+        self.assertEqual(client.get(f'/api/profile/{self.user.pk}/').status_code, 200)
+        self.assertIn(str(self.user.pk), authentication._users)
+
+    def test_profile_update_evicts_the_entry(self):
+        self.get_user()
+        client = self.client_for(self.user)
+        response = client.patch(f'/api/profile/{self.user.pk}/', {'first_name': 'New'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(str(self.user.pk), authentication._users)
+        self.assertEqual(self.get_user().first_name, 'New')
+
+    def test_deactivation_through_user_management_rejects_the_user(self):
+        admin = UserRegister.objects.create_user(username='jwt-admin', password='x', role='admin')
+        client = self.client_for(self.user)
+        self.assertEqual(client.get('/api/usermanagement/').status_code, 200)
+        response = self.client_for(admin).patch(f'/api/usermanagement/{self.user.pk}/', {'is_active': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(str(self.user.pk), authentication._users)
+        self.assertEqual(client.get('/api/usermanagement/').status_code, 401)
+
+    def test_inactive_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.get_user()
+        # Rejected from the cache too
+        with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+            self.get_user()
+
+    @override_settings(JWT_USER_CACHE_TTL=60)
+    def test_entry_is_reloaded_after_the_ttl(self):
+        self.get_user()
+        # A queryset update sends no post_save, so the cached entry stays until it expires
+        UserRegister.objects.filter(pk=self.user.pk).update(first_name='New')
+        now = time.monotonic()
+        with mock.patch('app.authentication.time.monotonic', return_value=now + 59), self.assertNumQueries(0):
+            self.assertEqual(self.get_user().first_name, 'Old')
+        with mock.patch('app.authentication.time.monotonic', return_value=now + 61), self.assertNumQueries(1):
+            self.assertEqual(self.get_user().first_name, 'New')
+
+
+class ParseRangeTests(SimpleTestCase):
+
+    def test_ranges(self):
+        cases = [
+            ('bytes=0-99', (0, 99)),
+            ('bytes=900-', (900, 999)),
+            ('bytes=0-5000', (0, 999)),  # end past the file is clamped
+            ('bytes=999-999', (999, 999)),
+            ('bytes=-100', (900, 999)),  # suffix: the last 100 bytes
+            ('bytes=-2000', (0, 999)),
+            (' bytes=1-2 ', (1, 2)),
+        ]
+        for header, expected in cases:
+            self.assertEqual(parse_range(header, 1000), expected, header)
+
+    def test_whole_file(self):
+        for header in (None, '', 'bytes=-', 'bytes=0-1,5-6', 'items=0-1', 'bytes=a-b', 'bytes 0-1'):
+            self.assertIsNone(parse_range(header, 1000), header)
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=1000-', 'bytes=1000-2000', 'bytes=5-2', 'bytes=-0'):
+            self.assertIs(parse_range(header, 1000), False, header)
+        self.assertIs(parse_range('bytes=0-', 0), False)
+        self.assertIs(parse_range('bytes=-5', 0), False)
+
+
+class FileDeliveryTests(TestCase):
+    CONTENT = bytes(range(256)) * 1000
+    FILENAME = 'Q1 "final" \u20b9.xlsx'
+
+    def setUp(self):
+        temporary_media(self)
+        period = FinancialPeriod.objects.create(
+            period_type='MONTHLY', label='Jan_2024', start_date=date(2024, 1, 1), end_date=date(2024, 1, 31),
+            uploaded_file=SimpleUploadedFile(self.FILENAME, self.CONTENT),
+        )
+        self.url = f'/api/ratio/download-original/{period.id}/'
+
+    def body(self, response):
+        content = b''.join(response.streaming_content)
+        response.close()
+        return content
+
+    def test_full_download(self):
+        response = api_client().get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(self.CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        # Quoted and RFC 5987 encoded, not a raw filename="..." that the quote would cut short
+        self.assertEqual(
+            response['Content-Disposition'], "attachment; filename*=utf-8''Q1%20%22final%22%20%E2%82%B9.xlsx",
+        )
+
+    def test_byte_range(self):
+        response = api_client().get(self.url, HTTP_RANGE='bytes=1000-1999')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1999/{len(self.CONTENT)}')
+        self.assertEqual(response['Content-Length'], '1000')
+        self.assertEqual(self.body(response), self.CONTENT[1000:2000])
+
+    def test_stale_if_range_sends_everything(self):
+        response = api_client().get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.CONTENT)
+
+    def test_unsatisfiable_range(self):
+        response = api_client().get(self.url, HTTP_RANGE=f'bytes={len(self.CONTENT)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.CONTENT)}')
+
+    def test_matching_etag_is_not_modified(self):
+        client = api_client()
+        etag = client.get(self.url)['ETag']
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    async def test_asgi_range_is_read_asynchronously(self):
+        client = await sync_to_async(async_api_client)()
+        response = await client.get(self.url, headers={'Range': 'bytes=100000-'})
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), self.CONTENT[100000:])
+
+
+class BlobStorageTests(TestCase):
+    NOW = timedelta(0)  # grace period that lets collect_garbage() take anything unreferenced
+
+    def setUp(self):
+        self.media = temporary_media(self)
+
+    def upload(self, label, content, start=date(2024, 1, 1)):
+        return FinancialPeriod.objects.create(
+            period_type='MONTHLY', label=label, start_date=start, end_date=start + timedelta(days=27),
+            uploaded_file=SimpleUploadedFile('statement.xlsx', content),
+        )
+
+    def blob(self, period):
+        return StoredBlob.objects.get(name=period.uploaded_file.name)
+
+    def blob_exists(self, name):
+        return os.path.exists(os.path.join(self.media, name))
+
+    def test_identical_uploads_share_one_counted_blob(self):
+        first = self.upload('Jan_2024', b'same bytes')
+        second = self.upload('Feb_2024', b'same bytes', date(2024, 2, 1))
+        self.assertEqual(first.uploaded_file.name, second.uploaded_file.name)
+        self.assertTrue(first.uploaded_file.name.startswith(blob_storage.BLOB_PREFIX))
+        self.assertEqual(self.blob(first).ref_count, 2)
+        self.assertEqual(self.blob(first).size, len(b'same bytes'))
+
+    def test_replacing_a_file_moves_the_reference(self):
+        period = self.upload('Jan_2024', b'version 1')
+        old_name = period.uploaded_file.name
+        period = FinancialPeriod.objects.get(pk=period.pk)
+        period.uploaded_file = SimpleUploadedFile('statement.xlsx', b'version 2')
+        period.save()
+        self.assertEqual(StoredBlob.objects.get(name=old_name).ref_count, 0)
+        self.assertEqual(self.blob(period).ref_count, 1)
+
+    def test_collects_only_unreferenced_blobs(self):
+        kept = self.upload('Jan_2024', b'kept')
+        dropped = self.upload('Feb_2024', b'dropped', date(2024, 2, 1))
+        dropped_name = dropped.uploaded_file.name
+        dropped.delete()
+        self.assertEqual(StoredBlob.objects.get(name=dropped_name).ref_count, 0)
+
+        result = blob_storage.collect_garbage(grace=self.NOW)
+        self.assertEqual((result['deleted'], result['orphans'], result['bytes']), (1, 0, len(b'dropped')))
+        self.assertFalse(StoredBlob.objects.filter(name=dropped_name).exists())
+        self.assertFalse(self.blob_exists(dropped_name))
+        self.assertEqual(self.blob(kept).ref_count, 1)
+        self.assertTrue(self.blob_exists(kept.uploaded_file.name))
+
+    def test_grace_period_and_dry_run_keep_files(self):
+        period = self.upload('Jan_2024', b'recent')
+        name = period.uploaded_file.name
+        period.delete()
+        self.assertEqual(blob_storage.collect_garbage()['deleted'], 0)  # released just now
+        self.assertEqual(blob_storage.collect_garbage(grace=self.NOW, dry_run=True)['deleted'], 1)
+        self.assertTrue(StoredBlob.objects.filter(name=name).exists())
+        self.assertTrue(self.blob_exists(name))
+
+    def test_reconcile_repairs_counts_and_orphans_are_removed(self):
+        period = self.upload('Jan_2024', b'counted')
+        StoredBlob.objects.filter(name=period.uploaded_file.name).update(ref_count=5)
+        orphan = os.path.join(self.media, blob_storage.BLOB_PREFIX, 'ab', 'orphan.xlsx')
+        os.makedirs(os.path.dirname(orphan))
+        with open(orphan, 'wb') as handle:
+            handle.write(b'no row')
+
+        result = blob_storage.collect_garbage(grace=self.NOW)
+        self.assertEqual((result['reconciled'], result['deleted'], result['orphans']), (1, 0, 1))
+        self.assertEqual(self.blob(period).ref_count, 1)
+        self.assertFalse(os.path.exists(orphan))
+
+
+# Any alias in DATABASES counts as a configured replica
+@override_settings(DB_REPLICA_ALIAS='default')
+class PrimaryStickinessTests(TestCase):
+
+    def setUp(self):
+        cache.clear()  # pins from earlier tests' users (primary keys are reused after rollback)
+        self.user = UserRegister.objects.create_user(username='writer', password='x', role='admin')
+
+    def request(self, method, user=None):
+        request = getattr(RequestFactory(), method)('/api/upload-excel/')
+        request.user = user or self.user
+        return request
+
+    def test_sync_write_pins_user(self):
+        middleware = PrimaryStickinessMiddleware(lambda request: HttpResponse())
+        self.assertFalse(iscoroutinefunction(middleware))
+        middleware(self.request('get'))
+        self.assertFalse(is_pinned(self.user))
+        middleware(self.request('post'))
+        self.assertTrue(is_pinned(self.user))
+
+    async def test_async_write_pins_user(self):
+        async def view(request):
+            return HttpResponse(status=request.status)
+
+        middleware = PrimaryStickinessMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        failed = self.request('post')
+        failed.status = 400
+        await middleware(failed)
+        self.assertFalse(await sync_to_async(is_pinned)(self.user))
+        written = self.request('post')
+        written.status = 201
+        response = await middleware(written)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await sync_to_async(is_pinned)(self.user))
+
+
+class ResponseCacheTests(TestCase):
+    URL = '/api/ratio-results/'
+
+    def setUp(self):
+        cache.clear()
+        rng = random.Random(45)
+        for offset in range(3):
+            create_month(rng, month_start(2024, 1, offset))
+        with self.captureOnCommitCallbacks(execute=True):
+            save_ratio_results(list(FinancialPeriod.objects.all()))
+        self.client = api_client()
+
+    def get(self, url=URL, **params):
+        response = self.client.get(url, params)
+        return response, response.get('X-Cache')
+
+    def test_repeat_request_is_a_hit(self):
+        first, outcome = self.get()
+        self.assertEqual((first.status_code, outcome), (200, 'MISS'))
+        second, outcome = self.get()
+        self.assertEqual((second.status_code, outcome), (200, 'HIT'))
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_query_parameters_are_part_of_the_key(self):
+        period = FinancialPeriod.objects.earliest('start_date')
+        self.get()
+        response, outcome = self.get(period=period.id)
+        self.assertEqual(outcome, 'MISS')
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(self.get(period=period.id)[1], 'HIT')
+
+    def test_key_ignores_parameter_order(self):
+        self.assertEqual(
+            cache_key('dashboard', QueryDict('a=1&b=2&b=3'), 7, {'pk': 1}),
+            cache_key('dashboard', QueryDict('b=2&b=3&a=1'), 7, {'pk': 1}),
+        )
+        self.assertNotEqual(
+            cache_key('dashboard', QueryDict('a=1'), 7), cache_key('dashboard', QueryDict('a=1'), 8),
+        )
+
+    def test_data_change_bumps_the_version(self):
+        self.get()
+        version = data_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            RatioResult.objects.filter(period=FinancialPeriod.objects.earliest('start_date')).delete()
+        self.assertGreater(data_version(), version)
+        response, outcome = self.get()
+        self.assertEqual(outcome, 'MISS')
+        self.assertEqual(len(response.json()), 2)
+
+    def test_bump_waits_for_commit_and_always_increases(self):
+        version = data_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            bump_data_version()
+            bump_data_version()
+        self.assertEqual(data_version(), version)
+        cache.set('analytics:data-version', 2 ** 62, None)  # a version ahead of the clock
+        for callback in callbacks:
+            callback()
+        self.assertEqual(data_version(), 2 ** 62 + 2)
+
+    def test_errors_are_not_stored(self):
+        skipped = cache_stats()['endpoints'].get('dashboard', {}).get('skipped', 0)
+        for _ in range(2):
+            response, outcome = self.get('/api/dashboard/', category='unknown')
+            self.assertEqual((response.status_code, outcome), (400, 'MISS'))
+        self.assertEqual(cache_stats()['endpoints']['dashboard']['skipped'], skipped + 2)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=0)
+    def test_disabled_cache(self):
+        self.assertIsNone(self.get()[1])
+        self.assertIsNone(self.get()[1])
+
+
+class ConditionalGetTests(TestCase):
+    URL = '/api/balance-sheets/'
+
+    def setUp(self):
+        cache.clear()
+        rng = random.Random(46)
+        self.periods = [create_month(rng, month_start(2024, 1, offset)) for offset in range(3)]
+        with self.captureOnCommitCallbacks(execute=True):
+            save_ratio_results(list(FinancialPeriod.objects.all()))
+        self.client = api_client()
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertTrue(response.has_header('Last-Modified'))
+        etag = response['ETag']
+
+        not_modified = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(not_modified['ETag'], etag)
+        since = self.client.get(self.URL, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+    def test_changes_give_a_new_etag(self):
+        etag = self.client.get(self.URL)['ETag']
+        balance_sheet = BalanceSheet.objects.get(period=self.periods[1])
+        balance_sheet.cash_in_hand += 1
+        balance_sheet.save()
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_deleting_an_older_nested_row_gives_a_new_etag(self):
+        url = '/api/ratio-results/'
+        etag = self.client.get(url)['ETag']
+        # Not the newest stamp: only the stamped-row count notices
+        TradingAccount.objects.filter(period=self.periods[0]).delete()
+        cache.clear()  # the response cache's version bump waits for a commit that never comes here
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_depends_on_the_query(self):
+        everything = self.client.get(self.URL)['ETag']
+        one = self.client.get(self.URL, {'period': self.periods[0].id})
+        self.assertNotEqual(one['ETag'], everything)
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=everything).status_code, 304)
+        self.assertEqual(
+            self.client.get(self.URL, {'period': self.periods[0].id}, HTTP_IF_NONE_MATCH=everything).status_code, 200,
+        )
+
+    def test_errors_carry_no_validators(self):
+        response = self.client.get(f'{self.URL}999999/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+    async def test_async_view_answers_304(self):
+        client = await sync_to_async(async_api_client)('async-tester')
+        response = await client.get('/api/ratio-results/')
+        self.assertEqual(response.status_code, 200)
+        not_modified = await client.get('/api/ratio-results/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+
+
+def rows_from_columns(table, group_names=()):
+    """Inverse of to_columns() for comparing the two layouts."""
+    rows = []
+    for i in range(table['length']):
+        row = {field: values[i] for field, values in table['index'].items()}
+        row.update((field, values[i]) for field, values in table['columns'].items())
+        for group in group_names:
+            row[group] = {key: values[i] for key, values in table['groups'][group].items()}
+        rows.append(row)
+    return rows
+
+
+class ColumnarLayoutTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        rng = random.Random(47)
+        for offset in range(4):
+            create_month(rng, month_start(2023, 11, offset))
+        with self.captureOnCommitCallbacks(execute=True):
+            save_ratio_results(list(FinancialPeriod.objects.all()))
+        self.client = api_client()
+
+    def test_to_columns_fills_missing_fields(self):
+        rows = [
+            {'id': 1, 'a': 1.5, 'flags': {'x': 'green'}},
+            {'id': 2, 'b': 'two', 'flags': None},
+            {'id': 3, 'a': None, 'b': 'three', 'flags': {'y': 'red'}},
+        ]
+        table = to_columns(rows, ('id',), groups=('flags',))
+        self.assertEqual(table['length'], 3)
+        self.assertEqual(table['index'], {'id': [1, 2, 3]})
+        self.assertEqual(list(table['columns']), ['a', 'b'])
+        self.assertEqual(table['columns'], {'a': [1.5, None, None], 'b': [None, 'two', 'three']})
+        self.assertEqual(table['groups'], {'flags': {'x': ['green', None, None], 'y': [None, None, 'red']}})
+        self.assertEqual(to_columns([], ('id',)), {'layout': 'columnar', 'length': 0, 'index': {'id': []}, 'columns': {}})
+
+    def test_ratio_results_columns_match_rows(self):
+        rows = self.client.get('/api/ratio-results/').json()
+        table = self.client.get('/api/ratio-results/', {'layout': 'columnar'}).json()
+        self.assertEqual(table['layout'], 'columnar')
+        self.assertEqual(len(rows), 4)
+        for row, rebuilt in zip(rows, rows_from_columns(table, ('traffic_light_status',))):
+            self.assertEqual(rebuilt.keys(), row.keys())
+            for field, value in row.items():
+                if isinstance(rebuilt[field], float):
+                    self.assertAlmostEqual(rebuilt[field], float(value), places=6, msg=field)
+                else:
+                    self.assertEqual(rebuilt[field], value, field)
+
+    def dashboard(self, **params):
+        # The sync view: the async one reads on pool threads, which SQLite's test database locks out
+        request = APIRequestFactory().get('/api/dashboard/', params)
+        force_authenticate(request, UserRegister.objects.get(username='tester'))
+        response = DashboardView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']['periods']
+
+    def test_dashboard_periods_as_columns(self):
+        rows = self.dashboard(include_ratios='true')
+        table = self.dashboard(include_ratios='true', layout='columnar')
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(table['index']['label'], [period['label'] for period in rows])
+        self.assertEqual(table['columns']['net_margin'], [period['ratios']['net_margin'] for period in rows])
+        self.assertEqual(
+            table['groups']['traffic_light_status']['net_margin'],
+            [period['ratios']['traffic_light_status']['net_margin'] for period in rows],
+        )
+
+    def test_layouts_are_cached_and_tagged_separately(self):
+        rows = self.client.get('/api/ratio-results/')
+        table = self.client.get('/api/ratio-results/', {'layout': 'columnar'})
+        self.assertEqual(table['X-Cache'], 'MISS')
+        self.assertNotEqual(table['ETag'], rows['ETag'])
+
+    def test_unknown_layout_is_rejected(self):
+        response = self.client.get('/api/ratio-results/', {'layout': 'pivot'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('layout must be one of', response.json()['message'])
+
+
+class AsyncRequestPathTests(TestCase):
+
+    def test_every_middleware_is_async_capable(self):
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(getattr(import_string(path), 'async_capable', False), path)
+
+    @override_settings(DEBUG=True)
+    def test_asgi_middleware_chain_needs_no_adapters(self):
+        # Django logs each sync <-> async adaptation on django.request when DEBUG is on
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            handler = ASGIHandler()
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+
+    @override_settings(DEBUG=True)
+    async def test_async_view_runs_on_the_event_loop(self):
+        self.assertTrue(iscoroutinefunction(AsyncRatioResultListView.as_view()))
+        client = await sync_to_async(async_api_client)()
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            response = await client.get('/api/ratio-results/')
+        self.assertEqual(response.status_code, 200)
+
+
+def stream_events(body):
+    """The JSON events of an SSE body, in order."""
+    return [json.loads(line[len(b'data: '):]) for line in body.split(b'\n') if line.startswith(b'data: ')]
+
+
+@override_settings(PROGRESS_POLL_INTERVAL=0.01, PROGRESS_STREAM_TIMEOUT=5)
+class ProgressStreamTests(TestCase):
+    TASK_ID = 'upload-0001'
+
+    def setUp(self):
+        cache.clear()
+        self.user = UserRegister.objects.create_user(username='progress-user', password='x', role='admin')
+
+    def report(self, *stages, user=None):
+        reporter = ProgressReporter(self.TASK_ID, 'upload', user or self.user)
+        for stage in stages:
+            reporter.emit(stage, sheet=stage.title())
+        return reporter
+
+    def test_events_are_kept_in_order(self):
+        self.report('received', 'hashed', 'parsed', 'done')
+        owner, events = events_since(self.TASK_ID)
+        self.assertEqual(owner, self.user.pk)
+        self.assertEqual([event['seq'] for event in events], [1, 2, 3, 4])
+        self.assertEqual([event['stage'] for event in events], ['received', 'hashed', 'parsed', 'done'])
+        self.assertEqual({(event['task'], event['kind']) for event in events}, {(self.TASK_ID, 'upload')})
+        self.assertEqual([event['stage'] for event in events_since(self.TASK_ID, after=2)[1]], ['parsed', 'done'])
+        self.assertEqual(events_since(self.TASK_ID, after=4)[1], [])
+        self.assertEqual(events_since('unknown-task'), (None, []))
+
+    def test_finish_reports_failures_sent_with_status_200(self):
+        reporter = ProgressReporter(self.TASK_ID, 'upload', self.user)
+        reporter.finish(Response({"status": "failed", "message": "No file provided"}))
+        reporter.finish(Response({"status": "success", "message": "ok", "period_id": 7}))
+        events = events_since(self.TASK_ID)[1]
+        self.assertEqual([(event['stage'], event['message']) for event in events], [('failed', 'No file provided'), ('done', 'ok')])
+        self.assertEqual(events[1]['period_id'], 7)
+
+    def test_without_a_task_id_nothing_is_recorded(self):
+        ProgressReporter(None, 'upload', self.user).emit('received')
+        self.assertEqual(cache.get('progress:None:seq'), None)
+
+    async def stream(self, task_id, user=None, **headers):
+        user = user or self.user
+        client = AsyncClient(authorization=f'Bearer {AccessToken.for_user(user)}')
+        response = await client.get(f'/api/progress/{task_id}/', headers=headers)
+        if response.status_code != 200:
+            return response, None
+        return response, b''.join([chunk async for chunk in response.streaming_content])
+
+    async def test_stream_ends_with_the_terminal_event(self):
+        for terminal in ('done', 'failed'):
+            await sync_to_async(cache.clear)()
+            await sync_to_async(self.report)('received', 'parsed', terminal)
+            response, body = await self.stream(self.TASK_ID)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            self.assertEqual(response['Cache-Control'], 'no-cache')
+            self.assertEqual([event['stage'] for event in stream_events(body)], ['received', 'parsed', terminal])
+            self.assertIn(b'id: 3\n', body)
+            self.assertNotIn(b'event: timeout', body)
+
+    async def test_stream_resumes_after_last_event_id(self):
+        await sync_to_async(self.report)('received', 'hashed', 'parsed', 'done')
+        _, body = await self.stream(self.TASK_ID, **{'Last-Event-ID': '2'})
+        self.assertEqual([event['seq'] for event in stream_events(body)], [3, 4])
+
+    async def test_stream_follows_events_emitted_while_connected(self):
+        reporter = await sync_to_async(self.report)('received')
+
+        async def finish_later():
+            await asyncio.sleep(0.1)
+            await sync_to_async(reporter.emit)('done')
+
+        finishing = asyncio.ensure_future(finish_later())
+        _, body = await self.stream(self.TASK_ID)
+        await finishing
+        self.assertEqual([event['stage'] for event in stream_events(body)], ['received', 'done'])
+
+    async def test_other_users_task_ends_without_events(self):
+        other = await sync_to_async(UserRegister.objects.create_user)(username='progress-other', password='x', role='admin')
+        await sync_to_async(self.report)('received', 'done', user=other)
+        response, body = await self.stream(self.TASK_ID)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(stream_events(body), [])
+        self.assertNotIn(b'event: timeout', body)
+
+    async def test_malformed_task_id_is_rejected(self):
+        for task_id in ('short', 'x' * 65, 'bad.task.id'):
+            response, _ = await self.stream(task_id)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()['response_code'], 400)
+
+
+@override_settings(ADMISSION_LIMITS={'download': {'concurrency': 1, 'queue': 0, 'per_user': 1}})
+class AdmissionControlTests(TestCase):
+
+    def setUp(self):
+        # Limiters are built from ADMISSION_LIMITS on first use and kept per process
+        admission._limiters.clear()
+        self.addCleanup(admission._limiters.clear)
+        temporary_media(self)
+        period = FinancialPeriod.objects.create(
+            period_type='MONTHLY', label='Jan_2024', start_date=date(2024, 1, 1), end_date=date(2024, 1, 31),
+            uploaded_file=SimpleUploadedFile('statement.xlsx', b'x' * 200000),
+        )
+        self.url = f'/api/ratio/download-original/{period.id}/'
+
+    def active(self):
+        return admission.limiter('download').stats()['active']
+
+    def test_limiter_rejects_by_user_queue_and_timeout(self):
+        limiter = admission.RouteLimiter('test', concurrency=1, queue=1, per_user=1)
+        slot = limiter.acquire('a', 1)
+        with self.assertRaises(admission.Rejected) as rejected:
+            limiter.acquire('a', 1)
+        self.assertEqual(rejected.exception.reason, 'user')
+        with self.assertRaises(admission.Rejected) as rejected:
+            limiter.acquire('b', 0.01)
+        self.assertEqual(rejected.exception.reason, 'timeout')
+
+        admitted = []
+        waiter = threading.Thread(target=lambda: admitted.append(limiter.acquire('c', 5)))
+        waiter.start()
+        while limiter.stats()['waiting'] < 1:
+            time.sleep(0.001)
+        with self.assertRaises(admission.Rejected) as rejected:
+            limiter.acquire('d', 1)
+        self.assertEqual(rejected.exception.reason, 'busy')
+        self.assertGreaterEqual(rejected.exception.retry_after, 1)
+
+        slot.release()
+        slot.release()  # idempotent
+        waiter.join(5)
+        self.assertEqual(len(admitted), 1)
+        stats = limiter.stats()
+        self.assertEqual((stats['active'], stats['waiting'], stats['users']), (1, 0, 1))
+        self.assertEqual(stats['rejected'], {'busy': 1, 'timeout': 1, 'user': 1})
+
+    def test_streamed_download_holds_its_slot_until_sent(self):
+        client, other = api_client(), api_client('other')
+        response = client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.active(), 1)
+
+        again = client.get(self.url)
+        self.assertEqual(again.status_code, 429)
+        self.assertTrue(again.has_header('Retry-After'))
+        busy = other.get(self.url)
+        self.assertEqual(busy.status_code, 503)
+        self.assertEqual(busy.json()['response_code'], 503)
+
+        self.assertEqual(len(b''.join(response.streaming_content)), 200000)
+        self.assertEqual(self.active(), 0)
+        self.assertEqual(other.get(self.url).status_code, 200)
+
+    def test_unsent_download_releases_on_close(self):
+        response = api_client().get(self.url)
+        self.assertEqual(self.active(), 1)
+        response.close()
+        self.assertEqual(self.active(), 0)
+
+    def test_failed_view_releases(self):
+        response = api_client().get('/api/ratio/download-original/999999/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.active(), 0)
+
+    async def test_async_stream_releases_when_sent(self):
+        client = await sync_to_async(async_api_client)()
+        response = await client.get(self.url)
+        self.assertTrue(response.is_async)
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)
+        self.assertEqual(self.active(), 1)
+        async for _ in chunks:
+            pass
+        self.assertEqual(self.active(), 0)
+
+
+class SensitivityTests(TestCase):
+
+    def setUp(self):
+        self.period = create_month(random.Random(33), date(2024, 4, 1))
+        self.client = api_client()
+        self.url = f'/api/periods/{self.period.id}/sensitivity/'
+
+    def test_merge_matches_single_pass_moments(self):
+        rng = np.random.default_rng(33)
+        parts = [rng.normal(rng.uniform(-5, 5), rng.uniform(0.1, 3), size) for size in (1, 7, 500, 64, 2)]
+        total, done = {}, 0
+        for values in parts:
+            mean = float(values.mean())
+            chunk = {'r': {'counts': [len(values), 0, 0], 'mean': mean, 'm2': float(np.square(values - mean).sum())}}
+            sensitivity._merge(total, done, chunk, len(values))
+            done += len(values)
+        everything = np.concatenate(parts)
+        self.assertEqual(total['r']['counts'], [len(everything), 0, 0])
+        self.assertAlmostEqual(total['r']['mean'], float(everything.mean()), places=10)
+        self.assertAlmostEqual(total['r']['m2'] / done, float(everything.var()), places=10)
+
+    def test_parse_noise(self):
+        self.assertEqual(sensitivity.parse_noise(None), sensitivity.DEFAULT_NOISE)
+        self.assertEqual(sensitivity.parse_noise({'deposits': '2.5'}), {'deposits': 2.5})
+        for noise in ([], {}, {'bogus': 5}, {'staff_count': 5}, {'deposits': 'x'},
+                      {'deposits': None}, {'deposits': 0}, {'deposits': 101}):
+            with self.assertRaises(sensitivity.SensitivityError, msg=noise):
+                sensitivity.parse_noise(noise)
+
+    @override_settings(SENSITIVITY_MAX_DRAWS=1000)
+    def test_invalid_requests(self):
+        cases = [
+            ({'draws': 0}, 'draws must be an integer between 1 and 1000'),
+            ({'draws': 1001}, 'draws must be an integer between 1 and 1000'),
+            ({'draws': True}, 'draws must be an integer between 1 and 1000'),
+            ({'draws': '100'}, 'draws must be an integer between 1 and 1000'),
+            ({'seed': -1}, 'seed must be a non-negative integer'),
+            ({'workers': 0}, 'workers must be a positive integer'),
+            ({'ratios': ['bogus']}, 'Unknown ratios: bogus'),
+            ({'ratios': 'net_margin'}, 'ratios must be a list of ratio names'),
+            ({'noise': {'bogus': 5}}, "Unknown field 'bogus'"),
+            ({'averaging': 'median'}, 'averaging must be one of: closing, average'),
+        ]
+        for body, message in cases:
+            response = self.client.post(self.url, dict({'draws': 100}, **body), format='json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertEqual(response.json()['message'], message)
+
+    def test_seeded_run_is_reproducible(self):
+        body = {'draws': 2000, 'seed': 7, 'ratios': ['net_margin', 'cost_of_deposits']}
+        first = self.client.post(self.url, body, format='json').json()['data']
+        second = self.client.post(self.url, body, format='json').json()['data']
+        self.assertEqual((first['draws'], first['truncated']), (2000, False))
+        self.assertEqual(first['ratios'], second['ratios'])
+        for result in first['ratios'].values():
+            self.assertAlmostEqual(result['green'] + result['yellow'] + result['red'], 1.0, places=3)
+
+    @override_settings(SENSITIVITY_MAX_WORKERS=2, SENSITIVITY_POOL_MIN_DRAWS=1, SENSITIVITY_TIME_BUDGET=0)
+    def test_pool_reuses_workers_and_keeps_the_first_chunk(self):
+        self.addCleanup(lambda: sensitivity._pool and sensitivity._discard_pool(sensitivity._pool))
+        for _ in range(2):
+            result = sensitivity.run_sensitivity(self.period, draws=5 * sensitivity.CHUNK_SIZE, ratios=['net_margin'])
+            # Out of time before the pool has started: still the first chunk, not an empty result
+            self.assertEqual(result['workers'], 2)
+            self.assertGreaterEqual(result['draws'], sensitivity.CHUNK_SIZE)
+            self.assertTrue(result['truncated'])
+            self.assertIn('net_margin', result['ratios'])
+            pool = sensitivity._pool
+            self.assertIs(sensitivity._executor(), pool)
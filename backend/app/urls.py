@@ -1,4 +1,5 @@
 
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
@@ -28,11 +29,18 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path('token/refresh/', RefreshTokenView.as_view(), name='token_refresh'),
     path('periods/<int:period_id>/calculate-ratios/', CalculateRatiosView.as_view(), name='calculate-ratios'),
+    path('periods/<int:period_id>/scenarios/', ScenarioView.as_view(), name='period-scenarios'),
+    path('periods/<int:period_id>/goal-seek/', GoalSeekView.as_view(), name='period-goal-seek'),
+    path('periods/<int:period_id>/sensitivity/', SensitivityView.as_view(), name='period-sensitivity'),
     path('upload-excel/', UploadExcelView.as_view(), name='upload-excel'),
     path('ratio-benchmarks/', RatioBenchmarksView.as_view(), name='ratio-benchmarks'),
     path('period-comparison/', PeriodComparisonView.as_view(), name='period-comparison'),
     path('period-comparison-by-id/', PeriodComparisonByIdView.as_view(), name='period-comparison-by-id'),
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('ratio-series/', RatioSeriesView.as_view(), name='ratio-series'),
+    path('ttm-ratios/', TTMRatiosView.as_view(), name='ttm-ratios'),
+    path('period-rollup/', PeriodRollupView.as_view(), name='period-rollup'),
+    path('recalculate-ratios/', RecalculateRatiosView.as_view(), name='recalculate-ratios'),
     path('download-excel-template/', DownloadExcelTemplateView.as_view(), name='download-excel-template'),
     path('download-word-template/', DownloadWordTemplateView.as_view(), name='download-word-template'),
     path('sendotp/', SendOtpView.as_view(),name='sendotp'),
@@ -40,5 +48,20 @@ urlpatterns = [
     path('resetpassword/', ResetPasswordView.as_view(), name='resetpassword'),
     path('activate/', ActivateLicenseView.as_view(), name='activate-license'),
     path('ratio/export-current/<int:period_id>/', ExportCurrentDataView.as_view(), name='export-current'),
+    path('export/all/', ExportAllDataView.as_view(), name='export-all'),
+    path('export/workbook/', ExportPeriodsWorkbookView.as_view(), name='export-workbook'),
+    path('reports/', PeriodReportsView.as_view(), name='period-reports'),
     path('ratio/download-original/<int:period_id>/', DownloadOriginalFileView.as_view(), name='download-original'),
-]
\ No newline at end of file
+    path('cache-stats/', ResponseCacheStatsView.as_view(), name='cache-stats'),
+    path('admission-stats/', AdmissionStatsView.as_view(), name='admission-stats'),
+    path('progress/<str:task_id>/', ProgressStreamView.as_view(), name='progress-stream'),
+]
+
+if settings.ASYNC_READ_VIEWS:
+    # Coroutine versions of the read-heavy analytics endpoints, matched before the sync routes
+    urlpatterns = [
+        path('ratio-results/', AsyncRatioResultListView.as_view(), name='ratio-result-list'),
+        path('period-comparison/', AsyncPeriodComparisonView.as_view(), name='period-comparison'),
+        path('period-comparison-by-id/', AsyncPeriodComparisonByIdView.as_view(), name='period-comparison-by-id'),
+        path('dashboard/', AsyncDashboardView.as_view(), name='dashboard'),
+    ] + urlpatterns
@@ -1,20 +1,23 @@
 import os
 import random
 import logging
+from contextlib import ExitStack
 from datetime import datetime
 from decimal import Decimal
 
 from django.conf import settings
 from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
 from django.core.mail import send_mail
-from django.db import transaction
-from django.http import FileResponse, HttpResponse
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.utils import timezone
 
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, status
-from rest_framework.generics import RetrieveUpdateDestroyAPIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.generics import GenericAPIView, RetrieveUpdateDestroyAPIView
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
@@ -23,10 +26,16 @@ from docx import Document
 from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import pdfplumber
-from io import BytesIO
 
 from .models import *
+from .renderers import EventStreamRenderer, ORJSONRenderer
 from .serializers import *
+from .services.admission import admission_control
+from .services.conditional_get import (
+    PERIOD_STAMP_FIELDS, RATIO_STAMP_FIELDS, conditional_get, queryset_version,
+)
+from .services.columnar import columnar_layout, comparison_to_columns, ratio_rows_to_columns, to_columns
+from .services.response_cache import cached_response
 
 logger = logging.getLogger(__name__)
 
@@ -95,7 +104,40 @@ class RefreshTokenView(APIView):
             return Response({"status":"failed","response_code":status.HTTP_500_INTERNAL_SERVER_ERROR,"message":message})
 
 
-class ProfileView(viewsets.ModelViewSet):
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified on list and detail routes from the updated_at stamps of
+    the queryset (stamp_fields, following the relations the serializer nests);
+    unchanged responses return 304 without serializing.
+    """
+    stamp_fields = ('updated_at',)
+    # Serialized output also depends on the ratio benchmarks (traffic lights, interpretation)
+    stamp_benchmarks = False
+
+    def response_version(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in kwargs:
+            try:
+                queryset = queryset.filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+            except (TypeError, ValueError, ValidationError):
+                queryset = queryset.none()  # retrieve() answers 404
+        parts, last_modified = queryset_version(queryset, self.stamp_fields)
+        if self.stamp_benchmarks:
+            from app.services.benchmark_config import get_benchmarks_version
+            parts.append(get_benchmarks_version())
+        return parts, last_modified
+
+    @conditional_get()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get()
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+class ProfileView(ConditionalGetMixin, viewsets.ModelViewSet):
     # permission_classes = [IsAuthenticated]
     queryset = UserRegister.objects.all()
     serializer_class = ProfileSerializer
@@ -107,9 +149,11 @@ class ProfileView(viewsets.ModelViewSet):
 
 
 
-class FinancialPeriodViewSet(viewsets.ModelViewSet):
+class FinancialPeriodViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = FinancialPeriod.objects.all().order_by("-created_at")
     permission_classes = [IsAuthenticated]
+    stamp_fields = PERIOD_STAMP_FIELDS
+    stamp_benchmarks = True
     
     def get_queryset(self):
         queryset = FinancialPeriod.objects.all()
@@ -120,7 +164,7 @@ class FinancialPeriodViewSet(viewsets.ModelViewSet):
         return FinancialPeriodSerializer
 
 
-class TradingAccountViewSet(viewsets.ModelViewSet):
+class TradingAccountViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = TradingAccount.objects.all()
     serializer_class = TradingAccountSerializer
     permission_classes = [IsAuthenticated]
@@ -133,7 +177,7 @@ class TradingAccountViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class ProfitAndLossViewSet(viewsets.ModelViewSet):
+class ProfitAndLossViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = ProfitAndLoss.objects.all()
     serializer_class = ProfitAndLossSerializer
     permission_classes = [IsAuthenticated]
@@ -146,7 +190,7 @@ class ProfitAndLossViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class BalanceSheetViewSet(viewsets.ModelViewSet):
+class BalanceSheetViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = BalanceSheet.objects.all()
     serializer_class = BalanceSheetSerializer
     permission_classes = [IsAuthenticated]
@@ -159,7 +203,7 @@ class BalanceSheetViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class OperationalMetricsViewSet(viewsets.ModelViewSet):
+class OperationalMetricsViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = OperationalMetrics.objects.all()
     serializer_class = OperationalMetricsSerializer
     permission_classes = [IsAuthenticated]
@@ -172,10 +216,12 @@ class OperationalMetricsViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class RatioResultViewSet(viewsets.ReadOnlyModelViewSet):
+class RatioResultViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = RatioResult.objects.all()
     serializer_class = RatioResultSerializer
     permission_classes = [IsAuthenticated]
+    stamp_fields = RATIO_STAMP_FIELDS
+    stamp_benchmarks = True
     
     def get_queryset(self):
         queryset = RatioResult.objects.all()
@@ -191,8 +237,20 @@ class RatioResultViewSet(viewsets.ReadOnlyModelViewSet):
                 queryset = queryset.none()
         return queryset
 
+    def columnar_data(self, data):
+        return ratio_rows_to_columns(data)
 
-class StatementColumnConfigViewSet(viewsets.ModelViewSet):
+    @cached_response('ratio-results')
+    @columnar_layout()
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_response('ratio-result')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+
+class StatementColumnConfigViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     Manage display names / order for financial statement columns.
     """
@@ -212,12 +270,23 @@ class StatementColumnConfigViewSet(viewsets.ModelViewSet):
 class CalculateRatiosView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @admission_control('recalc')
     def post(self, request, period_id=None):
         """
         Calculate ratios for a given period
         POST /api/periods/<period_id>/calculate-ratios/
+        Optional body: averaging = "closing" | "average" (default: settings.RATIO_AVERAGING_MODE)
+        Optional: X-Progress-Id header (or progress_id field) to follow the
+        stages on /api/progress/<id>/
         """
+        from app.services.progress import ProgressReporter
+        progress = ProgressReporter.for_request(request, 'recalculation')
+        return progress.finish(self._calculate(request, period_id, progress))
+    
+    def _calculate(self, request, period_id, progress):
         try:
+            from app.services.ratio_calculator import AVERAGING_MODES
+            
             if period_id is None:
                 period_id = request.data.get('period_id')
             
@@ -228,7 +297,16 @@ class CalculateRatiosView(APIView):
                     "message": "period_id is required"
                 })
             
+            averaging = request.data.get('averaging')
+            if averaging and averaging not in AVERAGING_MODES:
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": f"averaging must be one of: {', '.join(AVERAGING_MODES)}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
             period = FinancialPeriod.objects.get(id=period_id)
+            progress.emit('received', period_id=period.id, period_label=period.label)
             
             # Validate all required data exists
             if not hasattr(period, 'trading_account'):
@@ -260,9 +338,10 @@ class CalculateRatiosView(APIView):
             from app.services.ratio_calculator import RatioCalculator
             from decimal import Decimal
             
-            calculator = RatioCalculator(period)
+            calculator = RatioCalculator(period, averaging=averaging)
             all_ratios = calculator.calculate_all_ratios()
             traffic_light_statuses = calculator.get_traffic_light_statuses()
+            progress.emit('ratios_calculated', period_id=period.id)
             
             # Create or update RatioResult
             ratio_result, created = RatioResult.objects.get_or_create(
@@ -338,6 +417,10 @@ class CalculateRatiosView(APIView):
 
                 ratio_result.traffic_light_status = traffic_light_statuses
                 ratio_result.save()
+            progress.emit('persisted', period_id=period.id)
+            
+            from app.services.period_hooks import after_period_data_changed
+            after_period_data_changed(period)
             
             serializer = RatioResultSerializer(ratio_result)
             return Response({
@@ -364,11 +447,19 @@ class CalculateRatiosView(APIView):
 class UploadExcelView(APIView):
     permission_classes = [IsAuthenticated]
     
+    @admission_control('upload')
     def post(self, request):
         """
         Upload Excel file and parse all 4 sheets
         POST /api/upload-excel/
+        Optional: X-Progress-Id header (or progress_id field) to follow the
+        stages on /api/progress/<id>/
         """
+        from app.services.progress import ProgressReporter
+        progress = ProgressReporter.for_request(request, 'upload')
+        return progress.finish(self._upload(request, progress))
+    
+    def _upload(self, request, progress):
         logger.info("=== UploadExcelView POST request received ===")
         try:
             if 'file' not in request.FILES:
@@ -383,6 +474,7 @@ class UploadExcelView(APIView):
             
             uploaded_file = request.FILES['file']
             logger.info(f"DEBUG: File received - {uploaded_file.name}")
+            progress.emit('received', filename=uploaded_file.name, size=uploaded_file.size)
             filename = uploaded_file.name
             period_info = self._extract_period_from_filename(filename)
 
@@ -394,6 +486,12 @@ class UploadExcelView(APIView):
                     "message": "Unsupported file type. Use .xlsx, .xls, .docx, or .pdf"
                 })
 
+            # Hashed once here: the FinancialPeriod pre_save receiver and the storage reuse it
+            from app.services.file_delivery import file_sha256
+            uploaded_file.content_sha256 = file_sha256(uploaded_file)
+            uploaded_file.seek(0)
+            progress.emit('hashed', sha256=uploaded_file.content_sha256)
+
             # Handle .docx or .pdf: store file and create period with default empty data
             if ext == 'docx':
                 period = self._create_period_from_document(
@@ -404,7 +502,8 @@ class UploadExcelView(APIView):
                     "response_code": status.HTTP_200_OK,
                     "message": "Document (.docx) uploaded successfully",
                     "period_id": period.id,
-                    "period_label": period.label
+                    "period_label": period.label,
+                    "anomalies": self._score_upload(period)
                 })
             if ext == 'pdf':
                 period = self._create_period_from_document(
@@ -415,7 +514,8 @@ class UploadExcelView(APIView):
                     "response_code": status.HTTP_200_OK,
                     "message": "Document (.pdf) uploaded successfully",
                     "period_id": period.id,
-                    "period_label": period.label
+                    "period_label": period.label,
+                    "anomalies": self._score_upload(period)
                 })
 
             # Excel path
@@ -424,6 +524,7 @@ class UploadExcelView(APIView):
             logger.info("DEBUG: Loading workbook...")
             workbook = load_workbook(excel_file, data_only=True)
             logger.info(f"DEBUG: Workbook loaded, sheets: {workbook.sheetnames}")
+            progress.emit('loaded', sheets=workbook.sheetnames)
             
             # Find required sheets – support both formats
             sheet_mapping = self._find_sheets(workbook)
@@ -441,11 +542,16 @@ class UploadExcelView(APIView):
             if format_a:
                 logger.info("DEBUG: Parsing Format A sheets...")
                 financial_statement_data = self._parse_financial_statement_sheet(workbook[sheet_mapping['Financial_Statement']])
+                progress.emit('parsed', sheet=sheet_mapping['Financial_Statement'])
                 liabilities_data = self._parse_balance_sheet_liabilities(workbook[sheet_mapping['Balance_Sheet_Liabilities']])
+                progress.emit('parsed', sheet=sheet_mapping['Balance_Sheet_Liabilities'])
                 assets_data = self._parse_balance_sheet_assets(workbook[sheet_mapping['Balance_Sheet_Assets']])
+                progress.emit('parsed', sheet=sheet_mapping['Balance_Sheet_Assets'])
                 balance_sheet_data = self._default_balance_sheet({**liabilities_data, **assets_data})
                 profit_loss_data = self._default_profit_loss(self._parse_profit_loss_rows(workbook[sheet_mapping['Profit_Loss']]))
+                progress.emit('parsed', sheet=sheet_mapping['Profit_Loss'])
                 trading_account_data = self._default_trading_account(self._parse_trading_account_rows(workbook[sheet_mapping['Trading_Account']]))
+                progress.emit('parsed', sheet=sheet_mapping['Trading_Account'])
                 staff_count = financial_statement_data.get('staff_count')
                 if staff_count is not None:
                     operational_metrics_data = {'staff_count': int(float(staff_count))}
@@ -458,9 +564,13 @@ class UploadExcelView(APIView):
             elif format_b:
                 logger.info("DEBUG: Parsing Format B sheets...")
                 balance_sheet_data = self._default_balance_sheet(self._parse_balance_sheet(workbook[sheet_mapping['Balance Sheet']]))
+                progress.emit('parsed', sheet=sheet_mapping['Balance Sheet'])
                 profit_loss_data = self._default_profit_loss(self._parse_profit_loss(workbook[sheet_mapping['Profit and Loss']]))
+                progress.emit('parsed', sheet=sheet_mapping['Profit and Loss'])
                 trading_account_data = self._default_trading_account(self._parse_trading_account(workbook[sheet_mapping['Trading Account']]))
+                progress.emit('parsed', sheet=sheet_mapping['Trading Account'])
                 operational_metrics_data = self._parse_operational_metrics(workbook[sheet_mapping['Operational Metrics']])
+                progress.emit('parsed', sheet=sheet_mapping['Operational Metrics'])
                 logger.info("DEBUG: Format B sheets parsed successfully")
             elif len(available) == 1 and available[0] == 'Sheet':
                 # Format C: Single generic "Sheet" - try to auto-detect and parse as balance sheet
@@ -475,6 +585,7 @@ class UploadExcelView(APIView):
                 if has_liabilities and has_assets:
                     logger.info("DEBUG: Detected balance sheet format - parsing as Format B (single sheet)")
                     balance_sheet_data = self._parse_balance_sheet(single_sheet)
+                    progress.emit('parsed', sheet=single_sheet.title)
                     # Set default/empty data for other required sheets
                     profit_loss_data = self._default_profit_loss({})
                     trading_account_data = self._default_trading_account({})
@@ -522,6 +633,7 @@ class UploadExcelView(APIView):
                 if not created:
                     period.uploaded_file = excel_file
                     period.file_type = 'excel'
+                    period.is_derived = False
                     period.save()
                     logger.info(f"DEBUG: Updated uploaded_file for period {period.id}")
                 
@@ -569,6 +681,8 @@ class UploadExcelView(APIView):
                     defaults=operational_metrics_data
                 )
                 
+                progress.emit('persisted', period_id=period.id, period_label=period.label)
+                
                 logger.info(f"DEBUG: Calculating ratios")
                 # Automatically calculate ratios
                 from app.services.ratio_calculator import RatioCalculator
@@ -617,6 +731,11 @@ class UploadExcelView(APIView):
                 )
                 
                 logger.info(f"DEBUG: All data saved successfully for period {period.id}")
+                progress.emit('ratios_calculated', period_id=period.id)
+            
+            # Keep roll-up parents and the TTM series in step with monthly uploads
+            from app.services.period_hooks import after_period_data_changed
+            after_period_data_changed(period)
             
             logger.info(f"DEBUG: Returning success response")
             return Response({
@@ -624,7 +743,8 @@ class UploadExcelView(APIView):
                 "response_code": status.HTTP_200_OK,
                 "message": "Excel file processed successfully",
                 "period_id": period.id,
-                "period_label": period.label
+                "period_label": period.label,
+                "anomalies": self._score_upload(period)
             })
             
             
@@ -2005,6 +2125,16 @@ class UploadExcelView(APIView):
             # Return defaults instead of empty dicts to avoid null constraint violations
             return self._default_balance_sheet({}), self._default_profit_loss({}), self._default_trading_account({}), {'staff_count': 1}
 
+    def _score_upload(self, period):
+        """Fields / ratios far outside this period type's history (z-score); never fails the upload."""
+        from app.services.ratio_statistics import STATEMENT_RELATIONS, score_period
+        try:
+            period = FinancialPeriod.objects.select_related(*STATEMENT_RELATIONS).get(pk=period.pk)
+            return score_period(period)
+        except Exception as e:
+            logger.error(f"Anomaly scoring failed for period {period.id}: {e}")
+            return []
+
     def _create_period_from_document(self, request, uploaded_file, period_info, file_type):
         """Create a financial period for .docx or .pdf upload; store file and create/update records."""
         period_label = request.data.get('period_label') or period_info.get('label') or f"FY-{datetime.now().year}-{datetime.now().year + 1}"
@@ -2039,6 +2169,7 @@ class UploadExcelView(APIView):
                 uploaded_file.seek(0)
                 period.uploaded_file = uploaded_file
                 period.file_type = 'docx'
+                period.is_derived = False
                 period.save()
                 
                 # Ensure staff_count is always set before saving (safety check)
@@ -2100,6 +2231,7 @@ class UploadExcelView(APIView):
                 uploaded_file.seek(0)
                 period.uploaded_file = uploaded_file
                 period.file_type = 'pdf'
+                period.is_derived = False
                 period.save()
                 
                 # Ensure staff_count is always set before saving (safety check)
@@ -2145,6 +2277,9 @@ class UploadExcelView(APIView):
                         'traffic_light_status': traffic_light_statuses
                     }
                 )
+
+        from app.services.period_hooks import after_period_data_changed
+        after_period_data_changed(period)
         return period
 
     def _extract_period_from_filename(self, filename):
@@ -2268,58 +2403,13 @@ class DownloadExcelTemplateView(APIView):
     
     def get(self, request):
         """Download Excel template with 4 sheets"""
+        from app.services.export_cache import cached_file_response
+        from app.services.workbook_export import XLSX_CONTENT_TYPE
         try:
-            wb = Workbook()
-            
-            # Remove default sheet
-            wb.remove(wb.active)
-            
-            # Sheet 1: Balance Sheet
-            ws_bs = wb.create_sheet("Balance Sheet")
-            ws_bs.append(["Liabilities", "Amount", "Assets", "Amount"])
-            ws_bs.append(["Share Capital", 5281006, "Cash in Hand", 484706199])
-            ws_bs.append(["Deposits", 484706199, "Cash at Bank", 90000000])
-            ws_bs.append(["Borrowings", 7001911, "Investments", 13328928])
-            ws_bs.append(["Reserves (Statutory & Free)", 10569840, "Loans & Advances", 437223261])
-            ws_bs.append(["Provisions", 53117811, "Fixed Assets", 55501843])
-            ws_bs.append(["Other Liabilities", 46444029, "Other Assets", 5678014])
-            ws_bs.append(["Undistributed Profit", 10866453, "Stock in Trade", 40000])
-            
-            # Sheet 2: Profit & Loss
-            ws_pl = wb.create_sheet("Profit & Loss")
-            ws_pl.append(["Expenses", "Amount", "Income", "Amount"])
-            ws_pl.append(["Interest on Deposits", 26698057, "Interest on Loans", 42488657])
-            ws_pl.append(["Interest on Borrowings", 770021, "Interest on Bank A/c", 6300000])
-            ws_pl.append(["Establishment & Contingencies", 13476132, "Return on Investment", 1066314])
-            ws_pl.append(["Provisions Made", 4533930, "Miscellaneous Income", 3485633])
-            ws_pl.append(["Net Profit", 7863516, "", ""])
-            
-            # Sheet 3: Trading Account
-            ws_ta = wb.create_sheet("Trading Account")
-            ws_ta.append(["Item", "Amount"])
-            ws_ta.append(["Opening Stock", 25080])
-            ws_ta.append(["Purchases", 572444])
-            ws_ta.append(["Trade Charges", 8176])
-            ws_ta.append(["Sales", 552264])
-            ws_ta.append(["Closing Stock", 40000])
-            
-            # Sheet 4: Operational Metrics
-            ws_om = wb.create_sheet("Operational Metrics")
-            ws_om.append(["Metric", "Value"])
-            ws_om.append(["Staff Count", 24])
-            
-            # Save to BytesIO
-            output = BytesIO()
-            wb.save(output)
-            output.seek(0)
-            
-            response = HttpResponse(
-                output.getvalue(),
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            return cached_file_response(
+                request, 'template-xlsx', [], "Financial_Data_Template.xlsx", XLSX_CONTENT_TYPE,
+                build=self._build_workbook,
             )
-            response['Content-Disposition'] = 'attachment; filename="Financial_Data_Template.xlsx"'
-            return response
-            
         except Exception as e:
             logger.error(f"Error generating Excel template: {e}")
             return Response({
@@ -2327,115 +2417,57 @@ class DownloadExcelTemplateView(APIView):
                 "message": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _build_workbook(self):
+        wb = Workbook(write_only=True)
+        
+        # Sheet 1: Balance Sheet
+        ws_bs = wb.create_sheet("Balance Sheet")
+        ws_bs.append(["Liabilities", "Amount", "Assets", "Amount"])
+        ws_bs.append(["Share Capital", 5281006, "Cash in Hand", 484706199])
+        ws_bs.append(["Deposits", 484706199, "Cash at Bank", 90000000])
+        ws_bs.append(["Borrowings", 7001911, "Investments", 13328928])
+        ws_bs.append(["Reserves (Statutory & Free)", 10569840, "Loans & Advances", 437223261])
+        ws_bs.append(["Provisions", 53117811, "Fixed Assets", 55501843])
+        ws_bs.append(["Other Liabilities", 46444029, "Other Assets", 5678014])
+        ws_bs.append(["Undistributed Profit", 10866453, "Stock in Trade", 40000])
+        
+        # Sheet 2: Profit & Loss
+        ws_pl = wb.create_sheet("Profit & Loss")
+        ws_pl.append(["Expenses", "Amount", "Income", "Amount"])
+        ws_pl.append(["Interest on Deposits", 26698057, "Interest on Loans", 42488657])
+        ws_pl.append(["Interest on Borrowings", 770021, "Interest on Bank A/c", 6300000])
+        ws_pl.append(["Establishment & Contingencies", 13476132, "Return on Investment", 1066314])
+        ws_pl.append(["Provisions Made", 4533930, "Miscellaneous Income", 3485633])
+        ws_pl.append(["Net Profit", 7863516, "", ""])
+        
+        # Sheet 3: Trading Account
+        ws_ta = wb.create_sheet("Trading Account")
+        ws_ta.append(["Item", "Amount"])
+        ws_ta.append(["Opening Stock", 25080])
+        ws_ta.append(["Purchases", 572444])
+        ws_ta.append(["Trade Charges", 8176])
+        ws_ta.append(["Sales", 552264])
+        ws_ta.append(["Closing Stock", 40000])
+        
+        # Sheet 4: Operational Metrics
+        ws_om = wb.create_sheet("Operational Metrics")
+        ws_om.append(["Metric", "Value"])
+        ws_om.append(["Staff Count", 24])
+        return wb
+
 
 class DownloadWordTemplateView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
         """Download Word template with 4 tables"""
+        from app.services.export_cache import cached_file_response
+        from app.services.workbook_export import DOCX_CONTENT_TYPE
         try:
-            doc = Document()
-            
-            # Title
-            title = doc.add_heading('Financial Data Template', 0)
-            title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            
-            # 1. Balance Sheet
-            doc.add_heading('1. Balance Sheet', level=1)
-            table_bs = doc.add_table(rows=8, cols=4)
-            table_bs.style = 'Light Grid Accent 1'
-            
-            # Header
-            table_bs.cell(0, 0).text = 'Liabilities'
-            table_bs.cell(0, 1).text = 'Amount'
-            table_bs.cell(0, 2).text = 'Assets'
-            table_bs.cell(0, 3).text = 'Amount'
-            
-            # Data
-            bs_data = [
-                ['Share Capital', '5281006', 'Cash in Hand', '484706199'],
-                ['Deposits', '484706199', 'Cash at Bank', '90000000'],
-                ['Borrowings', '7001911', 'Investments', '13328928'],
-                ['Reserves (Statutory & Free)', '10569840', 'Loans & Advances', '437223261'],
-                ['Provisions', '53117811', 'Fixed Assets', '55501843'],
-                ['Other Liabilities', '46444029', 'Other Assets', '5678014'],
-                ['Undistributed Profit', '10866453', 'Stock in Trade', '40000'],
-            ]
-            
-            for i, row_data in enumerate(bs_data, start=1):
-                for j, cell_text in enumerate(row_data):
-                    table_bs.cell(i, j).text = cell_text
-            
-            doc.add_paragraph()
-            
-            # 2. Profit and Loss
-            doc.add_heading('2. Profit and Loss', level=1)
-            table_pl = doc.add_table(rows=6, cols=4)
-            table_pl.style = 'Light Grid Accent 1'
-            
-            table_pl.cell(0, 0).text = 'Expenses'
-            table_pl.cell(0, 1).text = 'Amount'
-            table_pl.cell(0, 2).text = 'Income'
-            table_pl.cell(0, 3).text = 'Amount'
-            
-            pl_data = [
-                ['Interest on Deposits', '26698057', 'Interest on Loans', '42488657'],
-                ['Interest on Borrowings', '770021', 'Interest on Bank A/c', '6300000'],
-                ['Establishment & Contingencies', '13476132', 'Return on Investment', '1066314'],
-                ['Provisions Made', '4533930', 'Miscellaneous Income', '3485633'],
-                ['Net Profit', '7863516', '', ''],
-            ]
-            
-            for i, row_data in enumerate(pl_data, start=1):
-                for j, cell_text in enumerate(row_data):
-                    table_pl.cell(i, j).text = cell_text
-            
-            doc.add_paragraph()
-            
-            # 3. Trading Account
-            doc.add_heading('3. Trading Account', level=1)
-            table_ta = doc.add_table(rows=6, cols=2)
-            table_ta.style = 'Light Grid Accent 1'
-            
-            table_ta.cell(0, 0).text = 'Item'
-            table_ta.cell(0, 1).text = 'Amount'
-            
-            ta_data = [
-                ['Opening Stock', '25080'],
-                ['Purchases', '572444'],
-                ['Trade Charges', '8176'],
-                ['Sales', '552264'],
-                ['Closing Stock', '40000'],
-            ]
-            
-            for i, row_data in enumerate(ta_data, start=1):
-                table_ta.cell(i, 0).text = row_data[0]
-                table_ta.cell(i, 1).text = row_data[1]
-            
-            doc.add_paragraph()
-            
-            # 4. Operational Metrics
-            doc.add_heading('4. Operational Metrics', level=1)
-            table_om = doc.add_table(rows=2, cols=2)
-            table_om.style = 'Light Grid Accent 1'
-            
-            table_om.cell(0, 0).text = 'Metric'
-            table_om.cell(0, 1).text = 'Value'
-            table_om.cell(1, 0).text = 'Staff Count'
-            table_om.cell(1, 1).text = '24'
-            
-            # Save to BytesIO
-            output = BytesIO()
-            doc.save(output)
-            output.seek(0)
-            
-            response = HttpResponse(
-                output.getvalue(),
-                content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+            return cached_file_response(
+                request, 'template-docx', [], "Financial_Data_Template.docx", DOCX_CONTENT_TYPE,
+                build=self._build_document,
             )
-            response['Content-Disposition'] = 'attachment; filename="Financial_Data_Template.docx"'
-            return response
-            
         except Exception as e:
             logger.error(f"Error generating Word template: {e}")
             return Response({
@@ -2443,13 +2475,170 @@ class DownloadWordTemplateView(APIView):
                 "message": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _build_document(self):
+        doc = Document()
+        
+        # Title
+        title = doc.add_heading('Financial Data Template', 0)
+        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        # 1. Balance Sheet
+        doc.add_heading('1. Balance Sheet', level=1)
+        table_bs = doc.add_table(rows=8, cols=4)
+        table_bs.style = 'Light Grid Accent 1'
+        
+        # Header
+        table_bs.cell(0, 0).text = 'Liabilities'
+        table_bs.cell(0, 1).text = 'Amount'
+        table_bs.cell(0, 2).text = 'Assets'
+        table_bs.cell(0, 3).text = 'Amount'
+        
+        # Data
+        bs_data = [
+            ['Share Capital', '5281006', 'Cash in Hand', '484706199'],
+            ['Deposits', '484706199', 'Cash at Bank', '90000000'],
+            ['Borrowings', '7001911', 'Investments', '13328928'],
+            ['Reserves (Statutory & Free)', '10569840', 'Loans & Advances', '437223261'],
+            ['Provisions', '53117811', 'Fixed Assets', '55501843'],
+            ['Other Liabilities', '46444029', 'Other Assets', '5678014'],
+            ['Undistributed Profit', '10866453', 'Stock in Trade', '40000'],
+        ]
+        
+        for i, row_data in enumerate(bs_data, start=1):
+            for j, cell_text in enumerate(row_data):
+                table_bs.cell(i, j).text = cell_text
+        
+        doc.add_paragraph()
+        
+        # 2. Profit and Loss
+        doc.add_heading('2. Profit and Loss', level=1)
+        table_pl = doc.add_table(rows=6, cols=4)
+        table_pl.style = 'Light Grid Accent 1'
+        
+        table_pl.cell(0, 0).text = 'Expenses'
+        table_pl.cell(0, 1).text = 'Amount'
+        table_pl.cell(0, 2).text = 'Income'
+        table_pl.cell(0, 3).text = 'Amount'
+        
+        pl_data = [
+            ['Interest on Deposits', '26698057', 'Interest on Loans', '42488657'],
+            ['Interest on Borrowings', '770021', 'Interest on Bank A/c', '6300000'],
+            ['Establishment & Contingencies', '13476132', 'Return on Investment', '1066314'],
+            ['Provisions Made', '4533930', 'Miscellaneous Income', '3485633'],
+            ['Net Profit', '7863516', '', ''],
+        ]
+        
+        for i, row_data in enumerate(pl_data, start=1):
+            for j, cell_text in enumerate(row_data):
+                table_pl.cell(i, j).text = cell_text
+        
+        doc.add_paragraph()
+        
+        # 3. Trading Account
+        doc.add_heading('3. Trading Account', level=1)
+        table_ta = doc.add_table(rows=6, cols=2)
+        table_ta.style = 'Light Grid Accent 1'
+        
+        table_ta.cell(0, 0).text = 'Item'
+        table_ta.cell(0, 1).text = 'Amount'
+        
+        ta_data = [
+            ['Opening Stock', '25080'],
+            ['Purchases', '572444'],
+            ['Trade Charges', '8176'],
+            ['Sales', '552264'],
+            ['Closing Stock', '40000'],
+        ]
+        
+        for i, row_data in enumerate(ta_data, start=1):
+            table_ta.cell(i, 0).text = row_data[0]
+            table_ta.cell(i, 1).text = row_data[1]
+        
+        doc.add_paragraph()
+        
+        # 4. Operational Metrics
+        doc.add_heading('4. Operational Metrics', level=1)
+        table_om = doc.add_table(rows=2, cols=2)
+        table_om.style = 'Light Grid Accent 1'
+        
+        table_om.cell(0, 0).text = 'Metric'
+        table_om.cell(0, 1).text = 'Value'
+        table_om.cell(1, 0).text = 'Staff Count'
+        table_om.cell(1, 1).text = '24'
+        return doc
+
+
+class ReadReplicaMixin:
+    """
+    Safe (GET/HEAD/OPTIONS) requests read from the replica database, unless the
+    user wrote something moments ago (see app.db_router). Writes always use the primary.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        self.read_scope = ExitStack()
+        with self.read_scope:
+            return super().dispatch(request, *args, **kwargs)
 
-class PeriodComparisonView(APIView):
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            from app.db_router import read_alias_for, use_read_alias
+            self.read_scope.enter_context(use_read_alias(read_alias_for(request.user)))
+
+
+class AsyncReadView(APIView):
+    """
+    APIView with coroutine handlers, so an ASGI server (uvicorn
+    backend.asgi:application) serves many concurrent readers from one process
+    instead of a thread per request. Authentication, permissions and content
+    negotiation run in a worker thread (loading the JWT user may query); safe
+    requests read from the replica like ReadReplicaMixin. Handlers fetch
+    independent querysets concurrently with app.db_router.gather_reads().
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        from app.db_router import read_alias_for, use_read_alias
+
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            method = request.method.lower()
+            if method not in self.http_method_names or not hasattr(self, method):
+                self.http_method_not_allowed(request, *args, **kwargs)  # raises MethodNotAllowed
+            alias = DEFAULT_DB_ALIAS
+            if request.method in SAFE_METHODS:
+                alias = await sync_to_async(read_alias_for)(request.user)
+            with use_read_alias(alias):
+                response = await getattr(self, method)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    def initial(self, request, *args, **kwargs):
+        # Not ReadReplicaMixin.initial: dispatch() enters the read alias in the
+        # event loop's context, where the handler runs
+        APIView.initial(self, request, *args, **kwargs)
+
+    async def options(self, request, *args, **kwargs):
+        return super().options(request, *args, **kwargs)
+
+
+class PeriodComparisonView(ReadReplicaMixin, APIView):
     """
     Compare financial ratios between two periods.
     Query Parameters:
-        - period1: Label of the first period (e.g., "2024", "FY-2023-24")
+        - period1: Label of the first period (e.g., "2024", "FY-2023-24").
+          Optional: defaults to the period of the same type right before period2.
         - period2: Label of the second period (e.g., "2025", "FY-2024-25")
+        - layout: 'rows' (default) or 'columnar': "ratios" as
+          {"index": {"ratio": [...]}, "columns": {"period1": [...], ...}}
     Returns:
         {
             "period1": "2024",
@@ -2510,155 +2699,184 @@ class PeriodComparisonView(APIView):
             "percentage_change": percentage_change
         }
     
+    def _compare_ratios(self, ratios_period1, ratios_period2):
+        """Comparison of every ratio of two RatioResults, keyed by ratio name."""
+        # Key ratios to compare (from RatioResult model)
+        ratio_fields = [
+            # Trading Ratios
+            "stock_turnover",
+            "gross_profit_ratio",
+            "net_profit_ratio",
+            # Fund Structure Ratios
+            "net_own_funds",
+            "own_fund_to_wf",
+            "deposits_to_wf",
+            "borrowings_to_wf",
+            "loans_to_wf",
+            "investments_to_wf",
+            "earning_assets_to_wf",
+            "interest_tagged_funds_to_wf",
+            # Yield & Cost Ratios
+            "cost_of_deposits",
+            "yield_on_loans",
+            "yield_on_investments",
+            "credit_deposit_ratio",
+            "avg_cost_of_wf",
+            "avg_yield_on_wf",
+            "misc_income_to_wf",
+            "interest_exp_to_interest_income",
+            # Margin Ratios
+            "gross_fin_margin",
+            "operating_cost_to_wf",
+            "net_fin_margin",
+            "risk_cost_to_wf",
+            "net_margin",
+            # Capital Efficiency Ratios
+            "capital_turnover_ratio",
+            # Productivity Ratios
+            "per_employee_deposit",
+            "per_employee_loan",
+            "per_employee_contribution",
+            "per_employee_operating_cost",
+            # Working Fund
+            "working_fund",
+        ]
+        
+        # Build comparison data
+        ratios_comparison = {}
+        
+        # Compare each predefined ratio field
+        for field in ratio_fields:
+            value1 = getattr(ratios_period1, field, None)
+            value2 = getattr(ratios_period2, field, None)
+            
+            formatted = self._format_ratio_comparison(field, value1, value2)
+            if formatted is not None:
+                ratios_comparison[field] = formatted
+        
+        # Include additional ratios from all_ratios JSON field if available
+        all_ratios1 = getattr(ratios_period1, 'all_ratios', None)
+        all_ratios2 = getattr(ratios_period2, 'all_ratios', None)
+        if all_ratios1 and isinstance(all_ratios1, dict):
+            if all_ratios2 and isinstance(all_ratios2, dict):
+                for ratio_name in all_ratios1.keys():
+                    if ratio_name not in ratios_comparison:  # Don't override main fields
+                        value1 = all_ratios1.get(ratio_name)
+                        value2 = all_ratios2.get(ratio_name)
+                        
+                        formatted = self._format_ratio_comparison(ratio_name, value1, value2)
+                        if formatted is not None:
+                            ratios_comparison[ratio_name] = formatted
+        return ratios_comparison
+    
+    def _resolve_labels(self, request):
+        """(period1, period2) labels, or an error Response. period1 defaults to the period right before period2."""
+        period1_label = request.query_params.get('period1')
+        period2_label = request.query_params.get('period2')
+        
+        if period2_label and not period1_label:
+            from app.services.period_calendar import get_period_calendar
+            calendar = get_period_calendar()
+            current = calendar.find(period2_label)
+            previous = calendar.predecessor(current.id) if current else None
+            if previous is not None:
+                period1_label = previous.label
+        
+        # Validate required parameters
+        if not all([period1_label, period2_label]):
+            return Response(
+                {
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": "Missing required parameters: period1, period2"
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return period1_label, period2_label
+    
+    def _readers(self, period1_label, period2_label):
+        """Independent reads for a comparison: both periods, then both ratio results."""
+        return [
+            lambda: FinancialPeriod.objects.filter(label=period1_label).first(),
+            lambda: FinancialPeriod.objects.filter(label=period2_label).first(),
+            lambda: RatioResult.objects.filter(period__label=period1_label).first(),
+            lambda: RatioResult.objects.filter(period__label=period2_label).first(),
+        ]
+    
+    def _comparison_response(self, period1_label, period2_label, period1, period2, ratios_period1, ratios_period2):
+        if period1 is None:
+            return Response(
+                {
+                    "status": "failed",
+                    "response_code": status.HTTP_404_NOT_FOUND,
+                    "message": f"Period '{period1_label}' not found"
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if period2 is None:
+            return Response(
+                {
+                    "status": "failed",
+                    "response_code": status.HTTP_404_NOT_FOUND,
+                    "message": f"Period '{period2_label}' not found"
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if ratios_period1 is None:
+            return Response(
+                {
+                    "status": "failed",
+                    "response_code": status.HTTP_404_NOT_FOUND,
+                    "message": f"No ratio data found for period '{period1_label}'"
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if ratios_period2 is None:
+            return Response(
+                {
+                    "status": "failed",
+                    "response_code": status.HTTP_404_NOT_FOUND,
+                    "message": f"No ratio data found for period '{period2_label}'"
+                },
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        ratios_comparison = self._compare_ratios(ratios_period1, ratios_period2)
+        
+        # Return comparison data
+        return Response(
+            {
+                "status": "success",
+                "response_code": status.HTTP_200_OK,
+                "data": {
+                    "period1": period1_label,
+                    "period2": period2_label,
+                    "ratios": ratios_comparison
+                }
+            },
+            status=status.HTTP_200_OK
+        )
+    
+    def columnar_data(self, data):
+        return dict(data, data=dict(data["data"], ratios=comparison_to_columns(data["data"]["ratios"])))
+    
+    @cached_response('period-comparison')
+    @columnar_layout()
     def get(self, request):
         """Fetch and compare ratios between two periods."""
         try:
             # Get query parameters
-            period1_label = request.query_params.get('period1')
-            period2_label = request.query_params.get('period2')
-            
-            # Validate required parameters
-            if not all([period1_label, period2_label]):
-                return Response(
-                    {
-                        "status": "failed",
-                        "response_code": status.HTTP_400_BAD_REQUEST,
-                        "message": "Missing required parameters: period1, period2"
-                    },
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Fetch periods
-            try:
-                period1 = FinancialPeriod.objects.get(
-                    label=period1_label
-                )
-            except FinancialPeriod.DoesNotExist:
-                return Response(
-                    {
-                        "status": "failed",
-                        "response_code": status.HTTP_404_NOT_FOUND,
-                        "message": f"Period '{period1_label}' not found"
-                    },
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            try:
-                period2 = FinancialPeriod.objects.get(
-                    label=period2_label
-                )
-            except FinancialPeriod.DoesNotExist:
-                return Response(
-                    {
-                        "status": "failed",
-                        "response_code": status.HTTP_404_NOT_FOUND,
-                        "message": f"Period '{period2_label}' not found"
-                    },
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            # Fetch ratio results for both periods
-            try:
-                ratios_period1 = RatioResult.objects.get(period=period1)
-            except RatioResult.DoesNotExist:
-                return Response(
-                    {
-                        "status": "failed",
-                        "response_code": status.HTTP_404_NOT_FOUND,
-                        "message": f"No ratio data found for period '{period1_label}'"
-                    },
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            try:
-                ratios_period2 = RatioResult.objects.get(period=period2)
-            except RatioResult.DoesNotExist:
-                return Response(
-                    {
-                        "status": "failed",
-                        "response_code": status.HTTP_404_NOT_FOUND,
-                        "message": f"No ratio data found for period '{period2_label}'"
-                    },
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            # Key ratios to compare (from RatioResult model)
-            ratio_fields = [
-                # Trading Ratios
-                "stock_turnover",
-                "gross_profit_ratio",
-                "net_profit_ratio",
-                # Fund Structure Ratios
-                "net_own_funds",
-                "own_fund_to_wf",
-                "deposits_to_wf",
-                "borrowings_to_wf",
-                "loans_to_wf",
-                "investments_to_wf",
-                "earning_assets_to_wf",
-                "interest_tagged_funds_to_wf",
-                # Yield & Cost Ratios
-                "cost_of_deposits",
-                "yield_on_loans",
-                "yield_on_investments",
-                "credit_deposit_ratio",
-                "avg_cost_of_wf",
-                "avg_yield_on_wf",
-                "misc_income_to_wf",
-                "interest_exp_to_interest_income",
-                # Margin Ratios
-                "gross_fin_margin",
-                "operating_cost_to_wf",
-                "net_fin_margin",
-                "risk_cost_to_wf",
-                "net_margin",
-                # Capital Efficiency Ratios
-                "capital_turnover_ratio",
-                # Productivity Ratios
-                "per_employee_deposit",
-                "per_employee_loan",
-                "per_employee_contribution",
-                "per_employee_operating_cost",
-                # Working Fund
-                "working_fund",
-            ]
-            
-            # Build comparison data
-            ratios_comparison = {}
+            resolved = self._resolve_labels(request)
+            if isinstance(resolved, Response):
+                return resolved
+            period1_label, period2_label = resolved
             
-            # Compare each predefined ratio field
-            for field in ratio_fields:
-                value1 = getattr(ratios_period1, field, None)
-                value2 = getattr(ratios_period2, field, None)
-                
-                formatted = self._format_ratio_comparison(field, value1, value2)
-                if formatted is not None:
-                    ratios_comparison[field] = formatted
-            
-            # Include additional ratios from all_ratios JSON field if available
-            if ratios_period1.all_ratios and isinstance(ratios_period1.all_ratios, dict):
-                if ratios_period2.all_ratios and isinstance(ratios_period2.all_ratios, dict):
-                    for ratio_name in ratios_period1.all_ratios.keys():
-                        if ratio_name not in ratios_comparison:  # Don't override main fields
-                            value1 = ratios_period1.all_ratios.get(ratio_name)
-                            value2 = ratios_period2.all_ratios.get(ratio_name)
-                            
-                            formatted = self._format_ratio_comparison(ratio_name, value1, value2)
-                            if formatted is not None:
-                                ratios_comparison[ratio_name] = formatted
-            
-            # Return comparison data
-            return Response(
-                {
-                    "status": "success",
-                    "response_code": status.HTTP_200_OK,
-                    "data": {
-                        "period1": period1_label,
-                        "period2": period2_label,
-                        "ratios": ratios_comparison
-                    }
-                },
-                status=status.HTTP_200_OK
+            # Fetch periods and their ratio results
+            return self._comparison_response(
+                period1_label, period2_label, *[read() for read in self._readers(period1_label, period2_label)]
             )
         
         except Exception as e:
@@ -2674,12 +2892,15 @@ class PeriodComparisonView(APIView):
 
 
 
-class DashboardView(APIView):
+class DashboardView(ReadReplicaMixin, APIView):
     """
     Dashboard endpoint for aggregated financial metrics.
     Query Parameters:
         - period: 'all' (all periods) or MONTHLY/QUARTERLY/YEARLY (specific period type)
+        - within: optional parent period label; only periods nested inside it (e.g. FY_2024_25)
         - include_ratios: 'true' to include full RatioResult data for each period (default: false)
+        - layout: 'rows' (default) or 'columnar': "periods" as one array per field
+          (ratios flattened into the period's columns, all_ratios omitted)
     Returns:
         Default (aggregated metrics):
         {
@@ -2841,370 +3062,1012 @@ class DashboardView(APIView):
         
         return ratios
     
-    def get(self, request):
-        try:
-            # Get query parameters
-            period_param = request.query_params.get('period', 'all')   # 'all' or period_type
-            include_ratios = request.query_params.get('include_ratios', 'false').lower() == 'true'
-            category = request.query_params.get('category', None)  # Optional category filter
-            
-            # Validate category if provided
-            if category and category not in self.CATEGORY_FIELDS:
+    def response_version(self, request):
+        """Version of everything the dashboard reads: all periods with their rows, and the benchmarks."""
+        from app.services.benchmark_config import get_benchmarks_version
+        parts, last_modified = queryset_version(FinancialPeriod.objects.all(), PERIOD_STAMP_FIELDS)
+        return parts + [get_benchmarks_version()], last_modified
+
+    def columnar_data(self, data):
+        """Periods as columns indexed by period; each period's ratios become its own columns."""
+        rows = []
+        for period in data["data"]["periods"]:
+            row = {key: value for key, value in period.items() if key != "ratios"}
+            if "ratios" in period:
+                ratios = period["ratios"]
+                # all_ratios repeats the ratio fields; the ratio id is not charted
+                row.update((key, value) for key, value in ratios.items() if key not in ("id", "all_ratios", "calculated_at"))
+                row["calculated_at"] = ratios.get("calculated_at")
+            rows.append(row)
+        periods = to_columns(rows, ("id", "label"), groups=("traffic_light_status",))
+        return dict(data, data=dict(data["data"], periods=periods))
+
+    def _periods_queryset(self, request, period_param, category):
+        """Periods selected by ?period and ?within, or an error Response (also for an unknown ?category)."""
+        # Validate category if provided
+        if category and category not in self.CATEGORY_FIELDS:
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_400_BAD_REQUEST,
+                "message": f"Invalid category. Valid categories are: {', '.join(self.CATEGORY_FIELDS.keys())}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Filter periods based on period parameters
+        periods_queryset = FinancialPeriod.objects.all()
+        
+        if period_param != 'all':
+            # Filter by period type (MONTHLY, QUARTERLY, YEARLY, etc.)
+            periods_queryset = periods_queryset.filter(period_type=period_param)
+        
+        # Optional: only periods nested inside a parent period (e.g. within=FY_2024_25)
+        within = request.query_params.get('within')
+        if within:
+            from app.services.period_calendar import get_period_calendar
+            calendar = get_period_calendar()
+            parent = calendar.find(within)
+            if parent is None:
                 return Response({
                     "status": "failed",
-                    "response_code": status.HTTP_400_BAD_REQUEST,
-                    "message": f"Invalid category. Valid categories are: {', '.join(self.CATEGORY_FIELDS.keys())}"
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Filter periods based on period parameters
-            periods_queryset = FinancialPeriod.objects.all()
-            
-            if period_param != 'all':
-                # Filter by period type (MONTHLY, QUARTERLY, YEARLY, etc.)
-                periods_queryset = periods_queryset.filter(period_type=period_param)
-            
-            # Get ratio data for all matching periods
-            ratio_results = RatioResult.objects.filter(
+                    "response_code": status.HTTP_404_NOT_FOUND,
+                    "message": f"Period '{within}' not found"
+                }, status=status.HTTP_404_NOT_FOUND)
+            child_type = None if period_param == 'all' else period_param
+            child_ids = [span.id for span in calendar.children(parent.id, child_type)]
+            periods_queryset = periods_queryset.filter(id__in=child_ids)
+        return periods_queryset
+    
+    def _readers(self, periods_queryset):
+        """Independent reads: ratio results with their periods, trading accounts and P&Ls by period id."""
+        return [
+            lambda: list(RatioResult.objects.filter(
                 period__in=periods_queryset
-            ).select_related('period').order_by('period__start_date')
-            
-            if not ratio_results.exists():
-                # No data found for the given filters
-                if include_ratios:
-                    return Response({
-                        "status": "success",
-                        "response_code": status.HTTP_200_OK,
-                        "data": {
-                            "periods": []
-                        }
-                    }, status=status.HTTP_200_OK)
-                else:
-                    return Response({
-                        "status": "success",
-                        "response_code": status.HTTP_200_OK,
-                        "data": {
-                            "total_revenue": 0,
-                            "avg_profit_margin": 0,
-                            "growth_rate": 0,
-                            "periods": []
-                        }
-                    }, status=status.HTTP_200_OK)
-            
-            # Organize data
-            periods_list = []
-            all_revenues = []  # For total revenue calculation (only used when not include_ratios)
-            all_profit_margins = []  # For average profit margin calculation (only used when not include_ratios)
-            
-            for ratio_result in ratio_results:
-                period = ratio_result.period
-                
-                # Extract net revenue and net profit from trading account
-                trading_account = None
-                profit_loss = None
-                
-                try:
-                    trading_account = TradingAccount.objects.get(period=period)
-                    profit_loss = ProfitAndLoss.objects.get(period=period)
-                except (TradingAccount.DoesNotExist, ProfitAndLoss.DoesNotExist):
-                    continue
-                
-                # Calculate net revenue (Sales - Cost of Goods Sold)
-                # From Trading Account: Sales - (Opening Stock + Purchases + Trade Charges - Closing Stock)
-                opening_stock = trading_account.opening_stock or Decimal('0')
-                purchases = trading_account.purchases or Decimal('0')
-                trade_charges = trading_account.trade_charges or Decimal('0')
-                sales = trading_account.sales or Decimal('0')
-                closing_stock = trading_account.closing_stock or Decimal('0')
-                
-                # COGS = Opening Stock + Purchases + Trade Charges - Closing Stock
-                cogs = opening_stock + purchases + trade_charges - closing_stock
-                # Net Revenue = Sales (Revenue is top-line income)
-                net_revenue = sales
-                
-                # Extract net profit from P&L
-                net_profit = profit_loss.net_profit or Decimal('0')
-                
-                if include_ratios:
-                    # Return detailed ratio data with period info
-                    # Safely serialize uploaded_file to handle encoding issues
-                    try:
-                        uploaded_file = str(period.uploaded_file) if period.uploaded_file else None
-                    except Exception:
-                        uploaded_file = None
-                    
-                    period_data = {
-                        "id": period.id,
-                        "label": period.label,
-                        "period_type": period.period_type,
-                        "start_date": period.start_date.isoformat() if period.start_date else None,
-                        "end_date": period.end_date.isoformat() if period.end_date else None,
-                        "is_finalized": period.is_finalized,
-                        "uploaded_file": uploaded_file,
-                        "file_type": period.file_type or None,
-                        "created_at": period.created_at.isoformat() if period.created_at else None,
-                        "net_revenue": float(net_revenue),
-                        "net_profit": float(net_profit),
-                        "ratios": self._get_filtered_ratios(ratio_result, category)
-                    }
-                    periods_list.append(period_data)
-                else:
-                    # Return aggregated data with minimal period info
-                    period_data = {
-                        "id": period.id,
-                        "label": period.label,
-                        "net_revenue": float(net_revenue),
-                        "net_profit": float(net_profit),
-                        "period_type": period.period_type,
-                        "is_finalized": period.is_finalized,
-                        "created_at": period.created_at.isoformat() if period.created_at else None
-                    }
-                    periods_list.append(period_data)
-                    
-                    # Collect for aggregation calculations
-                    if net_revenue > 0:
-                        all_revenues.append(net_revenue)
-                    
-                    # Calculate profit margin for this period
-                    if net_revenue != 0:
-                        profit_margin = (net_profit / net_revenue) * 100
-                        all_profit_margins.append(profit_margin)
-            
+            ).select_related('period').order_by('period__start_date')),
+            lambda: {account.period_id: account for account in TradingAccount.objects.filter(period__in=periods_queryset)},
+            lambda: {account.period_id: account for account in ProfitAndLoss.objects.filter(period__in=periods_queryset)},
+        ]
+    
+    def _dashboard_response(self, ratio_results, trading_accounts, profit_losses, include_ratios, category):
+        if not ratio_results:
+            # No data found for the given filters
             if include_ratios:
-                # Return detailed ratio data without aggregation
                 return Response({
                     "status": "success",
                     "response_code": status.HTTP_200_OK,
                     "data": {
-                        "periods": periods_list
+                        "periods": []
                     }
                 }, status=status.HTTP_200_OK)
             else:
-                # Return aggregated metrics
-                total_revenue = sum(all_revenues) if all_revenues else Decimal('0')
-                avg_profit_margin = sum(all_profit_margins) / len(all_profit_margins) if all_profit_margins else Decimal('0')
-                
-                # Calculate growth rate (percentage change from first to last period)
-                growth_rate = Decimal('0')
-                if len(all_revenues) > 1 and all_revenues[0] != 0:
-                    growth_rate = ((all_revenues[-1] - all_revenues[0]) / all_revenues[0]) * 100
-                
                 return Response({
                     "status": "success",
                     "response_code": status.HTTP_200_OK,
                     "data": {
-                        "total_revenue": float(total_revenue),
-                        "avg_profit_margin": float(round(avg_profit_margin, 2)),
-                        "growth_rate": float(round(growth_rate, 2)),
-                        "periods": periods_list
+                        "total_revenue": 0,
+                        "avg_profit_margin": 0,
+                        "growth_rate": 0,
+                        "periods": []
                     }
                 }, status=status.HTTP_200_OK)
         
-        except Exception as e:
-            logger.exception(f"Error in DashboardView: {str(e)}")
+        # Organize data
+        periods_list = []
+        all_revenues = []  # For total revenue calculation (only used when not include_ratios)
+        all_profit_margins = []  # For average profit margin calculation (only used when not include_ratios)
+        
+        for ratio_result in ratio_results:
+            period = ratio_result.period
+            
+            # Extract net revenue and net profit from trading account
+            trading_account = trading_accounts.get(period.id)
+            profit_loss = profit_losses.get(period.id)
+            if trading_account is None or profit_loss is None:
+                continue
+            
+            # Calculate net revenue (Sales - Cost of Goods Sold)
+            # From Trading Account: Sales - (Opening Stock + Purchases + Trade Charges - Closing Stock)
+            opening_stock = trading_account.opening_stock or Decimal('0')
+            purchases = trading_account.purchases or Decimal('0')
+            trade_charges = trading_account.trade_charges or Decimal('0')
+            sales = trading_account.sales or Decimal('0')
+            closing_stock = trading_account.closing_stock or Decimal('0')
+            
+            # COGS = Opening Stock + Purchases + Trade Charges - Closing Stock
+            cogs = opening_stock + purchases + trade_charges - closing_stock
+            # Net Revenue = Sales (Revenue is top-line income)
+            net_revenue = sales
+            
+            # Extract net profit from P&L
+            net_profit = profit_loss.net_profit or Decimal('0')
+            
+            if include_ratios:
+                # Return detailed ratio data with period info
+                # Safely serialize uploaded_file to handle encoding issues
+                try:
+                    uploaded_file = str(period.uploaded_file) if period.uploaded_file else None
+                except Exception:
+                    uploaded_file = None
+                
+                period_data = {
+                    "id": period.id,
+                    "label": period.label,
+                    "period_type": period.period_type,
+                    "start_date": period.start_date.isoformat() if period.start_date else None,
+                    "end_date": period.end_date.isoformat() if period.end_date else None,
+                    "is_finalized": period.is_finalized,
+                    "uploaded_file": uploaded_file,
+                    "file_type": period.file_type or None,
+                    "created_at": period.created_at.isoformat() if period.created_at else None,
+                    "net_revenue": float(net_revenue),
+                    "net_profit": float(net_profit),
+                    "ratios": self._get_filtered_ratios(ratio_result, category)
+                }
+                periods_list.append(period_data)
+            else:
+                # Return aggregated data with minimal period info
+                period_data = {
+                    "id": period.id,
+                    "label": period.label,
+                    "net_revenue": float(net_revenue),
+                    "net_profit": float(net_profit),
+                    "period_type": period.period_type,
+                    "is_finalized": period.is_finalized,
+                    "created_at": period.created_at.isoformat() if period.created_at else None
+                }
+                periods_list.append(period_data)
+                
+                # Collect for aggregation calculations
+                if net_revenue > 0:
+                    all_revenues.append(net_revenue)
+                
+                # Calculate profit margin for this period
+                if net_revenue != 0:
+                    profit_margin = (net_profit / net_revenue) * 100
+                    all_profit_margins.append(profit_margin)
+        
+        if include_ratios:
+            # Return detailed ratio data without aggregation
             return Response({
-                "status": "failed",
-                "response_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
-                "message": f"Error fetching dashboard data: {str(e)}"
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-
-
+                "status": "success",
+                "response_code": status.HTTP_200_OK,
+                "data": {
+                    "periods": periods_list
+                }
+            }, status=status.HTTP_200_OK)
+        else:
+            # Return aggregated metrics
+            total_revenue = sum(all_revenues) if all_revenues else Decimal('0')
+            avg_profit_margin = sum(all_profit_margins) / len(all_profit_margins) if all_profit_margins else Decimal('0')
+            
+            # Calculate growth rate (percentage change from first to last period)
+            growth_rate = Decimal('0')
+            if len(all_revenues) > 1 and all_revenues[0] != 0:
+                growth_rate = ((all_revenues[-1] - all_revenues[0]) / all_revenues[0]) * 100
+            
+            return Response({
+                "status": "success",
+                "response_code": status.HTTP_200_OK,
+                "data": {
+                    "total_revenue": float(total_revenue),
+                    "avg_profit_margin": float(round(avg_profit_margin, 2)),
+                    "growth_rate": float(round(growth_rate, 2)),
+                    "periods": periods_list
+                }
+            }, status=status.HTTP_200_OK)
+    
+    @cached_response('dashboard')
+    @conditional_get()
+    @columnar_layout()
+    def get(self, request):
+        try:
+            # Get query parameters
+            period_param = request.query_params.get('period', 'all')   # 'all' or period_type
+            include_ratios = request.query_params.get('include_ratios', 'false').lower() == 'true'
+            category = request.query_params.get('category', None)  # Optional category filter
+            
+            periods_queryset = self._periods_queryset(request, period_param, category)
+            if isinstance(periods_queryset, Response):
+                return periods_queryset
+            
+            # Get ratio data and statements for all matching periods
+            ratio_results, trading_accounts, profit_losses = [read() for read in self._readers(periods_queryset)]
+            return self._dashboard_response(ratio_results, trading_accounts, profit_losses, include_ratios, category)
+        
+        except Exception as e:
+            logger.exception(f"Error in DashboardView: {str(e)}")
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": f"Error fetching dashboard data: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+
+
+
+
+
+class RatioSeriesView(ReadReplicaMixin, APIView):
+    """
+    Columnar ratio time series for trend charts.
+    Query Parameters:
+        - ratios: comma separated RatioResult fields (e.g. net_margin,cost_of_deposits)
+        - period_type: MONTHLY/QUARTERLY/HALF_YEARLY/YEARLY (default: MONTHLY)
+        - from / to: optional start_date bounds (YYYY-MM-DD)
+        - window: rolling window size in periods (default: 3)
+    Returns:
+        {
+            "dates": ["2024-04-01", ...],
+            "labels": ["Apr_2024", ...],
+            "series": {
+                "net_margin": {
+                    "values": [...], "rolling_mean": [...], "rolling_std": [...],
+                    "yoy_change": [...], "min": {...}, "max": {...}
+                }
+            }
+        }
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from app.services.ratio_series import (
+            SERIES_FIELDS, DEFAULT_WINDOW, MAX_WINDOW, get_ratio_series,
+        )
+        try:
+            ratios_param = request.query_params.get('ratios', '')
+            ratios = [r.strip() for r in ratios_param.split(',') if r.strip()]
+            if not ratios:
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": "ratios is required (comma separated)"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            invalid = [r for r in ratios if r not in SERIES_FIELDS]
+            if invalid:
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": f"Unknown ratios: {', '.join(invalid)}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            period_type = request.query_params.get('period_type', 'MONTHLY')
+            valid_types = [choice[0] for choice in FinancialPeriod.PERIOD_TYPE_CHOICES]
+            if period_type not in valid_types:
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": f"Invalid period_type. Valid values are: {', '.join(valid_types)}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            try:
+                date_from = request.query_params.get('from') or None
+                date_to = request.query_params.get('to') or None
+                if date_from:
+                    date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
+                if date_to:
+                    date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
+                window = int(request.query_params.get('window', DEFAULT_WINDOW))
+            except (ValueError, TypeError):
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": "from/to must be YYYY-MM-DD and window must be an integer"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if not 1 <= window <= MAX_WINDOW:
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": f"window must be between 1 and {MAX_WINDOW}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            data = get_ratio_series(ratios, period_type, date_from, date_to, window)
+            return Response({
+                "status": "success",
+                "response_code": status.HTTP_200_OK,
+                "data": data
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.exception(f"Error in RatioSeriesView: {str(e)}")
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": f"Error building ratio series: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class TTMRatiosView(ReadReplicaMixin, APIView):
+    """
+    Trailing-twelve-month ratios for MONTHLY periods.
+    GET: stored TTM series (columnar).
+        Query Parameters:
+            - ratios: optional comma separated ratio names (default: all)
+            - from / to: optional start_date bounds (YYYY-MM-DD)
+    POST: recompute and store the full TTM series.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            rows = TrailingRatioResult.objects.select_related('period').order_by('period__start_date')
+            try:
+                date_from = request.query_params.get('from') or None
+                date_to = request.query_params.get('to') or None
+                if date_from:
+                    rows = rows.filter(period__start_date__gte=datetime.strptime(date_from, '%Y-%m-%d').date())
+                if date_to:
+                    rows = rows.filter(period__start_date__lte=datetime.strptime(date_to, '%Y-%m-%d').date())
+            except ValueError:
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": "from/to must be YYYY-MM-DD"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            rows = list(rows)
+            ratios_param = request.query_params.get('ratios', '')
+            names = [r.strip() for r in ratios_param.split(',') if r.strip()]
+            if not names and rows:
+                names = list(rows[0].ratios.keys())
+
+            return Response({
+                "status": "success",
+                "response_code": status.HTTP_200_OK,
+                "data": {
+                    "period_ids": [r.period_id for r in rows],
+                    "labels": [r.period.label for r in rows],
+                    "dates": [r.period.start_date.isoformat() for r in rows],
+                    "window_start": [r.window_start.isoformat() for r in rows],
+                    "series": {name: [r.ratios.get(name) for r in rows] for name in names},
+                    "traffic_light_status": {
+                        name: [r.traffic_light_status.get(name) for r in rows] for name in names
+                    },
+                }
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.exception(f"Error in TTMRatiosView: {str(e)}")
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": f"Error fetching TTM ratios: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def post(self, request):
+        from app.services.ttm_calculator import refresh_ttm_series
+        try:
+            count = refresh_ttm_series()
+            return Response({
+                "status": "success",
+                "response_code": status.HTTP_200_OK,
+                "message": f"TTM ratios calculated for {count} months",
+                "count": count
+            })
+        except Exception as e:
+            logger.exception(f"Error recalculating TTM ratios: {str(e)}")
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PeriodRollupView(APIView):
+    """
+    POST: derive QUARTERLY / HALF_YEARLY / YEARLY periods from complete sets of
+    MONTHLY children and recalculate their ratios in one batch.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        from app.services.period_rollup import rollup_all
+        try:
+            parents = rollup_all()
+            return Response({
+                "status": "success",
+                "response_code": status.HTTP_200_OK,
+                "message": f"{len(parents)} periods derived from monthly data",
+                "periods": [
+                    {"id": p.id, "label": p.label, "period_type": p.period_type}
+                    for p in parents
+                ]
+            })
+        except Exception as e:
+            logger.exception(f"Error in PeriodRollupView: {str(e)}")
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class RecalculateRatiosView(APIView):
+    """
+    POST: recalculate stored ratios for every period with complete statements.
+
+    Body (all optional):
+        - period_type: limit to one period type (e.g. MONTHLY)
+        - averaging: "closing" | "average" (default: settings.RATIO_AVERAGING_MODE)
+        - progress_id: follow the stages on /api/progress/<id>/ (or X-Progress-Id header)
+
+    Periods are loaded with their statements in one query; in "average" mode the
+    previous periods' balance sheets are prefetched in one more query.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @admission_control('recalc')
+    def post(self, request):
+        from app.services.progress import ProgressReporter
+        progress = ProgressReporter.for_request(request, 'recalculation')
+        return progress.finish(self._recalculate(request, progress))
+
+    def _recalculate(self, request, progress):
+        from app.services.ratio_calculator import AVERAGING_MODES, save_ratio_results
+        try:
+            averaging = request.data.get('averaging')
+            if averaging and averaging not in AVERAGING_MODES:
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": f"averaging must be one of: {', '.join(AVERAGING_MODES)}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            periods = FinancialPeriod.objects.select_related(
+                'trading_account', 'profit_loss', 'balance_sheet', 'operational_metrics'
+            ).order_by('start_date')
+            period_type = request.data.get('period_type')
+            if period_type:
+                periods = periods.filter(period_type=period_type)
+            periods = [
+                p for p in periods
+                if hasattr(p, 'trading_account') and hasattr(p, 'profit_loss')
+                and hasattr(p, 'balance_sheet') and hasattr(p, 'operational_metrics')
+            ]
+
+            progress.emit('received', periods=len(periods))
+
+            count = save_ratio_results(periods, averaging=averaging, progress=progress)
+            return Response({
+                "status": "success",
+                "response_code": status.HTTP_200_OK,
+                "message": f"Ratios recalculated for {count} periods",
+            })
+        except Exception as e:
+            logger.exception(f"Error in RecalculateRatiosView: {str(e)}")
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ScenarioView(APIView):
+    """
+    POST /api/periods/<period_id>/scenarios/
+    What-if analysis: evaluates ratios and traffic lights for every combination of
+    the given input perturbations. Nothing is saved.
+
+    Body:
+        {
+            "perturbations": [
+                {"field": "deposits", "pct": [0, 5, 10]},
+                {"field": "cost_of_deposits", "bp": [-50, -25, 0]}
+            ],
+            "ratios": ["net_margin", "cost_of_deposits"],   // optional, default all
+            "averaging": "closing" | "average"               // optional
+        }
+
+    Statement fields take "pct" (relative change in %) or "delta" (absolute change);
+    cost_of_deposits / yield_on_loans / yield_on_investments take "bp" and re-price
+    the matching interest flow on the perturbed balance.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, period_id):
+        from app.services.ratio_calculator import AVERAGING_MODES
+        from app.services.scenario_simulator import ScenarioError, simulate_scenarios
+        from django.core.exceptions import ValidationError
+        try:
+            averaging = request.data.get('averaging')
+            if averaging and averaging not in AVERAGING_MODES:
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": f"averaging must be one of: {', '.join(AVERAGING_MODES)}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            ratios = request.data.get('ratios')
+            if ratios is not None and (
+                not isinstance(ratios, list) or not all(isinstance(name, str) for name in ratios)
+            ):
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": "ratios must be a list of ratio names"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            period = FinancialPeriod.objects.select_related(
+                'trading_account', 'profit_loss', 'balance_sheet', 'operational_metrics'
+            ).get(id=period_id)
+            data = simulate_scenarios(
+                period,
+                request.data.get('perturbations'),
+                ratios=ratios,
+                averaging=averaging,
+            )
+            data["period_id"] = period.id
+            data["period_label"] = period.label
+            return Response({
+                "status": "success",
+                "response_code": status.HTTP_200_OK,
+                "data": data
+            })
+        except FinancialPeriod.DoesNotExist:
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_404_NOT_FOUND,
+                "message": "FinancialPeriod not found"
+            }, status=status.HTTP_404_NOT_FOUND)
+        except (ScenarioError, ValidationError) as e:
+            message = e.messages[0] if isinstance(e, ValidationError) else str(e)
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_400_BAD_REQUEST,
+                "message": message
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception(f"Error in ScenarioView: {str(e)}")
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class GoalSeekView(APIView):
+    """
+    POST /api/periods/<period_id>/goal-seek/
+    Finds the statement value at which a ratio reaches its benchmark (or a given target).
+    Nothing is saved.
 
+    Body:
+        {
+            "goals": [
+                {"field": "loans_advances", "ratio": "net_margin"},
+                {"field": "establishment_contingencies", "ratio": "net_margin"},
+                {"field": "interest_on_deposits", "ratio": "cost_of_deposits", "target": 5.0}
+            ],
+            "averaging": "closing" | "average"   // optional
+        }
 
-class PeriodComparisonByIdView(APIView):
+    Goals on loans_advances / deposits / investments re-price their interest line at the
+    current rate; pass "hold_rate": false to keep the interest amount fixed.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, period_id):
+        from app.services.goal_seek import GoalSeekError, goal_seek
+        from app.services.ratio_calculator import AVERAGING_MODES
+        from django.core.exceptions import ValidationError
+        try:
+            averaging = request.data.get('averaging')
+            if averaging and averaging not in AVERAGING_MODES:
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": f"averaging must be one of: {', '.join(AVERAGING_MODES)}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            period = FinancialPeriod.objects.select_related(
+                'trading_account', 'profit_loss', 'balance_sheet', 'operational_metrics'
+            ).get(id=period_id)
+            data = goal_seek(period, request.data.get('goals'), averaging=averaging)
+            data["period_id"] = period.id
+            data["period_label"] = period.label
+            return Response({
+                "status": "success",
+                "response_code": status.HTTP_200_OK,
+                "data": data
+            })
+        except FinancialPeriod.DoesNotExist:
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_404_NOT_FOUND,
+                "message": "FinancialPeriod not found"
+            }, status=status.HTTP_404_NOT_FOUND)
+        except (GoalSeekError, ValidationError) as e:
+            message = e.messages[0] if isinstance(e, ValidationError) else str(e)
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_400_BAD_REQUEST,
+                "message": message
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception(f"Error in GoalSeekView: {str(e)}")
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class SensitivityView(APIView):
+    """
+    POST /api/periods/<period_id>/sensitivity/
+    Monte Carlo sensitivity: samples normal noise around the period's statement values
+    and returns, per ratio, the probability of ending green / yellow / red. Nothing is saved.
+
+    Body (all optional):
+        {
+            "draws": 20000,                                   // up to SENSITIVITY_MAX_DRAWS
+            "noise": {"deposits": 5, "interest_on_loans": 3}, // std dev, % of value
+            "ratios": ["net_margin"],
+            "seed": 42,
+            "workers": 4,                                     // capped by SENSITIVITY_MAX_WORKERS
+            "averaging": "closing" | "average"
+        }
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, period_id):
+        from app.services.ratio_calculator import AVERAGING_MODES
+        from app.services.sensitivity import DEFAULT_DRAWS, SensitivityError, run_sensitivity
+        from django.core.exceptions import ValidationError
+        try:
+            averaging = request.data.get('averaging')
+            if averaging and averaging not in AVERAGING_MODES:
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": f"averaging must be one of: {', '.join(AVERAGING_MODES)}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            ratios = request.data.get('ratios')
+            seed = request.data.get('seed')
+            workers = request.data.get('workers')
+            if ratios is not None and (
+                not isinstance(ratios, list) or not all(isinstance(name, str) for name in ratios)
+            ):
+                raise SensitivityError("ratios must be a list of ratio names")
+            if seed is not None and (not isinstance(seed, int) or seed < 0):
+                raise SensitivityError("seed must be a non-negative integer")
+            if workers is not None and (not isinstance(workers, int) or workers < 1):
+                raise SensitivityError("workers must be a positive integer")
+
+            period = FinancialPeriod.objects.select_related(
+                'trading_account', 'profit_loss', 'balance_sheet', 'operational_metrics'
+            ).get(id=period_id)
+            data = run_sensitivity(
+                period,
+                draws=request.data.get('draws', DEFAULT_DRAWS),
+                noise=request.data.get('noise'),
+                ratios=ratios,
+                averaging=averaging,
+                seed=seed,
+                workers=workers,
+            )
+            data["period_id"] = period.id
+            data["period_label"] = period.label
+            return Response({
+                "status": "success",
+                "response_code": status.HTTP_200_OK,
+                "data": data
+            })
+        except FinancialPeriod.DoesNotExist:
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_404_NOT_FOUND,
+                "message": "FinancialPeriod not found"
+            }, status=status.HTTP_404_NOT_FOUND)
+        except (SensitivityError, ValidationError) as e:
+            message = e.messages[0] if isinstance(e, ValidationError) else str(e)
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_400_BAD_REQUEST,
+                "message": message
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception(f"Error in SensitivityView: {str(e)}")
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PeriodComparisonByIdView(ReadReplicaMixin, APIView):
     """
     Compare financial ratios between two periods by their IDs.
     
     Query Parameters:
-        - period_id1: ID of the first period
+        - period_id1: ID of the first period. Optional: defaults to the period
+          of the same type right before period_id2.
         - period_id2: ID of the second period
+        - layout: 'rows' (default) or 'columnar': period_1 / period_2 carry only
+          the period fields and "ratios" holds one array per value, indexed by ratio
     
     Returns:
         {
             "status": "success",
             "response_code": 200,
             "data": {
-                "period_1": {
-                    "id": 1,
-                    "label": "Jan_2025",
-                    "start_date": "2025-01-01",
-                    "end_date": "2025-01-31",
-                    "period_type": "MONTHLY",
-                    "stock_turnover": 12.5,
-                    "gross_profit_ratio": 5.2,
-                    ...all ratio fields...
-                },
-                "period_2": {
-                    "id": 2,
-                    "label": "May_2025",
-                    ...
-                },
-                "difference": {
-                    "stock_turnover": { "value": 2.1, "change": 16.8% },
-                    "gross_profit_ratio": { "value": 0.5, "change": 9.6% },
-                    ...
-                }
+                "period_1": {
+                    "id": 1,
+                    "label": "Jan_2025",
+                    "start_date": "2025-01-01",
+                    "end_date": "2025-01-31",
+                    "period_type": "MONTHLY",
+                    "stock_turnover": 12.5,
+                    "gross_profit_ratio": 5.2,
+                    ...all ratio fields...
+                },
+                "period_2": {
+                    "id": 2,
+                    "label": "May_2025",
+                    ...
+                },
+                "difference": {
+                    "stock_turnover": { "value": 2.1, "change": 16.8% },
+                    "gross_profit_ratio": { "value": 0.5, "change": 9.6% },
+                    ...
+                }
+            }
+        }
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def _convert_decimal(self, value):
+        """Safely convert Decimal to float."""
+        if value is None:
+            return None
+        if isinstance(value, Decimal):
+            return float(value)
+        return value
+    
+    def columnar_data(self, data):
+        """Ratio values of both periods and their differences as columns indexed by ratio name."""
+        data = data["data"]
+        period_fields = ("id", "label", "start_date", "end_date", "period_type")
+        names = [key for key in data["period_1"] if key not in period_fields]
+        ratios = {
+            name: {
+                "period_1": data["period_1"].get(name),
+                "period_2": data["period_2"].get(name),
+                "difference": data["difference"].get(name, {}).get("value"),
+                "percentage_change": data["difference"].get(name, {}).get("percentage_change"),
+            }
+            for name in names
+        }
+        return {
+            "status": "success",
+            "response_code": 200,
+            "data": {
+                "period_1": {field: data["period_1"][field] for field in period_fields},
+                "period_2": {field: data["period_2"][field] for field in period_fields},
+                "ratios": comparison_to_columns(ratios),
+            }
+        }
+    
+    def _resolve_ids(self, request):
+        """(period_id1, period_id2), or an error Response. period_id1 defaults to the period right before period_id2."""
+        period_id1 = request.query_params.get('period_id1')
+        period_id2 = request.query_params.get('period_id2')
+        
+        if period_id2 and not period_id1:
+            from app.services.period_calendar import get_period_calendar
+            try:
+                previous = get_period_calendar().predecessor(int(period_id2))
+            except (ValueError, TypeError):
+                previous = None
+            if previous is not None:
+                period_id1 = previous.id
+        
+        if not period_id1 or not period_id2:
+            return Response({
+                "status": "failed",
+                "response_code": 400,
+                "message": "Both period_id1 and period_id2 are required"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            period_id1 = int(period_id1)
+            period_id2 = int(period_id2)
+        except (ValueError, TypeError):
+            return Response({
+                "status": "failed",
+                "response_code": 400,
+                "message": "Period IDs must be integers"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return period_id1, period_id2
+    
+    def _readers(self, period_id1, period_id2):
+        """Independent reads for a comparison: both periods, then both ratio results."""
+        return [
+            lambda: FinancialPeriod.objects.filter(id=period_id1).first(),
+            lambda: FinancialPeriod.objects.filter(id=period_id2).first(),
+            lambda: RatioResult.objects.filter(period_id=period_id1).first(),
+            lambda: RatioResult.objects.filter(period_id=period_id2).first(),
+        ]
+    
+    def _comparison_response(self, period_id1, period_id2, period1, period2, ratios1, ratios2):
+        if period1 is None:
+            return Response({
+                "status": "failed",
+                "response_code": 404,
+                "message": f"Period with ID {period_id1} not found"
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        if period2 is None:
+            return Response({
+                "status": "failed",
+                "response_code": 404,
+                "message": f"Period with ID {period_id2} not found"
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        if ratios1 is None:
+            return Response({
+                "status": "failed",
+                "response_code": 404,
+                "message": f"Ratio data not found for period {period1.label}"
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        if ratios2 is None:
+            return Response({
+                "status": "failed",
+                "response_code": 404,
+                "message": f"Ratio data not found for period {period2.label}"
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        # All ratio fields to compare
+        ratio_fields = [
+            "stock_turnover", "gross_profit_ratio", "net_profit_ratio",
+            "net_own_funds", "own_fund_to_wf", "deposits_to_wf", "borrowings_to_wf",
+            "loans_to_wf", "investments_to_wf", "earning_assets_to_wf",
+            "interest_tagged_funds_to_wf", "cost_of_deposits", "yield_on_loans",
+            "yield_on_investments", "credit_deposit_ratio", "avg_cost_of_wf",
+            "avg_yield_on_wf", "misc_income_to_wf", "interest_exp_to_interest_income",
+            "gross_fin_margin", "operating_cost_to_wf", "net_fin_margin",
+            "risk_cost_to_wf", "net_margin", "capital_turnover_ratio",
+            "per_employee_deposit", "per_employee_loan", "per_employee_contribution",
+            "per_employee_operating_cost", "working_fund"
+        ]
+        
+        # Build period 1 data
+        period_1_data = {
+            "id": period1.id,
+            "label": period1.label,
+            "start_date": period1.start_date.isoformat(),
+            "end_date": period1.end_date.isoformat(),
+            "period_type": period1.period_type
+        }
+        
+        # Add all ratio fields to period 1
+        for field in ratio_fields:
+            value = getattr(ratios1, field, None)
+            period_1_data[field] = self._convert_decimal(value)
+        
+        # Build period 2 data
+        period_2_data = {
+            "id": period2.id,
+            "label": period2.label,
+            "start_date": period2.start_date.isoformat(),
+            "end_date": period2.end_date.isoformat(),
+            "period_type": period2.period_type
+        }
+        
+        # Add all ratio fields to period 2
+        for field in ratio_fields:
+            value = getattr(ratios2, field, None)
+            period_2_data[field] = self._convert_decimal(value)
+        
+        # Calculate differences
+        differences = {}
+        for field in ratio_fields:
+            val1 = getattr(ratios1, field, None)
+            val2 = getattr(ratios2, field, None)
+            
+            if val1 is not None and val2 is not None:
+                try:
+                    val1_float = float(val1)
+                    val2_float = float(val2)
+                    difference = val2_float - val1_float
+                    
+                    # Calculate percentage change
+                    if val1_float != 0:
+                        percentage_change = (difference / val1_float) * 100
+                    else:
+                        percentage_change = None if val2_float == 0 else None
+                    
+                    # Check for infinity or NaN values and convert to None
+                    if percentage_change is not None and (percentage_change == float('inf') or percentage_change == float('-inf') or percentage_change != percentage_change):
+                        percentage_change = None
+                    
+                    differences[field] = {
+                        "value": round(difference, 2),
+                        "percentage_change": round(percentage_change, 2) if percentage_change is not None else None
+                    }
+                except:
+                    pass
+        
+        return Response({
+            "status": "success",
+            "response_code": 200,
+            "data": {
+                "period_1": period_1_data,
+                "period_2": period_2_data,
+                "difference": differences
             }
-        }
-    """
-    permission_classes = [IsAuthenticated]
-    
-    def _convert_decimal(self, value):
-        """Safely convert Decimal to float."""
-        if value is None:
-            return None
-        if isinstance(value, Decimal):
-            return float(value)
-        return value
+        }, status=status.HTTP_200_OK)
     
+    @cached_response('period-comparison-by-id')
+    @columnar_layout()
     def get(self, request):
         try:
-            period_id1 = request.query_params.get('period_id1')
-            period_id2 = request.query_params.get('period_id2')
-            
-            if not period_id1 or not period_id2:
-                return Response({
-                    "status": "failed",
-                    "response_code": 400,
-                    "message": "Both period_id1 and period_id2 are required"
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            try:
-                period_id1 = int(period_id1)
-                period_id2 = int(period_id2)
-            except (ValueError, TypeError):
-                return Response({
-                    "status": "failed",
-                    "response_code": 400,
-                    "message": "Period IDs must be integers"
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Fetch periods
-            period1 = None
-            period2 = None
+            resolved = self._resolve_ids(request)
+            if isinstance(resolved, Response):
+                return resolved
+            period_id1, period_id2 = resolved
             
-            try:
-                period1 = FinancialPeriod.objects.get(id=period_id1)
-            except FinancialPeriod.DoesNotExist:
-                return Response({
-                    "status": "failed",
-                    "response_code": 404,
-                    "message": f"Period with ID {period_id1} not found"
-                }, status=status.HTTP_404_NOT_FOUND)
-            
-            try:
-                period2 = FinancialPeriod.objects.get(id=period_id2)
-            except FinancialPeriod.DoesNotExist:
-                return Response({
-                    "status": "failed",
-                    "response_code": 404,
-                    "message": f"Period with ID {period_id2} not found"
-                }, status=status.HTTP_404_NOT_FOUND)
+            # Fetch periods and their ratio results
+            return self._comparison_response(
+                period_id1, period_id2, *[read() for read in self._readers(period_id1, period_id2)]
+            )
             
-            # Fetch ratio results
-            try:
-                ratios1 = RatioResult.objects.get(period=period1)
-            except RatioResult.DoesNotExist:
-                return Response({
-                    "status": "failed",
-                    "response_code": 404,
-                    "message": f"Ratio data not found for period {period1.label}"
-                }, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.exception(f"Error in PeriodComparisonByIdView: {str(e)}")
+            return Response({
+                "status": "failed",
+                "response_code": 500,
+                "message": f"Error comparing periods: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class AsyncPeriodComparisonView(AsyncReadView, PeriodComparisonView):
+    """PeriodComparisonView on the async read path: periods and ratio results are fetched concurrently."""
+
+    @cached_response('period-comparison')
+    @columnar_layout()
+    async def get(self, request):
+        from app.db_router import gather_reads
+        try:
+            resolved = await sync_to_async(self._resolve_labels)(request)
+            if isinstance(resolved, Response):
+                return resolved
+            period1_label, period2_label = resolved
             
-            try:
-                ratios2 = RatioResult.objects.get(period=period2)
-            except RatioResult.DoesNotExist:
-                return Response({
+            return self._comparison_response(
+                period1_label, period2_label, *await gather_reads(*self._readers(period1_label, period2_label))
+            )
+        
+        except Exception as e:
+            logger.error(f"Error in AsyncPeriodComparisonView: {str(e)}")
+            return Response(
+                {
                     "status": "failed",
-                    "response_code": 404,
-                    "message": f"Ratio data not found for period {period2.label}"
-                }, status=status.HTTP_404_NOT_FOUND)
-            
-            # All ratio fields to compare
-            ratio_fields = [
-                "stock_turnover", "gross_profit_ratio", "net_profit_ratio",
-                "net_own_funds", "own_fund_to_wf", "deposits_to_wf", "borrowings_to_wf",
-                "loans_to_wf", "investments_to_wf", "earning_assets_to_wf",
-                "interest_tagged_funds_to_wf", "cost_of_deposits", "yield_on_loans",
-                "yield_on_investments", "credit_deposit_ratio", "avg_cost_of_wf",
-                "avg_yield_on_wf", "misc_income_to_wf", "interest_exp_to_interest_income",
-                "gross_fin_margin", "operating_cost_to_wf", "net_fin_margin",
-                "risk_cost_to_wf", "net_margin", "capital_turnover_ratio",
-                "per_employee_deposit", "per_employee_loan", "per_employee_contribution",
-                "per_employee_operating_cost", "working_fund"
-            ]
-            
-            # Build period 1 data
-            period_1_data = {
-                "id": period1.id,
-                "label": period1.label,
-                "start_date": period1.start_date.isoformat(),
-                "end_date": period1.end_date.isoformat(),
-                "period_type": period1.period_type
-            }
-            
-            # Add all ratio fields to period 1
-            for field in ratio_fields:
-                value = getattr(ratios1, field, None)
-                period_1_data[field] = self._convert_decimal(value)
-            
-            # Build period 2 data
-            period_2_data = {
-                "id": period2.id,
-                "label": period2.label,
-                "start_date": period2.start_date.isoformat(),
-                "end_date": period2.end_date.isoformat(),
-                "period_type": period2.period_type
-            }
-            
-            # Add all ratio fields to period 2
-            for field in ratio_fields:
-                value = getattr(ratios2, field, None)
-                period_2_data[field] = self._convert_decimal(value)
-            
-            # Calculate differences
-            differences = {}
-            for field in ratio_fields:
-                val1 = getattr(ratios1, field, None)
-                val2 = getattr(ratios2, field, None)
-                
-                if val1 is not None and val2 is not None:
-                    try:
-                        val1_float = float(val1)
-                        val2_float = float(val2)
-                        difference = val2_float - val1_float
-                        
-                        # Calculate percentage change
-                        if val1_float != 0:
-                            percentage_change = (difference / val1_float) * 100
-                        else:
-                            percentage_change = None if val2_float == 0 else None
-                        
-                        # Check for infinity or NaN values and convert to None
-                        if percentage_change is not None and (percentage_change == float('inf') or percentage_change == float('-inf') or percentage_change != percentage_change):
-                            percentage_change = None
-                        
-                        differences[field] = {
-                            "value": round(difference, 2),
-                            "percentage_change": round(percentage_change, 2) if percentage_change is not None else None
-                        }
-                    except:
-                        pass
+                    "response_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    "message": "An error occurred while comparing periods"
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class AsyncPeriodComparisonByIdView(AsyncReadView, PeriodComparisonByIdView):
+    """PeriodComparisonByIdView on the async read path: periods and ratio results are fetched concurrently."""
+
+    @cached_response('period-comparison-by-id')
+    @columnar_layout()
+    async def get(self, request):
+        from app.db_router import gather_reads
+        try:
+            resolved = await sync_to_async(self._resolve_ids)(request)
+            if isinstance(resolved, Response):
+                return resolved
+            period_id1, period_id2 = resolved
             
-            return Response({
-                "status": "success",
-                "response_code": 200,
-                "data": {
-                    "period_1": period_1_data,
-                    "period_2": period_2_data,
-                    "difference": differences
-                }
-            }, status=status.HTTP_200_OK)
+            return self._comparison_response(
+                period_id1, period_id2, *await gather_reads(*self._readers(period_id1, period_id2))
+            )
             
         except Exception as e:
-            logger.exception(f"Error in PeriodComparisonByIdView: {str(e)}")
+            logger.exception(f"Error in AsyncPeriodComparisonByIdView: {str(e)}")
             return Response({
                 "status": "failed",
                 "response_code": 500,
@@ -3212,9 +4075,61 @@ class PeriodComparisonByIdView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class UserManagementViewSet(viewsets.ModelViewSet):
+class AsyncDashboardView(AsyncReadView, DashboardView):
+    """DashboardView on the async read path: ratio results and statements are fetched concurrently."""
+
+    @cached_response('dashboard')
+    @conditional_get()
+    @columnar_layout()
+    async def get(self, request):
+        from app.db_router import gather_reads
+        try:
+            period_param = request.query_params.get('period', 'all')
+            include_ratios = request.query_params.get('include_ratios', 'false').lower() == 'true'
+            category = request.query_params.get('category', None)
+            
+            periods_queryset = await sync_to_async(self._periods_queryset)(request, period_param, category)
+            if isinstance(periods_queryset, Response):
+                return periods_queryset
+            
+            ratio_results, trading_accounts, profit_losses = await gather_reads(*self._readers(periods_queryset))
+            return self._dashboard_response(ratio_results, trading_accounts, profit_losses, include_ratios, category)
+        
+        except Exception as e:
+            logger.exception(f"Error in AsyncDashboardView: {str(e)}")
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_500_INTERNAL_SERVER_ERROR,
+                "message": f"Error fetching dashboard data: {str(e)}"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AsyncRatioResultListView(AsyncReadView, ConditionalGetMixin, GenericAPIView):
+    """The ratio-results list (RatioResultViewSet.list) on the async read path."""
+    queryset = RatioResult.objects.all()
+    serializer_class = RatioResultSerializer
+    permission_classes = [IsAuthenticated]
+    stamp_fields = RATIO_STAMP_FIELDS
+    stamp_benchmarks = True
+    get_queryset = RatioResultViewSet.get_queryset
+    columnar_data = RatioResultViewSet.columnar_data
+
+    @cached_response('ratio-results')
+    @conditional_get()
+    @columnar_layout()
+    async def get(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).select_related('period')
+        ratio_results = [ratio_result async for ratio_result in queryset]
+        serializer = self.get_serializer(ratio_results, many=True)
+        # The interpretation field is recalculated from each period's statements (queries)
+        return Response(await sync_to_async(lambda: serializer.data)())
+
+
+class UserManagementViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = UserSerializer    
     permission_classes = [IsAuthenticated]
+    # The serializer includes the creator's name
+    stamp_fields = ('updated_at', 'created_by__updated_at')
 
     def get_queryset(self):
         # ✅ Return all users (no role restriction)
@@ -3371,6 +4286,7 @@ class ActivateLicenseView(APIView):
 class DownloadOriginalFileView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @admission_control('download')
     def get(self, request, period_id):
         """Download the original uploaded file for a given period."""
         try:
@@ -3388,11 +4304,13 @@ class DownloadOriginalFileView(APIView):
                     "message": "File not found on server."
                 }, status=status.HTTP_404_NOT_FOUND)
 
-            response = FileResponse(open(file_path, 'rb'))
-            # Get original filename or use a sensible default
-            original_filename = os.path.basename(period.uploaded_file.name)
-            response['Content-Disposition'] = f'attachment; filename="{original_filename}"'
-            return response
+            from app.services.file_delivery import deliver_file, path_sha256
+            sha256 = period.uploaded_file_sha256
+            if not sha256:
+                # Files stored before hashing was added: hash once and keep it
+                sha256 = path_sha256(file_path)
+                FinancialPeriod.objects.filter(pk=period.pk).update(uploaded_file_sha256=sha256)
+            return deliver_file(request, period.uploaded_file, sha256, filename=period.uploaded_file_name or None)
 
         except FinancialPeriod.DoesNotExist:
             return Response({
@@ -3407,123 +4325,296 @@ class DownloadOriginalFileView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class ExportCurrentDataView(APIView):
+class ExportCurrentDataView(ReadReplicaMixin, APIView):
     permission_classes = [IsAuthenticated]
 
+    @admission_control('export')
     def get(self, request, period_id):
         """Export current database data for a period as an Excel file with 5 sheets."""
+        from app.services.export_cache import cached_file_response, period_version
+        from app.services.workbook_export import XLSX_CONTENT_TYPE
         try:
             period = FinancialPeriod.objects.get(id=period_id)
-            
-            wb = Workbook()
-            # Remove default sheet
-            wb.remove(wb.active)
-            
-            # 1. Balance Sheet
-            ws_bs = wb.create_sheet("Balance Sheet")
-            ws_bs.append(["Liabilities", "Amount", "Assets", "Amount"])
-            try:
-                bs = period.balance_sheet
-                ws_bs.append(["Share Capital", bs.share_capital, "Cash in Hand", bs.cash_in_hand])
-                ws_bs.append(["Deposits", bs.deposits, "Cash at Bank", bs.cash_at_bank])
-                ws_bs.append(["Borrowings", bs.borrowings, "Investments", bs.investments])
-                ws_bs.append(["Reserves (Statutory & Free)", bs.reserves_statutory_free, "Loans & Advances", bs.loans_advances])
-                ws_bs.append(["Provisions", bs.provisions, "Fixed Assets", bs.fixed_assets])
-                ws_bs.append(["Other Liabilities", bs.other_liabilities, "Other Assets", bs.other_assets])
-                ws_bs.append(["Undistributed Profit", bs.undistributed_profit, "Stock in Trade", bs.stock_in_trade])
-            except BalanceSheet.DoesNotExist:
-                pass
-
-            # 2. Profit & Loss
-            ws_pl = wb.create_sheet("Profit & Loss")
-            ws_pl.append(["Expenses", "Amount", "Income", "Amount"])
-            try:
-                pl = period.profit_loss
-                ws_pl.append(["Interest on Deposits", pl.interest_on_deposits, "Interest on Loans", pl.interest_on_loans])
-                ws_pl.append(["Interest on Borrowings", pl.interest_on_borrowings, "Interest on Bank A/c", pl.interest_on_bank_ac])
-                ws_pl.append(["Establishment & Contingencies", pl.establishment_contingencies, "Return on Investment", pl.return_on_investment])
-                ws_pl.append(["Provisions Made", pl.provisions, "Miscellaneous Income", pl.miscellaneous_income])
-                ws_pl.append(["Net Profit", pl.net_profit, "", ""])
-            except ProfitAndLoss.DoesNotExist:
-                pass
-
-            # 3. Trading Account
-            ws_ta = wb.create_sheet("Trading Account")
-            ws_ta.append(["Item", "Amount"])
-            try:
-                ta = period.trading_account
-                ws_ta.append(["Opening Stock", ta.opening_stock])
-                ws_ta.append(["Purchases", ta.purchases])
-                ws_ta.append(["Trade Charges", ta.trade_charges])
-                ws_ta.append(["Sales", ta.sales])
-                ws_ta.append(["Closing Stock", ta.closing_stock])
-            except TradingAccount.DoesNotExist:
-                pass
-
-            # 4. Operational Metrics
-            ws_om = wb.create_sheet("Operational Metrics")
-            ws_om.append(["Metric", "Value"])
-            try:
-                om = period.operational_metrics
-                ws_om.append(["Staff Count", om.staff_count])
-            except OperationalMetrics.DoesNotExist:
-                pass
-            # 5. Ratio Analysis Results
-            ws_r = wb.create_sheet("Ratio Analysis Results")
-            ws_r.append(["Ratio Name", "Value", "Unit"])
-            try:
-                r = period.ratios
-                ratios_data = [
-                    ("Working Fund", r.working_fund, "₹"),
-                    ("Stock Turnover", r.stock_turnover, "times"),
-                    ("Gross Profit Ratio", r.gross_profit_ratio, "%"),
-                    ("Net Profit Ratio", r.net_profit_ratio, "%"),
-                    ("Net Own Funds", r.net_own_funds, "₹"),
-                    ("Own Fund to Working Fund", r.own_fund_to_wf, "%"),
-                    ("Deposits to Working Fund", r.deposits_to_wf, "%"),
-                    ("Borrowings to Working Fund", r.borrowings_to_wf, "%"),
-                    ("Loans to Working Fund", r.loans_to_wf, "%"),
-                    ("Investments to Working Fund", r.investments_to_wf, "%"),
-                    ("Earning Assets to Working Fund", r.earning_assets_to_wf, "%"),
-                    ("Interest Tagged Funds to Working Fund", r.interest_tagged_funds_to_wf, "%"),
-                    ("Cost of Deposits", r.cost_of_deposits, "%"),
-                    ("Yield on Loans", r.yield_on_loans, "%"),
-                    ("Yield on Investments", r.yield_on_investments, "%"),
-                    ("Credit Deposit Ratio", r.credit_deposit_ratio, "%"),
-                    ("Avg Cost of Working Fund", r.avg_cost_of_wf, "%"),
-                    ("Avg Yield on Working Fund", r.avg_yield_on_wf, "%"),
-                    ("Misc Income to Working Fund", r.misc_income_to_wf, "%"),
-                    ("Interest Exp to Interest Income", r.interest_exp_to_interest_income, "%"),
-                    ("Gross Fin Margin", r.gross_fin_margin, "%"),
-                    ("Operating Cost to Working Fund", r.operating_cost_to_wf, "%"),
-                    ("Net Fin Margin", r.net_fin_margin, "%"),
-                    ("Risk Cost to Working Fund", r.risk_cost_to_wf, "%"),
-                    ("Net Margin", r.net_margin, "%"),
-                    ("Capital Turnover Ratio", r.capital_turnover_ratio, "times"),
-                    ("Per Employee Deposit", r.per_employee_deposit, "₹"),
-                    ("Per Employee Loan", r.per_employee_loan, "₹"),
-                    ("Per Employee Contribution", r.per_employee_contribution, "₹"),
-                    ("Per Employee Operating Cost", r.per_employee_operating_cost, "₹"),
-                ]
-                for name, val, unit in ratios_data:
-                    ws_r.append([name, val, unit])
-            except RatioResult.DoesNotExist:
-                pass
-
-            output = BytesIO()
-            wb.save(output)
-            output.seek(0)
-
-            response = HttpResponse(
-                output.getvalue(),
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
+            parts, last_modified = period_version(period.id)
             filename = f"Export_{period.label.replace(' ', '_')}.xlsx"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            return response
+            return cached_file_response(
+                request, 'period-xlsx', parts, filename, XLSX_CONTENT_TYPE,
+                build=lambda: self._build_workbook(period), last_modified=last_modified,
+            )
 
         except FinancialPeriod.DoesNotExist:
             return Response({"error": "Period not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             logger.error(f"Error in ExportCurrentDataView: {e}")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _build_workbook(self, period):
+        from app.services.workbook_export import RATIO_ROWS
+
+        wb = Workbook(write_only=True)
+        
+        # 1. Balance Sheet
+        ws_bs = wb.create_sheet("Balance Sheet")
+        ws_bs.append(["Liabilities", "Amount", "Assets", "Amount"])
+        try:
+            bs = period.balance_sheet
+            ws_bs.append(["Share Capital", bs.share_capital, "Cash in Hand", bs.cash_in_hand])
+            ws_bs.append(["Deposits", bs.deposits, "Cash at Bank", bs.cash_at_bank])
+            ws_bs.append(["Borrowings", bs.borrowings, "Investments", bs.investments])
+            ws_bs.append(["Reserves (Statutory & Free)", bs.reserves_statutory_free, "Loans & Advances", bs.loans_advances])
+            ws_bs.append(["Provisions", bs.provisions, "Fixed Assets", bs.fixed_assets])
+            ws_bs.append(["Other Liabilities", bs.other_liabilities, "Other Assets", bs.other_assets])
+            ws_bs.append(["Undistributed Profit", bs.undistributed_profit, "Stock in Trade", bs.stock_in_trade])
+        except BalanceSheet.DoesNotExist:
+            pass
+
+        # 2. Profit & Loss
+        ws_pl = wb.create_sheet("Profit & Loss")
+        ws_pl.append(["Expenses", "Amount", "Income", "Amount"])
+        try:
+            pl = period.profit_loss
+            ws_pl.append(["Interest on Deposits", pl.interest_on_deposits, "Interest on Loans", pl.interest_on_loans])
+            ws_pl.append(["Interest on Borrowings", pl.interest_on_borrowings, "Interest on Bank A/c", pl.interest_on_bank_ac])
+            ws_pl.append(["Establishment & Contingencies", pl.establishment_contingencies, "Return on Investment", pl.return_on_investment])
+            ws_pl.append(["Provisions Made", pl.provisions, "Miscellaneous Income", pl.miscellaneous_income])
+            ws_pl.append(["Net Profit", pl.net_profit, "", ""])
+        except ProfitAndLoss.DoesNotExist:
+            pass
+
+        # 3. Trading Account
+        ws_ta = wb.create_sheet("Trading Account")
+        ws_ta.append(["Item", "Amount"])
+        try:
+            ta = period.trading_account
+            ws_ta.append(["Opening Stock", ta.opening_stock])
+            ws_ta.append(["Purchases", ta.purchases])
+            ws_ta.append(["Trade Charges", ta.trade_charges])
+            ws_ta.append(["Sales", ta.sales])
+            ws_ta.append(["Closing Stock", ta.closing_stock])
+        except TradingAccount.DoesNotExist:
+            pass
+
+        # 4. Operational Metrics
+        ws_om = wb.create_sheet("Operational Metrics")
+        ws_om.append(["Metric", "Value"])
+        try:
+            om = period.operational_metrics
+            ws_om.append(["Staff Count", om.staff_count])
+        except OperationalMetrics.DoesNotExist:
+            pass
+        # 5. Ratio Analysis Results
+        ws_r = wb.create_sheet("Ratio Analysis Results")
+        ws_r.append(["Ratio Name", "Value", "Unit"])
+        try:
+            r = period.ratios
+            for name, field, unit in RATIO_ROWS:
+                ws_r.append([name, getattr(r, field), unit])
+        except RatioResult.DoesNotExist:
+            pass
+        return wb
+
+
+class PeriodRangeQueryMixin:
+    """Parses ?period_type=&from=&to= (YYYY-MM-DD) into a FinancialPeriod queryset."""
+
+    def filter_periods(self, request):
+        """Returns (periods, period_type, date_from, date_to, error_response)."""
+        period_type = request.query_params.get('period_type', 'MONTHLY')
+        valid_types = [choice[0] for choice in FinancialPeriod.PERIOD_TYPE_CHOICES]
+        if period_type not in valid_types:
+            return None, period_type, None, None, Response({
+                "status": "failed",
+                "response_code": status.HTTP_400_BAD_REQUEST,
+                "message": f"Invalid period_type. Valid values are: {', '.join(valid_types)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        periods = FinancialPeriod.objects.filter(period_type=period_type)
+        date_from = request.query_params.get('from') or None
+        date_to = request.query_params.get('to') or None
+        try:
+            if date_from:
+                periods = periods.filter(end_date__gte=datetime.strptime(date_from, '%Y-%m-%d').date())
+            if date_to:
+                periods = periods.filter(start_date__lte=datetime.strptime(date_to, '%Y-%m-%d').date())
+        except ValueError:
+            return None, period_type, date_from, date_to, Response({
+                "status": "failed",
+                "response_code": status.HTTP_400_BAD_REQUEST,
+                "message": "from/to must be YYYY-MM-DD"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return periods, period_type, date_from, date_to, None
+
+
+class ExportPeriodsWorkbookView(ReadReplicaMixin, PeriodRangeQueryMixin, APIView):
+    """
+    GET /api/export/workbook/?period_type=MONTHLY&from=YYYY-MM-DD&to=YYYY-MM-DD
+    Multi-period Excel export: one sheet per statement and a ratio matrix, one column per period.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @admission_control('export')
+    def get(self, request):
+        from app.services.export_cache import cached_file_response, periods_version
+        from app.services.workbook_export import MAX_PERIODS, XLSX_CONTENT_TYPE, build_multi_period_workbook
+        try:
+            periods, period_type, date_from, date_to, error = self.filter_periods(request)
+            if error is not None:
+                return error
+
+            if periods.count() > MAX_PERIODS:
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": f"At most {MAX_PERIODS} periods fit in one workbook; narrow from/to"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            parts, last_modified = periods_version(periods)
+            filename = f"Export_{period_type}_{timezone.now():%Y%m%d}.xlsx"
+            return cached_file_response(
+                request, 'periods-xlsx', [period_type, date_from, date_to] + parts, filename, XLSX_CONTENT_TYPE,
+                build=lambda: build_multi_period_workbook(periods)[0], last_modified=last_modified,
+            )
+
+        except Exception as e:
+            logger.error(f"Error in ExportPeriodsWorkbookView: {e}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PeriodReportsView(ReadReplicaMixin, PeriodRangeQueryMixin, APIView):
+    """
+    GET /api/reports/?period_type=MONTHLY&from=YYYY-MM-DD&to=YYYY-MM-DD
+    ZIP with one formatted DOCX report (statements, ratios, traffic lights,
+    interpretation) per period, rendered in parallel and cached per period.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @admission_control('export')
+    def get(self, request):
+        from app.services.benchmark_config import get_benchmarks_version
+        from app.services.export_cache import cached_file_response, periods_version
+        from app.services.report_generator import MAX_REPORTS, ReportBundle
+        try:
+            periods, period_type, date_from, date_to, error = self.filter_periods(request)
+            if error is not None:
+                return error
+
+            count = periods.count()
+            if not count or count > MAX_REPORTS:
+                return Response({
+                    "status": "failed",
+                    "response_code": status.HTTP_400_BAD_REQUEST,
+                    "message": f"Select between 1 and {MAX_REPORTS} periods; {count} matched"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            parts, last_modified = periods_version(periods)
+            parts = [period_type, date_from, date_to, get_benchmarks_version()] + parts
+            filename = f"Reports_{period_type}_{timezone.now():%Y%m%d}.zip"
+            return cached_file_response(
+                request, 'reports-zip', parts, filename, 'application/zip',
+                build=lambda: ReportBundle(periods), last_modified=last_modified,
+            )
+
+        except Exception as e:
+            logger.error(f"Error in PeriodReportsView: {e}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ResponseCacheStatsView(APIView):
+    """GET /api/cache-stats/ - analytics response cache backend, data version and per-endpoint hit/miss counts (this process)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from app.services.response_cache import cache_stats
+        return Response({
+            "status": "success",
+            "response_code": status.HTTP_200_OK,
+            "data": cache_stats()
+        }, status=status.HTTP_200_OK)
+
+
+class AdmissionStatsView(APIView):
+    """GET /api/admission-stats/ - per route class (upload, export, recalc) limits, running and queued requests and rejections (this process)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from app.services.admission import admission_stats
+        return Response({
+            "status": "success",
+            "response_code": status.HTTP_200_OK,
+            "data": admission_stats()
+        }, status=status.HTTP_200_OK)
+
+
+class ProgressStreamView(AsyncReadView):
+    """
+    GET /api/progress/<task_id>/ - Server-Sent Events stream of an upload's or
+    recalculation's stages (app.services.progress), for the task id the client
+    sent as X-Progress-Id / progress_id. Every event is a JSON "data" line:
+        {"seq": 3, "task": "...", "kind": "upload", "stage": "parsed",
+         "sheet": "Balance Sheet", "at": "...", "elapsed_ms": 412}
+    Stages: received, hashed, loaded, parsed (one per sheet), persisted,
+    ratios_calculated, then done or failed, which ends the stream. Reconnecting
+    clients resume after the Last-Event-ID header. Needs an ASGI server: under
+    WSGI the stream is only sent once it ends.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [ORJSONRenderer, EventStreamRenderer]
+
+    async def get(self, request, task_id):
+        from app.services.progress import TASK_ID_PATTERN, event_stream
+        if not TASK_ID_PATTERN.match(task_id):
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_400_BAD_REQUEST,
+                "message": "task id must be 8-64 letters, digits, '-' or '_'"
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            after = int(request.META.get('HTTP_LAST_EVENT_ID') or request.query_params.get('after') or 0)
+        except ValueError:
+            after = 0
+        response = StreamingHttpResponse(
+            event_stream(task_id, request.user.pk, after), content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # nginx: pass events through unbuffered
+        return response
+
+
+class ExportAllDataView(ReadReplicaMixin, APIView):
+    """
+    GET /api/export/all/?format=csv|jsonl
+    Every period with its statements and ratios, one row per period, streamed.
+    """
+    permission_classes = [IsAuthenticated]
+
+    CONTENT_TYPES = {
+        'csv': 'text/csv; charset=utf-8',
+        'jsonl': 'application/x-ndjson',
+    }
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= names the export format here, not a DRF renderer
+        return super().perform_content_negotiation(request, force=True)
+
+    @admission_control('export')
+    def get(self, request):
+        from app.db_router import bind_reads
+        from app.services.bulk_export import EXPORT_FORMATS, iter_export
+        from app.services.streaming import streaming_body
+
+        export_format = request.query_params.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({
+                "status": "failed",
+                "response_code": status.HTTP_400_BAD_REQUEST,
+                "message": f"format must be one of: {', '.join(EXPORT_FORMATS)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # Rows are read while streaming, after the view has returned: keep them on the replica
+        rows = bind_reads(iter_export(export_format))
+        response = StreamingHttpResponse(
+            streaming_body(request, rows), content_type=self.CONTENT_TYPES[export_format]
+        )
+        filename = f"Export_All_{timezone.now():%Y%m%d}.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -10,9 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import copy
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,6 +52,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'app.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app.middleware.PrimaryStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -81,6 +86,35 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Database engine (DB_ENGINE):
+#   'postgresql' - server database (docker-compose, multi-user installs)
+#   'sqlite'     - embedded file at SQLITE_PATH for the single-user desktop suite (run_backend.py)
+DB_ENGINES = ('postgresql', 'sqlite')
+DB_ENGINE = os.environ.get('DB_ENGINE', 'postgresql')
+if DB_ENGINE not in DB_ENGINES:
+    raise ImproperlyConfigured(f"DB_ENGINE must be one of: {', '.join(DB_ENGINES)}")
+SQLITE_PATH = os.environ.get('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3'))
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', '20'))  # seconds a writer waits for the lock
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # bytes read via mmap
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', str(32 * 1024)))  # page cache per connection
+
+# Database connection handling (DB_CONN_MODE):
+#   'persistent' - each worker thread keeps its connection for DB_CONN_MAX_AGE seconds
+#                  (suits gunicorn/uwsgi workers; no extra dependency)
+#   'pool'       - one psycopg 3 pool per process, DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE connections
+#                  (suits runserver, which starts a thread per request; needs psycopg[pool])
+#   'none'       - open and close a connection for every request
+# Connections are health-checked before reuse in both 'persistent' and 'pool' modes.
+DB_CONN_MODES = ('persistent', 'pool', 'none')
+DB_CONN_MODE = os.environ.get('DB_CONN_MODE', 'persistent')
+if DB_CONN_MODE not in DB_CONN_MODES:
+    raise ImproperlyConfigured(f"DB_CONN_MODE must be one of: {', '.join(DB_CONN_MODES)}")
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '60'))  # seconds
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))  # seconds to wait for a free connection
+DB_POOL_MAX_IDLE = float(os.environ.get('DB_POOL_MAX_IDLE', '300'))  # close idle connections above min_size
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -89,8 +123,62 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD', '1234'),
         'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
         'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE if DB_CONN_MODE == 'persistent' else 0,
+        'CONN_HEALTH_CHECKS': DB_CONN_MODE != 'none',
+        'OPTIONS': {},
     }
 }
+if DB_ENGINE == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': SQLITE_PATH,
+        # Opening a file is cheap: no pool, but keep connections when asked to
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE if DB_CONN_MODE == 'persistent' else 0,
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so waiting writers queue on
+            # the busy timeout instead of failing with "database is locked" on upgrade
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_BUSY_TIMEOUT,
+            # WAL lets readers run alongside the writer; synchronous=NORMAL is durable
+            # across application crashes in WAL mode and avoids an fsync per commit
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+                f'PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB};'
+                'PRAGMA temp_store=MEMORY;'
+                'PRAGMA journal_size_limit=67108864;'
+            ),
+        },
+    }
+elif DB_CONN_MODE == 'pool':
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': DB_POOL_MIN_SIZE,
+        'max_size': DB_POOL_MAX_SIZE,
+        'timeout': DB_POOL_TIMEOUT,
+        'max_idle': DB_POOL_MAX_IDLE,
+    }
+
+# Optional read replica for analytics / export reads (app.db_router). Configured by
+# POSTGRES_REPLICA_HOST (streaming replica of the primary) or, to try the routing
+# locally, SQLITE_REPLICA_PATH (e.g. a copy of the SQLite file). Tests mirror 'default'.
+DB_REPLICA_ALIAS = 'replica'
+POSTGRES_REPLICA_HOST = os.environ.get('POSTGRES_REPLICA_HOST')
+SQLITE_REPLICA_PATH = os.environ.get('SQLITE_REPLICA_PATH')
+# Seconds a user's reads stay on the primary after a write (read-your-writes despite replica lag)
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '15'))
+if DB_ENGINE == 'postgresql' and POSTGRES_REPLICA_HOST:
+    DATABASES[DB_REPLICA_ALIAS] = dict(
+        copy.deepcopy(DATABASES['default']),
+        HOST=POSTGRES_REPLICA_HOST,
+        PORT=os.environ.get('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+        TEST={'MIRROR': 'default'},
+    )
+elif DB_ENGINE == 'sqlite' and SQLITE_REPLICA_PATH:
+    DATABASES[DB_REPLICA_ALIAS] = dict(
+        copy.deepcopy(DATABASES['default']), NAME=SQLITE_REPLICA_PATH, TEST={'MIRROR': 'default'},
+    )
+DATABASE_ROUTERS = ['app.db_router.ReadReplicaRouter']
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
@@ -140,7 +228,7 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 # Media files (User uploads)
 MEDIA_URL = 'media/'
-MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -152,19 +240,142 @@ from datetime import timedelta
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'app.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'app.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
+# Serve dashboard, period comparisons and the ratio-results list from async views
+# (app.urls); best under an ASGI server: uvicorn backend.asgi:application
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'true').lower() == 'true'
+# Threads (each with its own database connection) that async views run concurrent
+# reads on (app.db_router.gather_reads); keep DB_POOL_MAX_SIZE above this in pool mode
+ASYNC_READ_WORKERS = int(os.environ.get('ASYNC_READ_WORKERS', '8'))
+
+# Upload / recalculation progress events (app.services.progress, /api/progress/<id>/).
+# Use a cache shared by all worker processes (CACHE_BACKEND=file or db) when running several.
+PROGRESS_CACHE_ALIAS = os.environ.get('PROGRESS_CACHE_ALIAS', 'default')
+PROGRESS_TTL = int(os.environ.get('PROGRESS_TTL', '3600'))  # seconds events are kept
+PROGRESS_POLL_INTERVAL = float(os.environ.get('PROGRESS_POLL_INTERVAL', '0.25'))  # seconds between cache checks per stream
+PROGRESS_STREAM_TIMEOUT = int(os.environ.get('PROGRESS_STREAM_TIMEOUT', '600'))  # seconds before a stream is closed
+
+# Admission control for heavy endpoints (app.services.admission, /api/admission-stats/), per process:
+# at most `concurrency` requests of a class run at once, `queue` more wait up to
+# ADMISSION_QUEUE_TIMEOUT seconds for a slot (else 503), and one user may have `per_user`
+# running or queued (else 429). Light endpoints (login, dashboard, ...) are never limited.
+ADMISSION_CONTROL = os.environ.get('ADMISSION_CONTROL', 'true').lower() == 'true'
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '15'))
+ADMISSION_LIMITS = {
+    # Excel / PDF / DOCX parsing and the ratio calculation that follows
+    'upload': {
+        'concurrency': int(os.environ.get('ADMISSION_UPLOAD_CONCURRENCY', '2')),
+        'queue': int(os.environ.get('ADMISSION_UPLOAD_QUEUE', '4')),
+        'per_user': int(os.environ.get('ADMISSION_UPLOAD_PER_USER', '1')),
+    },
+    # Workbook / report / bulk exports; cached files are cheap, so allow more
+    'export': {
+        'concurrency': int(os.environ.get('ADMISSION_EXPORT_CONCURRENCY', '4')),
+        'queue': int(os.environ.get('ADMISSION_EXPORT_QUEUE', '8')),
+        'per_user': int(os.environ.get('ADMISSION_EXPORT_PER_USER', '2')),
+    },
+    # Single-period calculation and full recalculation
+    'recalc': {
+        'concurrency': int(os.environ.get('ADMISSION_RECALC_CONCURRENCY', '2')),
+        'queue': int(os.environ.get('ADMISSION_RECALC_QUEUE', '4')),
+        'per_user': int(os.environ.get('ADMISSION_RECALC_PER_USER', '1')),
+    },
+    # Original upload downloads served by Django (FILE_DELIVERY_MODE=django); download
+    # managers fetch byte ranges in parallel, so allow a few per user
+    'download': {
+        'concurrency': int(os.environ.get('ADMISSION_DOWNLOAD_CONCURRENCY', '8')),
+        'queue': int(os.environ.get('ADMISSION_DOWNLOAD_QUEUE', '16')),
+        'per_user': int(os.environ.get('ADMISSION_DOWNLOAD_PER_USER', '4')),
+    },
+}
+
+# Brotli level for compressed JSON responses (app.middleware.CompressionMiddleware):
+# 0-11, 4-6 compress about as fast as gzip and noticeably smaller
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# Seconds an authenticated user is served from memory instead of the database
+# (app.authentication); edits through this process invalidate it at once. 0 disables the cache.
+JWT_USER_CACHE_TTL = int(os.environ.get('JWT_USER_CACHE_TTL', '60'))
+
+# Django cache (CACHE_BACKEND), used by the analytics response cache, period calendar,
+# ratio series and replica pins - no external service needed:
+#   'locmem' - per-process memory; right for runserver (one process) and the desktop suite
+#   'file'   - files under CACHE_DIR, shared by the worker processes on one machine
+#   'db'     - table CACHE_TABLE in the default database, shared by all processes
+#              (create it once with `python manage.py createcachetable`)
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(f"CACHE_BACKEND must be one of: {', '.join(CACHE_BACKENDS)}")
+CACHE_LOCATIONS = {
+    'locmem': 'fund-management',
+    'file': os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache')),
+    'db': os.environ.get('CACHE_TABLE', 'django_cache'),
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': CACHE_LOCATIONS[CACHE_BACKEND],
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '5000'))},
+    }
+}
+# Analytics response cache (app.services.response_cache): dashboard, period comparisons and
+# ratio results, invalidated by a data version bumped on every data change. 0 disables it.
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', '300'))  # seconds
+
+# Balances used by yield/cost ratios: 'closing' (period-end) or 'average'
+# ((opening + closing) / 2, opening taken from the previous period of the same type)
+RATIO_AVERAGING_MODES = ('closing', 'average')
+RATIO_AVERAGING_MODE = os.environ.get('RATIO_AVERAGING_MODE', 'closing')
+if RATIO_AVERAGING_MODE not in RATIO_AVERAGING_MODES:
+    raise ImproperlyConfigured(f"RATIO_AVERAGING_MODE must be one of: {', '.join(RATIO_AVERAGING_MODES)}")
+
+# Monte Carlo sensitivity (/api/periods/<id>/sensitivity/)
+SENSITIVITY_MAX_DRAWS = int(os.environ.get('SENSITIVITY_MAX_DRAWS', '100000'))
+SENSITIVITY_TIME_BUDGET = float(os.environ.get('SENSITIVITY_TIME_BUDGET', '10'))  # seconds per request
+# Process pool for large runs; 0 or 1 keeps everything in the request process
+SENSITIVITY_MAX_WORKERS = int(os.environ.get('SENSITIVITY_MAX_WORKERS', '0'))
+SENSITIVITY_POOL_MIN_DRAWS = int(os.environ.get('SENSITIVITY_POOL_MIN_DRAWS', '50000'))
+
+# Upload anomaly flags: |z| against other periods of the same type, once enough samples exist
+ANOMALY_Z_THRESHOLD = float(os.environ.get('ANOMALY_Z_THRESHOLD', '3.0'))
+ANOMALY_MIN_SAMPLES = int(os.environ.get('ANOMALY_MIN_SAMPLES', '5'))
+
+# On-disk cache of generated export files (XLSX / DOCX), evicted least-recently-used; 0 disables it
+EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR', str(BASE_DIR / 'export_cache'))
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+
+# Original-file downloads: 'django' streams them from the worker (with Range support);
+# 'x-sendfile' (Apache mod_xsendfile) or 'x-accel' (nginx) hand the file to the front proxy.
+# For x-accel, map FILE_DELIVERY_ACCEL_PREFIX to MEDIA_ROOT in an internal nginx location.
+FILE_DELIVERY_MODE = os.environ.get('FILE_DELIVERY_MODE', 'django')
+FILE_DELIVERY_ACCEL_PREFIX = os.environ.get('FILE_DELIVERY_ACCEL_PREFIX', '/protected-media/')
+
+# Period report ZIPs (/api/reports/): process pool used once this many reports need rendering
+REPORT_MAX_WORKERS = int(os.environ.get('REPORT_MAX_WORKERS', str(min(4, os.cpu_count() or 1))))
+REPORT_POOL_MIN_REPORTS = int(os.environ.get('REPORT_POOL_MIN_REPORTS', '4'))
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
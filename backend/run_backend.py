@@ -0,0 +1,39 @@
+"""
+Desktop launcher for the backend (bundled as FundManagementBackend.exe with PyInstaller)
+Runs on the embedded SQLite database by default: data, uploads and export cache live
+in a "data" folder next to the executable, migrations are applied on start.
+Usage: python run_backend.py [--port 8000]   (set DB_ENGINE=postgresql to use a server)
+"""
+import os
+import sys
+from pathlib import Path
+
+
+def data_dir():
+    # A one-file PyInstaller build unpacks to a temporary folder: keep data beside the .exe
+    base = Path(sys.executable).parent if getattr(sys, 'frozen', False) else Path(__file__).resolve().parent
+    path = Path(os.environ.get('FUND_MANAGEMENT_DATA', base / 'data'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def main():
+    port = sys.argv[sys.argv.index('--port') + 1] if '--port' in sys.argv else '8000'
+    data = data_dir()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    os.environ.setdefault('DB_ENGINE', 'sqlite')
+    os.environ.setdefault('SQLITE_PATH', str(data / 'fund_management.sqlite3'))
+    os.environ.setdefault('MEDIA_ROOT', str(data / 'media'))
+    os.environ.setdefault('EXPORT_CACHE_DIR', str(data / 'export_cache'))
+
+    import django
+    from django.core.management import call_command, execute_from_command_line
+
+    django.setup()
+    # run_syncdb: also create tables for apps shipped without migration files
+    call_command('migrate', interactive=False, run_syncdb=True, verbosity=0)
+    execute_from_command_line([sys.argv[0], 'runserver', f'127.0.0.1:{port}', '--noreload'])
+
+
+if __name__ == '__main__':
+    main()